@@ -1,51 +1,104 @@
-import os, time, httpx, jwt, logging
-from dotenv import load_dotenv
-
-# Load env vars from .env (useful for local dev)
-load_dotenv()
+import os, time, httpx, jwt, logging, asyncio, threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from django.core.cache import cache
+from adapters.github.client import get_github_client
+from adapters.github.ratelimit import register_token
+from observability.tracing import traced
 
 logger = logging.getLogger(__name__)
 
-GITHUB_API = "https://api.github.com"
-GITHUB_APP_ID = os.getenv("GITHUB_APP_ID")
-_PRIVATE_KEY_PEM = os.getenv("GITHUB_PRIVATE_KEY_PEM")
+# --- Token cache tuning ---
+TOKEN_REFRESH_MARGIN = int(os.getenv("GITHUB_TOKEN_REFRESH_MARGIN", "300"))  # refresh 5 min before expiry
+TOKEN_CACHE_SIZE = int(os.getenv("GITHUB_TOKEN_CACHE_SIZE", "256"))
+TOKEN_LOCK_TIMEOUT = 30  # seconds a cross-worker mint lock may be held
+TOKEN_LOCK_WAIT = 10     # seconds to wait for another worker's mint before minting ourselves
+
+_JWT_TTL = 9 * 60
+_JWT_REUSE_MARGIN = 60   # stop handing out a cached JWT 1 minute before it expires
+
+_jwt_lock = threading.Lock()
+_cached_jwt: Optional[Tuple[str, float]] = None
+
+# installation_id -> (token, expires_at)
+_token_lru: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+_token_lru_lock = threading.Lock()
+
+# installation_id -> in-flight mint task (single-flight within this process)
+_inflight: Dict[int, asyncio.Task] = {}
+_background_refreshes: set = set()
+
 
-if not _PRIVATE_KEY_PEM:
-    raise RuntimeError("Missing GITHUB_PRIVATE_KEY_PEM in environment")
+def _app_credentials() -> Tuple[str, str]:
+    """
+    Read the GitHub App ID and private key from the environment.
+
+    Checked on first use rather than at import, so processes that never talk
+    to GitHub (e.g. the webhook server) don't need the App secrets.
+
+    Raises:
+        RuntimeError: If either variable is missing.
+    """
+    app_id = os.getenv("GITHUB_APP_ID")
+    private_key = os.getenv("GITHUB_PRIVATE_KEY_PEM")
 
-if not GITHUB_APP_ID:
-    raise RuntimeError("Missing GITHUB_APP_ID in environment")
+    if not private_key:
+        raise RuntimeError("Missing GITHUB_PRIVATE_KEY_PEM in environment")
+
+    if not app_id:
+        raise RuntimeError("Missing GITHUB_APP_ID in environment")
+
+    return app_id, private_key
 
 
 def make_app_jwt() -> str:
     """
     Generate a short-lived JWT for GitHub App authentication.
 
+    The signed JWT is cached in-process and reused until shortly before it
+    expires, so bursts of token mints only pay for one RSA signature.
+
     Returns:
         str: Encoded JWT signed with the GitHub App's private key.
 
     Raises:
+        RuntimeError: If the App credentials are not configured.
         Exception: If JWT encoding fails.
     """
-    now = int(time.time())
-    payload = {
-        "iat": now - 60,        # Issued 1 minute ago (clock skew buffer)
-        "exp": now + (9 * 60),  # Valid for 9 minutes
-        "iss": GITHUB_APP_ID,   # GitHub App ID
-    }
-
-    logger.debug("[GitHubAuth] Generating JWT for GitHub App authentication.")
-    try:
-        token = jwt.encode(payload, _PRIVATE_KEY_PEM, algorithm="RS256")
+    global _cached_jwt
+
+    with _jwt_lock:
+        now = int(time.time())
+        if _cached_jwt and _cached_jwt[1] - now > _JWT_REUSE_MARGIN:
+            return _cached_jwt[0]
+
+        app_id, private_key = _app_credentials()
+        payload = {
+            "iat": now - 60,         # Issued 1 minute ago (clock skew buffer)
+            "exp": now + _JWT_TTL,   # Valid for 9 minutes
+            "iss": app_id,    # GitHub App ID
+        }
+
+        logger.debug("[GitHubAuth] Generating JWT for GitHub App authentication.")
+        try:
+            token = jwt.encode(payload, private_key, algorithm="RS256")
+        except Exception as e:
+            logger.error(f"[GitHubAuth] Failed to generate JWT: {e}", exc_info=True)
+            raise
+
+        _cached_jwt = (token, payload["exp"])
         return token
-    except Exception as e:
-        logger.error(f"[GitHubAuth] Failed to generate JWT: {e}", exc_info=True)
-        raise
 
 
 async def get_installation_token(installation_id: int) -> str:
     """
-    Exchange App JWT for an installation access token.
+    Return an installation access token, minting a new one only when needed.
+
+    Lookup order is the in-process LRU, then the shared Django (Redis) cache,
+    then GitHub. Tokens close to expiry are still served while a background
+    task refreshes them, and concurrent callers for the same installation
+    share a single mint (in-process task + cross-worker cache lock).
 
     Args:
         installation_id (int): GitHub installation ID.
@@ -55,34 +108,184 @@ async def get_installation_token(installation_id: int) -> str:
 
     Raises:
         httpx.HTTPStatusError: If GitHub API returns a failure.
-        KeyError: If 'token' key missing from GitHub response.
+        RuntimeError: If the token cannot be parsed from GitHub's response.
+    """
+    entry = _lru_get(installation_id)
+    if entry is None:
+        entry = await _shared_get(installation_id)
+        if entry is not None:
+            _lru_put(installation_id, entry)
+
+    now = time.time()
+    if entry is not None and entry[1] > now:
+        if entry[1] - now <= TOKEN_REFRESH_MARGIN:
+            _schedule_refresh(installation_id)
+        token = entry[0]
+    else:
+        token, _ = await _single_flight_mint(installation_id)
+
+    # Calls made with this token are paced by the installation's rate-limit bucket
+    register_token(token, installation_id)
+    return token
+
+
+def _lru_get(installation_id: int) -> Optional[Tuple[str, float]]:
+    with _token_lru_lock:
+        entry = _token_lru.get(installation_id)
+        if entry is not None:
+            _token_lru.move_to_end(installation_id)
+        return entry
+
+
+def _lru_put(installation_id: int, entry: Tuple[str, float]) -> None:
+    with _token_lru_lock:
+        _token_lru[installation_id] = entry
+        _token_lru.move_to_end(installation_id)
+        while len(_token_lru) > TOKEN_CACHE_SIZE:
+            _token_lru.popitem(last=False)
+
+
+def _cache_key(installation_id: int) -> str:
+    return f"pp:gh:token:{installation_id}"
+
+
+async def _shared_get(installation_id: int) -> Optional[Tuple[str, float]]:
+    """Read a token entry from the shared cache; cache outages are non-fatal."""
+    try:
+        data = await cache.aget(_cache_key(installation_id))
+    except Exception as e:
+        logger.warning(f"[GitHubAuth] Shared token cache read failed: {e}")
+        return None
+
+    if not data or data.get("expires_at", 0) <= time.time():
+        return None
+    return data["token"], data["expires_at"]
+
+
+async def _shared_set(installation_id: int, entry: Tuple[str, float]) -> None:
+    timeout = int(entry[1] - time.time())
+    if timeout <= 0:
+        return
+    try:
+        await cache.aset(
+            _cache_key(installation_id),
+            {"token": entry[0], "expires_at": entry[1]},
+            timeout=timeout,
+        )
+    except Exception as e:
+        logger.warning(f"[GitHubAuth] Shared token cache write failed: {e}")
+
+
+def _schedule_refresh(installation_id: int) -> None:
+    """Kick off a background re-mint for a token that is about to expire."""
+    if installation_id in _inflight and not _inflight[installation_id].done():
+        return
+
+    logger.debug(f"[GitHubAuth] Token for installation_id={installation_id} near expiry, refreshing in background.")
+    task = asyncio.create_task(_single_flight_mint(installation_id, force=True))
+    _background_refreshes.add(task)
+
+    def _done(t: asyncio.Task) -> None:
+        _background_refreshes.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            logger.warning(f"[GitHubAuth] Background token refresh failed for installation_id={installation_id}: {t.exception()}")
+
+    task.add_done_callback(_done)
+
+
+async def _single_flight_mint(installation_id: int, force: bool = False) -> Tuple[str, float]:
+    """Coalesce concurrent mints for one installation into a single in-process task."""
+    task = _inflight.get(installation_id)
+    if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.create_task(_mint_with_lock(installation_id, force))
+        _inflight[installation_id] = task
+        task.add_done_callback(lambda t: _inflight.pop(installation_id, None) if _inflight.get(installation_id) is t else None)
+    return await asyncio.shield(task)
+
+
+async def _mint_with_lock(installation_id: int, force: bool) -> Tuple[str, float]:
+    """
+    Mint a token while holding the cross-worker lock for this installation.
+
+    Workers that lose the race wait for the winner to publish its token to the
+    shared cache instead of minting their own.
+    """
+    lock_key = f"{_cache_key(installation_id)}:lock"
+    try:
+        acquired = await cache.aadd(lock_key, os.getpid(), timeout=TOKEN_LOCK_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"[GitHubAuth] Token lock unavailable, minting without it: {e}")
+        acquired = None
+
+    if acquired is False:
+        deadline = time.monotonic() + TOKEN_LOCK_WAIT
+        stale = _lru_get(installation_id)
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            entry = await _shared_get(installation_id)
+            if entry is not None and (stale is None or entry != stale):
+                if not force or entry[1] - time.time() > TOKEN_REFRESH_MARGIN:
+                    _lru_put(installation_id, entry)
+                    return entry
+        logger.warning(f"[GitHubAuth] Timed out waiting for peer token mint, installation_id={installation_id}")
+
+    try:
+        entry = await _mint_installation_token(installation_id)
+        _lru_put(installation_id, entry)
+        await _shared_set(installation_id, entry)
+        return entry
+    finally:
+        if acquired:
+            try:
+                await cache.adelete(lock_key)
+            except Exception as e:
+                logger.warning(f"[GitHubAuth] Failed to release token lock: {e}")
+
+
+@traced("github.token_mint")
+async def _mint_installation_token(installation_id: int) -> Tuple[str, float]:
+    """
+    Exchange App JWT for an installation access token.
+
+    Args:
+        installation_id (int): GitHub installation ID.
+
+    Returns:
+        Tuple[str, float]: The token and its expiry as a UNIX timestamp.
+
+    Raises:
+        httpx.HTTPStatusError: If GitHub API returns a failure.
+        RuntimeError: If the token cannot be parsed from GitHub's response.
     """
     jwt_token = make_app_jwt()
-    url = f"{GITHUB_API}/app/installations/{installation_id}/access_tokens"
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Accept": "application/vnd.github+json",
-    }
+    url = f"/app/installations/{installation_id}/access_tokens"
 
     logger.info(f"[GitHubAuth] Requesting installation token for installation_id={installation_id}")
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        try:
-            r = await client.post(url, headers=headers)
-            r.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                f"[GitHubAuth] Failed to fetch installation token: "
-                f"status={e.response.status_code}, body={e.response.text}"
-            )
-            raise
+    try:
+        r = await get_github_client().request("POST", url, token=jwt_token, auth_scheme="Bearer", timeout=20)
+        r.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"[GitHubAuth] Failed to fetch installation token: "
+            f"status={e.response.status_code}, body={e.response.text}"
+        )
+        raise
 
-        try:
-            data = r.json()
-            token = data["token"]
-        except Exception as e:
-            logger.error(f"[GitHubAuth] Invalid JSON in installation token response: {r.text}")
-            raise RuntimeError("Failed to parse installation token from GitHub response.") from e
+    try:
+        data = r.json()
+        token = data["token"]
+        expires_at = _parse_expires_at(data.get("expires_at"))
+    except Exception as e:
+        logger.error(f"[GitHubAuth] Invalid JSON in installation token response: {r.text}")
+        raise RuntimeError("Failed to parse installation token from GitHub response.") from e
 
-        logger.info(f"[GitHubAuth] Successfully obtained installation token for installation_id={installation_id}")
-        return token
+    logger.info(f"[GitHubAuth] Successfully obtained installation token for installation_id={installation_id}")
+    return token, expires_at
+
+
+def _parse_expires_at(value: Optional[str]) -> float:
+    """Parse GitHub's ISO-8601 `expires_at`; assume the documented 1h lifetime if absent."""
+    if not value:
+        return time.time() + 3600
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
@@ -1,13 +1,204 @@
-import httpx, logging
-from typing import Dict, List
+import os, asyncio, httpx, logging, time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from adapters.github.diff import DiffParser
+from adapters.github.ratelimit import RATELIMIT_ENABLED, bucket_for, governor
+from observability.tracing import record_span, traced
 
-GITHUB_API = "https://api.github.com"
+GITHUB_API = os.getenv("GITHUB_API_URL", "https://api.github.com")
+PR_FILES_PER_PAGE = 100  # GitHub's maximum page size for the PR files API
+PR_FILES_PAGE_CONCURRENCY = int(os.getenv("GITHUB_FILES_PAGE_CONCURRENCY", "4"))
+# "files": paginated PR files API; "diff": the whole PR as one streamed unified diff
+GITHUB_DIFF_SOURCE = os.getenv("GITHUB_DIFF_SOURCE", "files")
+DIFF_MEDIA_TYPE = "application/vnd.github.v3.diff"
 logger = logging.getLogger(__name__)
 
+try:
+    import h2  # noqa: F401
+    _H2_AVAILABLE = True
+except ImportError:  # HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive
+    _H2_AVAILABLE = False
+
+
+class GitHubClient:
+    """
+    Long-lived, pooled HTTP client for the GitHub REST API.
+
+    One instance is shared by every adapter call in a worker process so that
+    connections (and their TLS sessions) are reused instead of re-established
+    on each request. Pool limits are tunable via environment variables.
+    """
+
+    def __init__(
+        self,
+        base_url: str = GITHUB_API,
+        timeout: float = float(os.getenv("GITHUB_HTTP_TIMEOUT", "30")),
+        max_connections: int = int(os.getenv("GITHUB_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections: int = int(os.getenv("GITHUB_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry: float = float(os.getenv("GITHUB_HTTP_KEEPALIVE_EXPIRY", "60")),
+        http2: Optional[bool] = None,
+    ):
+        """
+        Args:
+            base_url (str): GitHub API root (overridable for stubs/GHES).
+            timeout (float): Default per-request timeout in seconds.
+            max_connections (int): Upper bound on open connections.
+            max_keepalive_connections (int): Idle connections kept in the pool.
+            keepalive_expiry (float): Seconds an idle connection is kept alive.
+            http2 (Optional[bool]): Force HTTP/2 on/off; defaults to GITHUB_HTTP2
+                when the `h2` package is installed.
+        """
+        if http2 is None:
+            http2 = os.getenv("GITHUB_HTTP2", "true").lower() == "true" and _H2_AVAILABLE
+        elif http2 and not _H2_AVAILABLE:
+            logger.warning("[GitHub] HTTP/2 requested but 'h2' is not installed; using HTTP/1.1.")
+            http2 = False
+
+        self.base_url = base_url
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=http2,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            headers={"Accept": "application/vnd.github+json"},
+        )
+        logger.debug(f"[GitHub] Created pooled client base_url={base_url} http2={http2}")
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        token: Optional[str] = None,
+        auth_scheme: str = "token",
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        Send a request through the shared pool and the rate-limit governor.
+
+        Each call takes a token from its installation's bucket first (waiting
+        if needed), and the response's rate-limit headers are fed back. A
+        response rejected by a rate limit is retried once after the limit
+        lifts, if that is within the governor's maximum wait.
+
+        Args:
+            method (str): HTTP method.
+            path (str): API path relative to the base URL, e.g. "/repos/o/r/pulls/1/files".
+            token (Optional[str]): Installation token or App JWT.
+            auth_scheme (str): "token" for installation tokens, "Bearer" for App JWTs.
+            **kwargs: Passed through to `httpx.AsyncClient.request`.
+
+        Returns:
+            httpx.Response: The raw response; callers decide how to handle status.
+
+        Raises:
+            RateLimited: If the call would have to wait longer than GITHUB_RATELIMIT_MAX_WAIT.
+        """
+        headers = kwargs.pop("headers", None) or {}
+        if token:
+            headers["Authorization"] = f"{auth_scheme} {token}"
+        if not RATELIMIT_ENABLED:
+            return await self._client.request(method, path, headers=headers, **kwargs)
+
+        bucket = bucket_for(token, auth_scheme)
+        for attempt in range(2):
+            await governor.acquire(bucket)
+            r = await self._client.request(method, path, headers=headers, **kwargs)
+            if await governor.observe(bucket, r) is None or attempt:
+                return r
+            logger.warning(f"[GitHub] {method} {path} hit a rate limit; retrying once the limit lifts")
+        return r
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        path: str,
+        *,
+        token: Optional[str] = None,
+        auth_scheme: str = "token",
+        **kwargs,
+    ) -> AsyncIterator[httpx.Response]:
+        """
+        Streaming variant of `request`: the body is read by the caller.
+
+        Same governor handling; error responses are read in full before they
+        are yielded so their body can be logged and checked for rate limits.
+
+        Raises:
+            RateLimited: If the call would have to wait longer than GITHUB_RATELIMIT_MAX_WAIT.
+        """
+        headers = kwargs.pop("headers", None) or {}
+        if token:
+            headers["Authorization"] = f"{auth_scheme} {token}"
+        bucket = bucket_for(token, auth_scheme) if RATELIMIT_ENABLED else None
+
+        for attempt in range(2):
+            if bucket is not None:
+                await governor.acquire(bucket)
+            async with self._client.stream(method, path, headers=headers, **kwargs) as r:
+                if r.is_error:
+                    await r.aread()
+                if bucket is None or await governor.observe(bucket, r) is None or attempt:
+                    yield r
+                    return
+            logger.warning(f"[GitHub] {method} {path} hit a rate limit; retrying once the limit lifts")
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_client: Optional[GitHubClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_github_client() -> GitHubClient:
+    """
+    Return the process-wide GitHubClient, creating it on first use.
+
+    Pooled connections belong to the event loop that opened them, so the
+    client is rebuilt if it is requested from a different loop.
+    """
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        if _client is not None and not _client.is_closed:
+            logger.debug("[GitHub] Event loop changed; discarding pooled client bound to the old loop.")
+        _client = GitHubClient()
+        _client_loop = loop
+    return _client
+
+
+async def close_github_client() -> None:
+    """Close the shared client's pool (idempotent)."""
+    global _client, _client_loop
+
+    client, loop = _client, _client_loop
+    _client, _client_loop = None, None
+    if client is None or client.is_closed:
+        return
+    if loop is not asyncio.get_running_loop():
+        logger.debug("[GitHub] Pooled client belongs to a finished event loop; dropping it.")
+        return
+    await client.aclose()
+    logger.info("[GitHub] Closed pooled GitHub client.")
+
 
 async def list_pr_files(token: str, repo_full: str, pr_number: int) -> List[Dict]:
     """
-    Fetch the list of changed files in a pull request.
+    Fetch the complete list of changed files in a pull request.
+
+    Convenience wrapper that drains `iter_pr_files`; prefer the iterator when
+    the caller can process files incrementally.
 
     Args:
         token (str): GitHub installation access token.
@@ -28,39 +219,252 @@ async def list_pr_files(token: str, repo_full: str, pr_number: int) -> List[Dict
         RuntimeError: If the response cannot be parsed as JSON.
         ValueError: If the JSON response is not a list.
     """
-    url = f"{GITHUB_API}/repos/{repo_full}/pulls/{pr_number}/files?per_page=100"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json",
-    }
+    files = [f async for f in iter_pr_files(token, repo_full, pr_number)]
+    logger.info(f"[GitHub] Retrieved {len(files)} file(s) for {repo_full}#{pr_number}")
+    return files
 
-    logger.info(f"[GitHub] Fetching PR files: repo={repo_full}, pr=#{pr_number}")
 
-    async with httpx.AsyncClient(timeout=30) as client:
+class DiffTooLarge(Exception):
+    """Raised when GitHub refuses to render a pull request as a single diff."""
+
+
+async def iter_pr_files(
+    token: str,
+    repo_full: str,
+    pr_number: int,
+    concurrency: int = PR_FILES_PAGE_CONCURRENCY,
+    source: str = GITHUB_DIFF_SOURCE,
+) -> AsyncIterator[Dict]:
+    """
+    Stream the changed files of a pull request.
+
+    With `source="diff"` the files come from one streamed unified-diff
+    request (`iter_pr_diff_files`); if GitHub refuses to render the diff,
+    this falls back to the paginated files API below.
+
+    Args:
+        token (str): GitHub installation access token.
+        repo_full (str): Repository full name, e.g., "owner/repo".
+        pr_number (int): Pull request number.
+        concurrency (int): Maximum number of page requests in flight.
+        source (str): "files" or "diff" (default: GITHUB_DIFF_SOURCE).
+
+    Yields:
+        Dict: File metadata dictionaries, as returned by GitHub's API.
+    """
+    if source == "diff":
+        try:
+            async for f in iter_pr_diff_files(token, repo_full, pr_number):
+                yield f
+            return
+        except DiffTooLarge as e:
+            logger.warning(f"[GitHub] {e}; falling back to the paginated files API")
+
+    async for f in _iter_pr_files_pages(token, repo_full, pr_number, concurrency):
+        yield f
+
+
+async def iter_pr_diff_files(token: str, repo_full: str, pr_number: int) -> AsyncIterator[Dict]:
+    """
+    Stream the changed files of a pull request from its unified diff.
+
+    One request regardless of file count, and unlike the files API the
+    patches of large files are complete. The body is parsed while it
+    downloads; each file is yielded as soon as it is complete, with `hunks`
+    (old/new line ranges and positions) for line-anchored comments.
+
+    Args:
+        token (str): GitHub installation access token.
+        repo_full (str): Repository full name, e.g., "owner/repo".
+        pr_number (int): Pull request number.
+
+    Yields:
+        Dict: File dictionaries shaped like the PR files API entries
+            (see `adapters.github.diff.DiffParser`).
+
+    Raises:
+        DiffTooLarge: If GitHub will not render the diff (HTTP 406), before anything is yielded.
+        httpx.HTTPStatusError: If the request to GitHub fails otherwise.
+    """
+    path = f"/repos/{repo_full}/pulls/{pr_number}"
+    logger.info(f"[GitHub] Fetching PR diff: repo={repo_full}, pr=#{pr_number}")
+
+    parser = DiffParser()
+    start = time.perf_counter()
+    async with get_github_client().stream("GET", path, token=token, headers={"Accept": DIFF_MEDIA_TYPE}) as r:
+        if r.status_code == 406:
+            raise DiffTooLarge(f"Diff of {repo_full}#{pr_number} is too large for GitHub to render")
         try:
-            r = await client.get(url, headers=headers)
             r.raise_for_status()
         except httpx.HTTPStatusError as e:
             logger.error(
-                f"[GitHub] Failed to fetch PR files for {repo_full}#{pr_number}: "
+                f"[GitHub] Failed to fetch PR diff for {repo_full}#{pr_number}: "
                 f"status={e.response.status_code}, body={e.response.text}"
             )
             raise
 
+        async for chunk in r.aiter_bytes():
+            for f in parser.feed(chunk):
+                yield f
+    rest = parser.close()
+    # A span cannot stay open across a generator's yields, so the whole stream (including
+    # the consumer's time between files) is recorded once it ends
+    record_span("github.diff", time.perf_counter() - start, files=parser.files_parsed)
+    for f in rest:
+        yield f
+    logger.debug(f"[GitHub] Parsed {parser.files_parsed} file(s) from the diff of {repo_full}#{pr_number}")
+
+
+async def _iter_pr_files_pages(
+    token: str,
+    repo_full: str,
+    pr_number: int,
+    concurrency: int = PR_FILES_PAGE_CONCURRENCY,
+) -> AsyncIterator[Dict]:
+    """
+    Stream the changed files of a pull request, following pagination.
+
+    The first page is fetched on its own; if its `Link` header names the last
+    page, later pages are fetched concurrently in a sliding window of
+    `concurrency` requests, otherwise `rel="next"` links are followed one by
+    one. Files are yielded in page order as soon as each page arrives, so at
+    most `concurrency` pages are held in memory at once.
+
+    Args:
+        token (str): GitHub installation access token.
+        repo_full (str): Repository full name, e.g., "owner/repo".
+        pr_number (int): Pull request number.
+        concurrency (int): Maximum number of page requests in flight.
+
+    Yields:
+        Dict: File metadata dictionaries, as returned by GitHub's API.
+
+    Raises:
+        httpx.HTTPStatusError: If a request to GitHub fails.
+        RuntimeError: If a response cannot be parsed as JSON.
+        ValueError: If a JSON response is not a list.
+    """
+    path = f"/repos/{repo_full}/pulls/{pr_number}/files"
+    logger.info(f"[GitHub] Fetching PR files: repo={repo_full}, pr=#{pr_number}")
+
+    files, links = await _get_files_page(token, path, 1, repo_full, pr_number)
+    for f in files:
+        yield f
+
+    last_page = _page_from_link(links.get("last"))
+    if last_page is not None:
+        pending: Dict[int, asyncio.Task] = {}
+        next_to_start = 2
         try:
-            data = r.json()
-        except Exception as e:
-            logger.error(
-                f"[GitHub] Invalid JSON in response for {repo_full}#{pr_number}: {r.text}"
-            )
-            raise RuntimeError(f"Failed to parse JSON from {url}") from e
+            for page in range(2, last_page + 1):
+                while next_to_start <= last_page and next_to_start < page + max(concurrency, 1):
+                    pending[next_to_start] = asyncio.create_task(
+                        _get_files_page(token, path, next_to_start, repo_full, pr_number)
+                    )
+                    next_to_start += 1
 
-        if not isinstance(data, list):
-            logger.error(
-                f"[GitHub] Unexpected response type for {repo_full}#{pr_number}: {type(data)}"
-            )
-            raise ValueError(f"Expected list of dicts, got {type(data)}: {data}")
+                files, _ = await pending.pop(page)
+                for f in files:
+                    yield f
+        finally:
+            for task in pending.values():
+                task.cancel()
+        return
+
+    page = 1
+    while "next" in links:
+        page = _page_from_link(links["next"]) or page + 1
+        files, links = await _get_files_page(token, path, page, repo_full, pr_number)
+        for f in files:
+            yield f
+
+
+@traced("github.files_page")
+async def _get_files_page(token: str, path: str, page: int, repo_full: str, pr_number: int):
+    """Fetch and validate one page of the PR files API; returns (files, links)."""
+    try:
+        r = await get_github_client().request(
+            "GET", path, token=token, params={"per_page": PR_FILES_PER_PAGE, "page": page}
+        )
+        r.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"[GitHub] Failed to fetch PR files for {repo_full}#{pr_number} (page {page}): "
+            f"status={e.response.status_code}, body={e.response.text}"
+        )
+        raise
+
+    try:
+        data = r.json()
+    except Exception as e:
+        logger.error(
+            f"[GitHub] Invalid JSON in response for {repo_full}#{pr_number} (page {page}): {r.text}"
+        )
+        raise RuntimeError(f"Failed to parse JSON from {path}?page={page}") from e
+
+    if not isinstance(data, list):
+        logger.error(
+            f"[GitHub] Unexpected response type for {repo_full}#{pr_number}: {type(data)}"
+        )
+        raise ValueError(f"Expected list of dicts, got {type(data)}: {data}")
+
+    logger.debug(f"[GitHub] Page {page}: {len(data)} file(s) for {repo_full}#{pr_number}")
+    return data, r.links
+
+
+def _page_from_link(link: Optional[Dict]) -> Optional[int]:
+    """Extract the `page` query parameter from a parsed `Link` entry."""
+    if not link or "url" not in link:
+        return None
+    try:
+        return int(httpx.URL(link["url"]).params.get("page"))
+    except (TypeError, ValueError):
+        return None
+
+
+@traced("github.compare")
+async def compare_commits(token: str, repo_full: str, base: str, head: str) -> Dict:
+    """
+    Compare two commits (`base...head`) in a repository.
+
+    Args:
+        token (str): GitHub installation access token.
+        repo_full (str): Repository full name, e.g., "owner/repo".
+        base (str): Base commit SHA (e.g. the last reviewed head).
+        head (str): Head commit SHA.
+
+    Returns:
+        Dict: GitHub's comparison object. Relevant keys:
+            - status ("ahead", "behind", "diverged" or "identical")
+            - total_commits
+            - files (same shape as the PR files API, at most 300 entries)
+
+    Raises:
+        httpx.HTTPStatusError: If the request to GitHub fails.
+        RuntimeError: If the response cannot be parsed as JSON.
+    """
+    url = f"/repos/{repo_full}/compare/{base}...{head}"
+
+    logger.info(f"[GitHub] Comparing {base[:7]}...{head[:7]} in {repo_full}")
+
+    try:
+        r = await get_github_client().request("GET", url, token=token)
+        r.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"[GitHub] Failed to compare {base[:7]}...{head[:7]} in {repo_full}: "
+            f"status={e.response.status_code}, body={e.response.text}"
+        )
+        raise
 
-        logger.info(f"[GitHub] Retrieved {len(data)} file(s) for {repo_full}#{pr_number}")
-        return data
+    try:
+        data = r.json()
+    except Exception as e:
+        logger.error(f"[GitHub] Invalid JSON in compare response for {repo_full}: {r.text}")
+        raise RuntimeError(f"Failed to parse JSON from {url}") from e
 
+    logger.info(
+        f"[GitHub] Compare {base[:7]}...{head[:7]}: status={data.get('status')}, "
+        f"{len(data.get('files') or [])} file(s)"
+    )
+    return data
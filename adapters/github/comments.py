@@ -1,9 +1,12 @@
 import httpx, logging
+from typing import Dict, List
+from adapters.github.client import get_github_client
+from observability.tracing import traced
 
-GITHUB_API = "https://api.github.com"
 logger = logging.getLogger(__name__)
 
 
+@traced("github.comment")
 async def post_pr_comment(token: str, repo_full: str, pr_number: int, body: str) -> dict:
     """
     Post a general (non-inline) review comment on a pull request.
@@ -21,32 +24,140 @@ async def post_pr_comment(token: str, repo_full: str, pr_number: int, body: str)
         httpx.HTTPStatusError: If GitHub returns a 4xx/5xx error.
         RuntimeError: If JSON parsing fails.
     """
-    url = f"{GITHUB_API}/repos/{repo_full}/issues/{pr_number}/comments"
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json",
-    }
+    url = f"/repos/{repo_full}/issues/{pr_number}/comments"
 
     logger.info(f"[GitHub] Posting comment to PR #{pr_number} in {repo_full}...")
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        try:
-            r = await client.post(url, headers=headers, json={"body": body})
-            r.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                f"[GitHub] Failed to post comment to {repo_full} PR #{pr_number}: {e.response.status_code} {e.response.text}"
-            )
-            raise
-        except Exception as e:
-            logger.error(f"[GitHub] Unexpected error posting PR comment: {e}", exc_info=True)
-            raise
-
-        try:
-            data = r.json()
-        except Exception as e:
-            logger.error(f"[GitHub] Failed to parse JSON response for PR #{pr_number}: {r.text}")
-            raise RuntimeError("Invalid JSON response from GitHub.") from e
-
-        logger.info(f"[GitHub] Successfully posted comment to PR #{pr_number}.")
-        return data
+    try:
+        r = await get_github_client().request("POST", url, token=token, json={"body": body}, timeout=20)
+        r.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"[GitHub] Failed to post comment to {repo_full} PR #{pr_number}: {e.response.status_code} {e.response.text}"
+        )
+        raise
+    except Exception as e:
+        logger.error(f"[GitHub] Unexpected error posting PR comment: {e}", exc_info=True)
+        raise
+
+    try:
+        data = r.json()
+    except Exception as e:
+        logger.error(f"[GitHub] Failed to parse JSON response for PR #{pr_number}: {r.text}")
+        raise RuntimeError("Invalid JSON response from GitHub.") from e
+
+    logger.info(f"[GitHub] Successfully posted comment to PR #{pr_number}.")
+    return data
+
+
+@traced("github.comment_update")
+async def update_pr_comment(token: str, repo_full: str, comment_id: int, body: str) -> dict:
+    """
+    Replace the body of an existing PR (issue) comment.
+
+    Args:
+        token (str): GitHub installation access token.
+        repo_full (str): Repository in "owner/repo" format.
+        comment_id (int): ID of the comment returned by `post_pr_comment`.
+        body (str): New Markdown body of the comment.
+
+    Returns:
+        dict: Parsed JSON response from GitHub API.
+
+    Raises:
+        httpx.HTTPStatusError: If GitHub returns a 4xx/5xx error (404 if the comment was deleted).
+        RuntimeError: If JSON parsing fails.
+    """
+    url = f"/repos/{repo_full}/issues/comments/{comment_id}"
+
+    logger.info(f"[GitHub] Updating comment {comment_id} in {repo_full}...")
+
+    try:
+        r = await get_github_client().request("PATCH", url, token=token, json={"body": body}, timeout=20)
+        r.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"[GitHub] Failed to update comment {comment_id} in {repo_full}: {e.response.status_code} {e.response.text}"
+        )
+        raise
+    except Exception as e:
+        logger.error(f"[GitHub] Unexpected error updating PR comment: {e}", exc_info=True)
+        raise
+
+    try:
+        data = r.json()
+    except Exception as e:
+        logger.error(f"[GitHub] Failed to parse JSON response for comment {comment_id}: {r.text}")
+        raise RuntimeError("Invalid JSON response from GitHub.") from e
+
+    logger.info(f"[GitHub] Successfully updated comment {comment_id}.")
+    return data
+
+
+@traced("github.review")
+async def post_pr_review(
+    token: str,
+    repo_full: str,
+    pr_number: int,
+    commit_id: str,
+    body: str,
+    comments: List[Dict],
+    event: str = "COMMENT",
+) -> dict:
+    """
+    Submit a pull request review with all its inline comments in one request.
+
+    GitHub creates the review and every line comment atomically, so the API
+    cost is one call however many findings there are. If any comment does
+    not resolve to a line of the diff, GitHub rejects the whole review (422).
+
+    Args:
+        token (str): GitHub installation access token.
+        repo_full (str): Repository in "owner/repo" format.
+        pr_number (int): Pull request number.
+        commit_id (str): Commit SHA the comment lines refer to (the reviewed head).
+        body (str): Markdown body of the review.
+        comments (List[Dict]): Line comments, each {"path", "line", "body"} and
+            optionally "side" (default "RIGHT", the new version of the file).
+        event (str): "COMMENT", "APPROVE" or "REQUEST_CHANGES".
+
+    Returns:
+        dict: Parsed JSON response from GitHub API (the created review).
+
+    Raises:
+        httpx.HTTPStatusError: If GitHub returns a 4xx/5xx error.
+        RuntimeError: If JSON parsing fails.
+    """
+    url = f"/repos/{repo_full}/pulls/{pr_number}/reviews"
+    payload = {
+        "commit_id": commit_id,
+        "body": body,
+        "event": event,
+        "comments": [
+            {"path": c["path"], "line": c["line"], "side": c.get("side", "RIGHT"), "body": c["body"]}
+            for c in comments
+        ],
+    }
+
+    logger.info(f"[GitHub] Submitting review with {len(comments)} inline comment(s) to PR #{pr_number} in {repo_full}...")
+
+    try:
+        r = await get_github_client().request("POST", url, token=token, json=payload, timeout=30)
+        r.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"[GitHub] Failed to submit review to {repo_full} PR #{pr_number}: {e.response.status_code} {e.response.text}"
+        )
+        raise
+    except Exception as e:
+        logger.error(f"[GitHub] Unexpected error submitting PR review: {e}", exc_info=True)
+        raise
+
+    try:
+        data = r.json()
+    except Exception as e:
+        logger.error(f"[GitHub] Failed to parse JSON response for review on PR #{pr_number}: {r.text}")
+        raise RuntimeError("Invalid JSON response from GitHub.") from e
+
+    logger.info(f"[GitHub] Successfully submitted review {data.get('id')} to PR #{pr_number}.")
+    return data
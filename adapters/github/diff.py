@@ -0,0 +1,198 @@
+import codecs, logging, re
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class DiffParser:
+    """
+        Incremental parser for `git diff` output (GitHub's `application/vnd.github.v3.diff`).
+
+        Feed it the response body in arbitrary chunks; every file is returned
+        as soon as the next `diff --git` header (or `close()`) ends it, so a
+        multi-MB diff is never held in memory as a whole. Files come out in the
+        shape of the PR files API (`filename`, `status`, `additions`,
+        `deletions`, `changes`, `patch`, `previous_filename`), plus `hunks`:
+
+            {"old_start", "old_lines", "new_start", "new_lines", "position"}
+
+        where `position` is the hunk header's line offset within `patch`
+        (GitHub's review-comment position counts from the line after the
+        first header).
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        self._file: Optional[Dict] = None
+        self._patch: List[str] = []
+        self._old_left = self._new_left = 0  # lines still expected in the current hunk
+        self.files_parsed = 0
+
+    def feed(self, data: Union[bytes, str]) -> List[Dict]:
+        """Parse the next chunk of the diff; returns the files it completed."""
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        self._buffer += data
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()
+        done = []
+        for line in lines:
+            finished = self._line(line)
+            if finished is not None:
+                done.append(finished)
+        return done
+
+    def close(self) -> List[Dict]:
+        """Flush the last (partial) line and file."""
+        done = self.feed(self._decoder.decode(b"", final=True))
+        if self._buffer:
+            finished = self._line(self._buffer)
+            self._buffer = ""
+            if finished is not None:
+                done.append(finished)
+        if self._file is not None:
+            done.append(self._finish())
+        return done
+
+    def _line(self, line: str) -> Optional[Dict]:
+        if self._old_left > 0 or self._new_left > 0:
+            return self._hunk_line(line)
+
+        if line.startswith("diff --git "):
+            finished = self._finish() if self._file is not None else None
+            self._start(line)
+            return finished
+        if self._file is None:
+            return None  # preamble before the first file
+
+        if line.startswith("@@"):
+            self._hunk_header(line)
+        elif line.startswith("\\") and self._patch:
+            self._patch.append(line)  # "\ No newline at end of file" after the last hunk
+        elif not self._patch:
+            self._header(line)
+        return None
+
+    def _start(self, line: str) -> None:
+        old, new = _split_git_paths(line[len("diff --git "):])
+        self._file = {"filename": new, "status": "modified", "additions": 0, "deletions": 0, "hunks": [], "_old": old}
+        self._patch = []
+
+    def _header(self, line: str) -> None:
+        f = self._file
+        if line.startswith("new file mode"):
+            f["status"] = "added"
+        elif line.startswith("deleted file mode"):
+            f["status"] = "removed"
+        elif line.startswith("rename from "):
+            f["status"], f["previous_filename"] = "renamed", _unquote(line[len("rename from "):])
+        elif line.startswith("rename to "):
+            f["filename"] = _unquote(line[len("rename to "):])
+        elif line.startswith("copy from "):
+            f["status"], f["previous_filename"] = "copied", _unquote(line[len("copy from "):])
+        elif line.startswith("copy to "):
+            f["filename"] = _unquote(line[len("copy to "):])
+        elif line.startswith("--- ") and line[4:] != "/dev/null":
+            f["_old"] = _strip_prefix(line[4:], "a/")
+        elif line.startswith("+++ ") and line[4:] != "/dev/null":
+            f["filename"] = _strip_prefix(line[4:], "b/")
+        # Anything else ("index ...", modes, "Binary files ... differ") carries nothing the review uses
+
+    def _hunk_header(self, line: str) -> None:
+        m = HUNK_HEADER.match(line)
+        if not m:
+            logger.warning(f"[GitHubDiff] Malformed hunk header in {self._file['filename']}: {line[:80]}")
+            return
+        old_start, old_lines, new_start, new_lines = (int(g) if g is not None else 1 for g in m.groups())
+        self._file["hunks"].append({
+            "old_start": old_start, "old_lines": old_lines,
+            "new_start": new_start, "new_lines": new_lines,
+            "position": len(self._patch),
+        })
+        self._patch.append(line)
+        self._old_left, self._new_left = old_lines, new_lines
+
+    def _hunk_line(self, line: str) -> Optional[Dict]:
+        tag = line[:1]
+        if tag == "+":
+            self._new_left -= 1
+            self._file["additions"] += 1
+        elif tag == "-":
+            self._old_left -= 1
+            self._file["deletions"] += 1
+        elif tag == " " or line == "":
+            # Some tools trim the space of empty context lines
+            self._old_left -= 1
+            self._new_left -= 1
+        elif tag != "\\":
+            # Counts did not add up: treat the line as outside the hunk
+            logger.warning(f"[GitHubDiff] Hunk in {self._file['filename']} ended early")
+            self._old_left = self._new_left = 0
+            return self._line(line)
+        self._patch.append(line)
+        return None
+
+    def _finish(self) -> Dict:
+        f = self._file
+        old = f.pop("_old")
+        if f["status"] == "removed":
+            f["filename"] = old
+        f["changes"] = f["additions"] + f["deletions"]
+        if self._patch:
+            f["patch"] = "\n".join(self._patch)
+        self._file, self._patch = None, []
+        self._old_left = self._new_left = 0
+        self.files_parsed += 1
+        return f
+
+
+def _strip_prefix(path: str, prefix: str) -> str:
+    path = _unquote(path.split("\t", 1)[0])
+    return path[len(prefix):] if path.startswith(prefix) else path
+
+
+def _unquote(path: str) -> str:
+    # git C-quotes paths with special characters, escaping non-ASCII bytes as octal
+    if len(path) >= 2 and path[0] == path[-1] == '"':
+        return codecs.escape_decode(path[1:-1].encode())[0].decode("utf-8", "replace")
+    return path
+
+
+def _split_git_paths(paths: str):
+    """Old and new path from a `diff --git a/x b/y` header (exact for the usual same-path case)."""
+    if paths.startswith('"'):
+        end = paths.find('" ', 1)
+        return _strip_prefix(paths[:end + 1], "a/"), _strip_prefix(paths[end + 2:], "b/")
+    half = len(paths) // 2
+    if paths[half:half + 3] == " b/" and paths[2:half] == paths[half + 3:]:
+        return paths[2:half], paths[half + 3:]
+    old, _, new = paths.partition(" b/")
+    return _strip_prefix(old, "a/"), new
+
+
+def line_positions(patch: str) -> Dict[int, int]:
+    """
+        Map new-file line numbers to diff positions for a file's `patch`.
+
+        Only lines present on the new side of the diff (added or context)
+        can carry a line comment; position 1 is the line after the first
+        `@@` header, and later headers count as positions too.
+
+        Returns:
+            Dict[int, int]: {line number in the new file: position in `patch`}
+    """
+    positions: Dict[int, int] = {}
+    new_line = 0
+    for position, line in enumerate((patch or "").rstrip("\n").split("\n")):
+        if line.startswith("@@"):
+            m = HUNK_HEADER.match(line)
+            new_line = int(m.group(3)) if m else new_line
+            continue
+        tag = line[:1]
+        if tag in ("+", " ") or line == "":
+            positions[new_line] = position
+            new_line += 1
+    return positions
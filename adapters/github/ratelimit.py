@@ -0,0 +1,287 @@
+import os, time, asyncio, hashlib, logging, threading
+from collections import OrderedDict
+from typing import Dict, Optional
+import httpx
+from observability.metrics import github_ratelimit_hits_total, github_ratelimit_remaining, github_ratelimit_wait_seconds
+
+logger = logging.getLogger(__name__)
+
+RATELIMIT_ENABLED = os.getenv("GITHUB_RATELIMIT_ENABLED", "true").lower() == "true"
+RATELIMIT_REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RATELIMIT_HOURLY = int(os.getenv("GITHUB_RATELIMIT_HOURLY", "5000"))  # assumed budget until GitHub reports one
+RATELIMIT_RESERVE = int(os.getenv("GITHUB_RATELIMIT_RESERVE", "100"))  # calls left untouched until reset
+# Once the budget above the reserve drops to this many calls, the rest is spread evenly until the reset
+RATELIMIT_PACE_BELOW = int(os.getenv("GITHUB_RATELIMIT_PACE_BELOW", "500"))
+RATELIMIT_MAX_WAIT = float(os.getenv("GITHUB_RATELIMIT_MAX_WAIT", "30"))
+SECONDARY_LIMIT_BACKOFF = 60  # GitHub asks for at least a minute when a secondary limit has no Retry-After
+_WINDOW = 3600  # GitHub's primary limits reset hourly
+_BUCKET_TTL = 2 * 3600
+_REDIS_RETRY_AFTER = 30  # seconds to use the in-process buckets after a Redis failure
+_TOKEN_MAP_SIZE = 1024
+
+# Spend one call from the budget and return the wait. Calls are free while
+# the budget is well above the reserve; near it they get evenly spaced slots
+# until the reset, and past it they wait for the reset. Callers that would
+# wait longer than max_wait take nothing.
+_ACQUIRE_LUA = """
+local b = redis.call('HMGET', KEYS[1], 'remaining', 'reset', 'next_at', 'blocked_until')
+local now, hourly, reserve, pace_below, max_wait = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+local remaining = tonumber(b[1]) or hourly
+local reset = tonumber(b[2]) or (now + tonumber(ARGV[6]))
+local next_at = tonumber(b[3]) or now
+if now >= reset then remaining, reset, next_at = hourly, now + tonumber(ARGV[6]), now end
+local spendable = remaining - reserve
+local wait = 0
+if spendable <= 0 then
+  wait = reset - now
+elseif spendable <= pace_below then
+  local slot = math.max(now, next_at)
+  wait = slot - now
+  next_at = slot + (reset - slot) / spendable
+end
+local blocked = tonumber(b[4]) or 0
+if blocked - now > wait then wait = blocked - now end
+if wait <= max_wait then
+  redis.call('HSET', KEYS[1], 'remaining', remaining - 1, 'reset', reset, 'next_at', next_at)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[7])
+return tostring(wait)
+"""
+
+# Apply what GitHub reported: the remaining budget of the current window and any block.
+# Within a window the lower count wins (responses to calls already counted here arrive late).
+_OBSERVE_LUA = """
+if ARGV[2] ~= '' and ARGV[3] ~= '' then
+  local remaining, reset = tonumber(ARGV[2]), tonumber(ARGV[3])
+  local b = redis.call('HMGET', KEYS[1], 'remaining', 'reset')
+  local known = tonumber(b[1])
+  if known == nil or tonumber(b[2]) ~= reset or remaining < known then
+    redis.call('HSET', KEYS[1], 'remaining', remaining, 'reset', reset)
+  end
+end
+if ARGV[4] ~= '' then
+  local blocked = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+  if tonumber(ARGV[4]) > blocked then redis.call('HSET', KEYS[1], 'blocked_until', ARGV[4]) end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return 1
+"""
+
+
+class RateLimited(Exception):
+    """Raised when a GitHub call would have to wait longer than the governor allows."""
+
+    def __init__(self, bucket: str, retry_after: float):
+        super().__init__(f"GitHub rate limit for {bucket}: retry in {retry_after:.0f}s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+
+# token -> installation ID, filled in by adapters.github.auth
+_token_installations: "OrderedDict[str, int]" = OrderedDict()
+_token_lock = threading.Lock()
+
+
+def register_token(token: str, installation_id: int) -> None:
+    """Associate an installation token with its installation so its calls share one bucket."""
+    with _token_lock:
+        _token_installations[token] = installation_id
+        _token_installations.move_to_end(token)
+        while len(_token_installations) > _TOKEN_MAP_SIZE:
+            _token_installations.popitem(last=False)
+
+
+def bucket_for(token: Optional[str], auth_scheme: str = "token") -> str:
+    """Rate-limit bucket for a credential: the installation, the App itself, or an unknown token."""
+    if auth_scheme == "Bearer":
+        return "app"
+    if not token:
+        return "anonymous"
+    with _token_lock:
+        installation_id = _token_installations.get(token)
+    if installation_id is not None:
+        return str(installation_id)
+    return "token-" + hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+class _LocalBuckets:
+    """In-process fallback with the same semantics as the Redis scripts (used while Redis is unreachable)."""
+
+    def __init__(self):
+        self._state: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, bucket: str, now: float, hourly: int, reserve: int, pace_below: int, max_wait: float) -> float:
+        with self._lock:
+            b = self._state.setdefault(bucket, {})
+            if now >= b.get("reset", float("inf")):
+                b.update(remaining=hourly, reset=now + _WINDOW, next_at=now)
+            remaining = b.get("remaining", hourly)
+            reset = b.get("reset", now + _WINDOW)
+            next_at = b.get("next_at", now)
+            spendable = remaining - reserve
+            wait = 0.0
+            if spendable <= 0:
+                wait = reset - now
+            elif spendable <= pace_below:
+                slot = max(now, next_at)
+                wait = slot - now
+                next_at = slot + (reset - slot) / spendable
+            wait = max(wait, b.get("blocked_until", 0.0) - now)
+            if wait <= max_wait:
+                b.update(remaining=remaining - 1, reset=reset, next_at=next_at)
+            return wait
+
+    def observe(self, bucket: str, now: float, remaining: Optional[int], reset: Optional[int],
+                blocked_until: Optional[float]) -> None:
+        with self._lock:
+            b = self._state.setdefault(bucket, {})
+            if remaining is not None and reset is not None:
+                if "remaining" not in b or b.get("reset") != reset or remaining < b["remaining"]:
+                    b.update(remaining=remaining, reset=reset)
+            if blocked_until is not None and blocked_until > b.get("blocked_until", 0.0):
+                b["blocked_until"] = blocked_until
+
+
+class RateLimitGovernor:
+    """
+    Per-installation request budget shared by all workers through Redis.
+
+    Every GitHub call spends one call from its installation's budget before
+    it is sent. The budget is seeded from `X-RateLimit-Remaining` and
+    `X-RateLimit-Reset` (GitHub's hourly default until a response reports
+    them), and calls spend it without delay. Once fewer than `pace_below`
+    calls are left above the reserve, the remainder is spread evenly until
+    the reset, so workers slow down before the limit is hit instead of
+    after. Past the reserve, calls wait for the reset. A `Retry-After` or
+    exhausted budget blocks the bucket until it lifts.
+
+    Callers are delayed up to `max_wait` seconds; longer waits raise
+    `RateLimited` so tasks can retry later instead of holding a worker slot.
+    If Redis is unavailable the governor falls back to in-process buckets.
+    """
+
+    def __init__(
+        self,
+        redis_url: str = RATELIMIT_REDIS_URL,
+        hourly: int = RATELIMIT_HOURLY,
+        reserve: int = RATELIMIT_RESERVE,
+        pace_below: int = RATELIMIT_PACE_BELOW,
+        max_wait: float = RATELIMIT_MAX_WAIT,
+    ):
+        self.redis_url = redis_url
+        self.hourly = hourly
+        self.reserve = reserve
+        self.pace_below = pace_below
+        self.max_wait = max_wait
+        self._local = _LocalBuckets()
+        self._redis = None
+        self._redis_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._redis_down_until = 0.0
+
+    async def acquire(self, bucket: str) -> float:
+        """
+        Spend one call from `bucket`'s budget, sleeping if calls are being paced.
+
+        Returns:
+            float: Seconds waited.
+
+        Raises:
+            RateLimited: If the wait would exceed `max_wait`.
+        """
+        now = time.time()
+        wait = await self._call(
+            "acquire", bucket,
+            lambda: self._local.acquire(bucket, now, self.hourly, self.reserve, self.pace_below, self.max_wait),
+            now, self.hourly, self.reserve, self.pace_below, self.max_wait, _WINDOW, _BUCKET_TTL,
+        )
+        wait = float(wait)
+        if wait > self.max_wait:
+            raise RateLimited(bucket, wait)
+        github_ratelimit_wait_seconds.observe(wait)
+        if wait > 0:
+            logger.debug(f"[GitHubRateLimit] Pacing {bucket}: waiting {wait:.2f}s")
+            await asyncio.sleep(wait)
+        return wait
+
+    async def observe(self, bucket: str, response: httpx.Response) -> Optional[float]:
+        """
+        Feed a response's rate-limit headers back into `bucket`.
+
+        Returns:
+            Optional[float]: Seconds until the limit lifts if the response was
+            rejected by a (primary or secondary) rate limit, else None.
+        """
+        now = time.time()
+        remaining = _int_header(response, "X-RateLimit-Remaining")
+        reset = _int_header(response, "X-RateLimit-Reset")
+        retry_after = _int_header(response, "Retry-After")
+        if remaining is not None:
+            github_ratelimit_remaining.labels(installation=bucket).set(remaining)
+
+        blocked_until = None
+        limited = response.status_code in (403, 429) and (retry_after is not None or remaining == 0 or _mentions_rate_limit(response))
+        if retry_after is not None:
+            blocked_until = now + retry_after
+        elif limited and remaining == 0 and reset is not None:
+            blocked_until = float(reset)
+        elif limited:
+            blocked_until = now + SECONDARY_LIMIT_BACKOFF
+        elif remaining is not None and remaining <= 0 and reset is not None:
+            blocked_until = float(reset)
+
+        if limited:
+            github_ratelimit_hits_total.labels(kind="primary" if remaining == 0 else "secondary").inc()
+            logger.warning(f"[GitHubRateLimit] Rate limited on {bucket} (HTTP {response.status_code}); blocked for {blocked_until - now:.0f}s")
+
+        if (remaining is not None and reset is not None) or blocked_until is not None:
+            await self._call(
+                "observe", bucket,
+                lambda: self._local.observe(bucket, now, remaining, reset, blocked_until),
+                now, "" if remaining is None or reset is None else remaining,
+                "" if remaining is None or reset is None else reset,
+                "" if blocked_until is None else blocked_until, _BUCKET_TTL,
+            )
+        return blocked_until - now if limited else None
+
+    async def _call(self, script: str, bucket: str, local, *args):
+        """Run a bucket script in Redis, or the local equivalent while Redis is unavailable."""
+        if time.monotonic() >= self._redis_down_until:
+            try:
+                scripts = self._scripts()
+                return await scripts[script](keys=[f"pp:gh:ratelimit:{bucket}"], args=list(args))
+            except Exception as e:
+                self._redis_down_until = time.monotonic() + _REDIS_RETRY_AFTER
+                logger.warning(f"[GitHubRateLimit] Redis unavailable, using in-process buckets for {_REDIS_RETRY_AFTER}s: {e}")
+        return local()
+
+    def _scripts(self):
+        # redis.asyncio connections belong to the loop that opened them (same rule as the HTTP pool)
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._redis_loop is not loop:
+            import redis.asyncio as aioredis
+            client = aioredis.from_url(self.redis_url, socket_connect_timeout=1, socket_timeout=1)
+            self._redis = {
+                "acquire": client.register_script(_ACQUIRE_LUA),
+                "observe": client.register_script(_OBSERVE_LUA),
+            }
+            self._redis_loop = loop
+        return self._redis
+
+
+def _int_header(response: httpx.Response, name: str) -> Optional[int]:
+    value = response.headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _mentions_rate_limit(response: httpx.Response) -> bool:
+    try:
+        return "rate limit" in response.text.lower()
+    except Exception:
+        return False
+
+
+governor = RateLimitGovernor()
@@ -0,0 +1,94 @@
+"""Shared helpers for the benchmark scripts."""
+import contextlib, hashlib, hmac, json, os, socket, subprocess, sys, time, uuid
+from typing import Dict, Iterator, List, Sequence
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return
+        time.sleep(0.05)
+    raise RuntimeError(f"Nothing listening on 127.0.0.1:{port} after {timeout}s")
+
+
+@contextlib.contextmanager
+def run_module(module: str, *args: str, port: int, env: Dict[str, str] = None) -> Iterator[subprocess.Popen]:
+    """Run `python -m module ...` as a subprocess for the duration of the block."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", module, "--port", str(port), *args],
+        cwd=REPO_ROOT,
+        env={**os.environ, **(env or {})},
+    )
+    try:
+        wait_for_port(port)
+        yield proc
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def pr_event(repo_full: str = "octo/bench", pr_number: int = 1, head_sha: str = None,
+             action: str = "synchronize", before_sha: str = None, installation_id: int = 1) -> bytes:
+    """A minimal `pull_request` webhook body with the fields PatchPilot reads (plus some padding)."""
+    head_sha = head_sha or uuid.uuid4().hex + uuid.uuid4().hex[:8]
+    return json.dumps({
+        "action": action,
+        "number": pr_number,
+        "before": before_sha or "0" * 40,
+        "after": head_sha,
+        "pull_request": {
+            "number": pr_number,
+            "head": {"sha": head_sha, "ref": "feature"},
+            "base": {"sha": "f" * 40, "ref": "main"},
+            "title": "Benchmark PR",
+            "body": "x" * 2000,
+        },
+        "repository": {"full_name": repo_full, "id": 1},
+        "installation": {"id": installation_id},
+        "sender": {"login": "bench"},
+    }).encode()
+
+
+def signed_headers(body: bytes, secret: bytes, event: str = "pull_request") -> Dict[str, str]:
+    """Headers GitHub sends with a delivery, signed with `secret`."""
+    digest = hmac.new(secret, msg=body, digestmod=hashlib.sha256).hexdigest()
+    return {
+        "Content-Type": "application/json",
+        "X-GitHub-Event": event,
+        "X-GitHub-Delivery": str(uuid.uuid4()),
+        "X-Hub-Signature-256": f"sha256={digest}",
+    }
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def summarize(name: str, latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Throughput + latency percentiles (milliseconds) for one benchmark run."""
+    return {
+        "name": name,
+        "count": len(latencies),
+        "per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def print_table(rows: List[Dict[str, float]]) -> None:
+    print(f"{'scenario':<28}{'count':>8}{'per_sec':>12}{'p50_ms':>10}{'p99_ms':>10}")
+    for r in rows:
+        print(f"{r['name']:<28}{r['count']:>8}{r['per_sec']:>12.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
@@ -0,0 +1,83 @@
+"""
+Paginated PR files API vs. one streamed unified diff, against the local GitHub stub.
+
+Each fetch drains `iter_pr_files` for one synthetic PR with `--files` changed
+files, once per source. Reported per source: whole-fetch latency, time to the
+first file, and GitHub requests per PR.
+
+    python -m benchmarks.diff_fetch_bench --files 1000 --prs 50 --concurrency 5 --latency-ms 20
+"""
+import argparse, asyncio, os, time
+import httpx
+from benchmarks.common import free_port, run_module, summarize, print_table
+
+
+async def _fetch(source: str, base: str, files: int, prs: int, concurrency: int):
+    # Imported lazily: the adapters read GITHUB_API_URL at import time.
+    from adapters.github.client import iter_pr_files
+
+    sem = asyncio.Semaphore(concurrency)
+    totals, firsts = [], []
+
+    async def one(pr_number: int):
+        async with sem:
+            t0 = time.perf_counter()
+            count = 0
+            async for _ in iter_pr_files("t", "o/r", pr_number, source=source):
+                if not count:
+                    firsts.append(time.perf_counter() - t0)
+                count += 1
+            totals.append(time.perf_counter() - t0)
+            if count != files:
+                raise RuntimeError(f"{source}: expected {files} files, got {count}")
+
+    async with httpx.AsyncClient() as c:
+        before = (await c.get(f"{base}/_stats")).json()
+        start = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(1, prs + 1)))
+        elapsed = time.perf_counter() - start
+        after = (await c.get(f"{base}/_stats")).json()
+
+    requests = (after["files"] + after["diff"] - before["files"] - before["diff"]) / prs
+    return (
+        summarize(f"{source}", totals, elapsed),
+        summarize(f"{source} (first file)", firsts, elapsed),
+        requests,
+    )
+
+
+async def _main(args, base: str) -> None:
+    from adapters.github.client import close_github_client
+
+    rows, requests = [], {}
+    for source in ("files", "diff"):
+        total, first, requests[source] = await _fetch(source, base, args.files, args.prs, args.concurrency)
+        rows += [total, first]
+    await close_github_client()
+
+    print_table(rows)
+    print()
+    for source, count in requests.items():
+        print(f"{source:<28}{count:>8.1f} GitHub request(s) per PR")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--prs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    os.environ["GITHUB_API_URL"] = base
+    os.environ.setdefault("GITHUB_RATELIMIT_ENABLED", "false")  # measure the fetch, not the governor
+
+    stub_args = ("--latency-ms", str(args.latency_ms), "--files-per-pr", str(args.files))
+    with run_module("benchmarks.stubs.github", *stub_args, port=port):
+        asyncio.run(_main(args, base))
+
+
+if __name__ == "__main__":
+    main()
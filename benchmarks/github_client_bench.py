@@ -0,0 +1,80 @@
+"""
+Pooled GitHubClient vs. per-call httpx.AsyncClient against the local GitHub stub.
+
+Each "review" performs the three GitHub calls a review task makes:
+token exchange, PR file listing and comment post. The rate-limit governor
+is off so the pool itself is measured; `--governor` adds it to the pooled run.
+
+    python -m benchmarks.github_client_bench --reviews 500 --concurrency 20 --latency-ms 5
+"""
+import argparse, asyncio, os, time
+import httpx
+from benchmarks.common import free_port, run_module, summarize, print_table
+
+
+async def _review_per_call(base: str) -> None:
+    """The pre-pool behaviour: a fresh AsyncClient (and connection) per call."""
+    async with httpx.AsyncClient(timeout=20) as c:
+        (await c.post(f"{base}/app/installations/1/access_tokens", headers={"Authorization": "Bearer jwt"})).raise_for_status()
+    async with httpx.AsyncClient(timeout=30) as c:
+        (await c.get(f"{base}/repos/o/r/pulls/1/files?per_page=100", headers={"Authorization": "token t"})).raise_for_status()
+    async with httpx.AsyncClient(timeout=20) as c:
+        (await c.post(f"{base}/repos/o/r/issues/1/comments", headers={"Authorization": "token t"}, json={"body": "x"})).raise_for_status()
+
+
+async def _review_pooled(base: str) -> None:
+    # Imported lazily: the adapters read GITHUB_API_URL at import time.
+    from adapters.github.client import get_github_client, list_pr_files
+    from adapters.github.comments import post_pr_comment
+
+    client = get_github_client()
+    (await client.request("POST", "/app/installations/1/access_tokens", token="jwt", auth_scheme="Bearer")).raise_for_status()
+    await list_pr_files("t", "o/r", 1)
+    await post_pr_comment("t", "o/r", 1, "x")
+
+
+async def _drive(name: str, fn, base: str, reviews: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            await fn(base)
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(reviews)))
+    return summarize(name, latencies, time.perf_counter() - start)
+
+
+async def _main(args, base: str) -> None:
+    from adapters.github.client import close_github_client
+
+    rows = [
+        await _drive("per-call clients", _review_per_call, base, args.reviews, args.concurrency),
+        await _drive("pooled GitHubClient" + (" +gov" if args.governor else ""), _review_pooled, base, args.reviews, args.concurrency),
+    ]
+    await close_github_client()
+    print_table(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reviews", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--governor", action="store_true", help="pace the pooled client with the rate-limit governor")
+    args = parser.parse_args()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    os.environ["GITHUB_API_URL"] = base
+    os.environ["GITHUB_RATELIMIT_ENABLED"] = "true" if args.governor else "false"
+
+    with run_module("benchmarks.stubs.github", "--latency-ms", str(args.latency_ms), port=port):
+        asyncio.run(_main(args, base))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+LLM backend pool routing against local fake inference servers.
+
+Three fake servers with 4 slots each: a fast one, a slow one and a flaky one
+(failing a share of requests). Each scenario sends the same requests through
+a BackendPool and reports throughput, latency and where requests went:
+- single: only the fast server (the pre-pool setup)
+- least_outstanding / ewma: all three servers, with failover and ejection
+
+    python -m benchmarks.llm_routing_bench --requests 200 --concurrency 16
+"""
+import argparse, asyncio, contextlib, time
+import httpx
+from benchmarks.common import free_port, run_module, summarize, print_table
+
+SERVERS = {
+    "fast": ["--latency-ms", "150", "--capacity", "4"],
+    "slow": ["--latency-ms", "600", "--capacity", "4"],
+    "flaky": ["--latency-ms", "150", "--capacity", "4", "--fail-rate", "0.3"],
+}
+
+
+async def _drive(name: str, pool, requests: int, concurrency: int) -> dict:
+    from services.prompts import REVIEW_AGENT_PROMPT
+
+    prompt = REVIEW_AGENT_PROMPT("a" * 40, "File: app.py\nPatch:\n@@ -1 +1 @@\n-x = 1\n+x = 2\n")
+    sem = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await pool.ainvoke(prompt)
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    row = summarize(name, latencies, time.perf_counter() - start)
+    if failures:
+        print(f"[{name}] {failures} request(s) failed on every endpoint")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    from services.review.backends import BackendPool, Endpoint
+
+    ports = {name: free_port() for name in SERVERS}
+    urls = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+    rows, spread = [], {}
+    with contextlib.ExitStack() as stack:
+        for name, flags in SERVERS.items():
+            stack.enter_context(run_module("benchmarks.stubs.llm", *flags, port=ports[name]))
+
+        scenarios = {
+            "single": (["fast"], "least_outstanding"),
+            "least_outstanding": (list(SERVERS), "least_outstanding"),
+            "ewma": (list(SERVERS), "ewma"),
+        }
+        for scenario, (servers, routing) in scenarios.items():
+            endpoints = [Endpoint("ollama", urls[s], "gemma3:4b", max_concurrency=4) for s in servers]
+            pool = BackendPool(endpoints, routing=routing, eject_after=3, eject_seconds=2, health_interval=0)
+            before = {s: httpx.get(f"{urls[s]}/_stats").json()["requests"] for s in SERVERS}
+            rows.append(asyncio.run(_drive(scenario, pool, args.requests, args.concurrency)))
+            spread[scenario] = {s: httpx.get(f"{urls[s]}/_stats").json()["requests"] - before[s] for s in SERVERS}
+
+    print_table(rows)
+    print()
+    print(f"{'requests sent to':<28}" + "".join(f"{s:>10}" for s in SERVERS))
+    for scenario, counts in spread.items():
+        print(f"{scenario:<28}" + "".join(f"{counts[s]:>10}" for s in SERVERS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+End-to-end load test: signed webhooks in, review comments out, fully offline.
+
+Starts the GitHub stub, the LLM stub and the web app under uvicorn (plus
+`io` and `llm` Celery workers in redis mode). It then fires `--deliveries`
+signed `opened` events for distinct PRs at `--rate` per second (open loop)
+and waits until every PR has its review comment. Reported:
+
+  - ingest: webhook ack latency and achieved delivery rate
+  - end to end: delivery sent -> review comment posted (percentiles, reviews/s)
+  - queue wait and run time per pipeline stage (from the aggregated /metrics)
+  - GitHub and LLM requests per review
+
+Modes:
+  eager  the pipeline runs inline in the web process (Celery eager mode); no Redis needed.
+         Acks then include the whole review, and queue wait is zero.
+  redis  web + Celery workers over the Redis at REDIS_URL, as deployed.
+
+    python -m benchmarks.load_bench --mode eager --deliveries 200 --rate 20
+    python -m benchmarks.load_bench --mode redis --deliveries 500 --rate 50 --llm-concurrency 4
+"""
+import argparse, asyncio, contextlib, os, subprocess, sys, tempfile, time, uuid
+from typing import Dict, Iterator, List, Tuple
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+from benchmarks.common import REPO_ROOT, free_port, percentile, pr_event, print_table, run_module, signed_headers, summarize
+
+SECRET = b"load-secret"
+WARMUP_PR = 100000  # reviewed before timing starts: imports, model load, token mint, worker start-up
+
+
+def _private_key_pem() -> str:
+    """A throwaway App key: the stub accepts any JWT, but the adapters still sign one."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    ).decode()
+
+
+@contextlib.contextmanager
+def _celery_worker(queue: str, concurrency: int, env: Dict[str, str]) -> Iterator[subprocess.Popen]:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "celery", "-A", "project", "worker", "-Q", queue, "-P", "threads",
+         "-c", str(concurrency), "-n", f"{queue}-load@%h", "-l", "warning"],
+        cwd=REPO_ROOT, env={**os.environ, **env},
+    )
+    try:
+        yield proc
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+# --- /metrics parsing ---
+
+def _histograms(text: str, name: str, label: str) -> Dict[str, List[Tuple[float, float]]]:
+    """Cumulative buckets [(le, count)] of histogram `name`, per value of `label`."""
+    out: Dict[str, List[Tuple[float, float]]] = {}
+    for family in text_string_to_metric_families(text):
+        if family.name != name:
+            continue
+        for sample in family.samples:
+            if sample.name == f"{name}_bucket":
+                out.setdefault(sample.labels.get(label, ""), []).append((float(sample.labels["le"]), sample.value))
+    return {k: sorted(v) for k, v in out.items()}
+
+
+def _delta(after: Dict, before: Dict) -> Dict[str, List[Tuple[float, float]]]:
+    result = {}
+    for key, buckets in after.items():
+        base = dict(before.get(key, []))
+        result[key] = [(le, count - base.get(le, 0.0)) for le, count in buckets]
+    return result
+
+
+def _quantile(buckets: List[Tuple[float, float]], q: float) -> float:
+    """Prometheus-style histogram_quantile: linear interpolation inside the bucket holding the rank."""
+    if not buckets or buckets[-1][1] <= 0:
+        return 0.0
+    rank = q * buckets[-1][1]
+    prev_le, prev_count = 0.0, 0.0
+    for le, count in buckets:
+        if count >= rank:
+            if le == float("inf"):
+                return prev_le
+            if count == prev_count:
+                return le
+            return prev_le + (le - prev_le) * (rank - prev_count) / (count - prev_count)
+        prev_le, prev_count = le, count
+    return prev_le
+
+
+# --- driver ---
+
+async def _wait_published(client: httpx.AsyncClient, github: str, prs: List[str], timeout: float) -> Dict[str, float]:
+    deadline = time.monotonic() + timeout
+    while True:
+        published = (await client.get(f"{github}/_published")).json()
+        if all(pr in published for pr in prs) or time.monotonic() > deadline:
+            return published
+        await asyncio.sleep(0.1)
+
+
+async def _drive(args, web: str, github: str, llm: str) -> None:
+    repo = f"octo/load-{uuid.uuid4().hex[:8]}"  # fresh PR state on a shared Redis
+    url = f"{web}/webhook/"
+    limits = httpx.Limits(max_connections=max(args.deliveries, 10), max_keepalive_connections=100)
+
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        async def deliver(pr_number: int) -> Tuple[float, float, int]:
+            body = pr_event(repo, pr_number=pr_number, action="opened")
+            sent = time.time()
+            t0 = time.perf_counter()
+            r = await client.post(url, content=body, headers=signed_headers(body, SECRET))
+            return sent, time.perf_counter() - t0, r.status_code
+
+        # Warm-up review, excluded from every number below
+        await deliver(WARMUP_PR)
+        warmup = await _wait_published(client, github, [f"{repo}#{WARMUP_PR}"], args.timeout)
+        if f"{repo}#{WARMUP_PR}" not in warmup:
+            raise RuntimeError(f"Warm-up review did not complete within {args.timeout}s")
+        gh_before = (await client.get(f"{github}/_stats")).json()
+        llm_before = (await client.get(f"{llm}/_stats")).json()
+        metrics_before = (await client.get(f"{web}/metrics/")).text
+
+        # Open loop: deliveries go out on schedule whether or not earlier ones were acked
+        start = time.perf_counter()
+        tasks = []
+        for i in range(args.deliveries):
+            await asyncio.sleep(max(0.0, start + i / args.rate - time.perf_counter()))
+            tasks.append(asyncio.create_task(deliver(i + 1)))
+        results = await asyncio.gather(*tasks)
+        ingest_elapsed = time.perf_counter() - start
+
+        prs = [f"{repo}#{i + 1}" for i in range(args.deliveries)]
+        published = await _wait_published(client, github, prs, args.timeout)
+        gh_after = (await client.get(f"{github}/_stats")).json()
+        llm_after = (await client.get(f"{llm}/_stats")).json()
+        metrics_after = (await client.get(f"{web}/metrics/")).text
+
+    sent_at = {pr: sent for pr, (sent, _, _) in zip(prs, results)}
+    e2e = [published[pr] - sent_at[pr] for pr in prs if pr in published]
+    done = len(e2e)
+    failed_acks = sum(status != 202 for _, _, status in results)
+    last = max((published[pr] for pr in prs if pr in published), default=0.0)
+    e2e_elapsed = last - min(sent_at.values()) if done else 0.0
+
+    print_table([
+        summarize("ingest (webhook ack)", [latency for _, latency, _ in results], ingest_elapsed),
+        summarize("end to end (review posted)", e2e, e2e_elapsed),
+    ])
+    print(f"\n{done}/{args.deliveries} review(s) completed, {failed_acks} non-202 ack(s); "
+          f"end-to-end p90 {percentile(e2e, 90) * 1000:.0f} ms")
+
+    waits = _delta(_histograms(metrics_after, "patchpilot_review_queue_wait_seconds", "stage"),
+                   _histograms(metrics_before, "patchpilot_review_queue_wait_seconds", "stage"))
+    spans = _delta(_histograms(metrics_after, "patchpilot_span_seconds", "span"),
+                   _histograms(metrics_before, "patchpilot_span_seconds", "span"))
+    print(f"\n{'stage':<12}{'wait p50_ms':>14}{'wait p99_ms':>14}{'run p50_ms':>14}{'run p99_ms':>14}")
+    for stage in ("fetch", "analyze", "publish"):
+        wait, run = waits.get(stage, []), spans.get(f"review.{stage}", [])
+        print(f"{stage:<12}{_quantile(wait, 0.5) * 1000:>14.1f}{_quantile(wait, 0.99) * 1000:>14.1f}"
+              f"{_quantile(run, 0.5) * 1000:>14.1f}{_quantile(run, 0.99) * 1000:>14.1f}")
+
+    per_review = max(done, 1)
+    github_calls = {k: gh_after[k] - gh_before.get(k, 0) for k in gh_after}
+    print(f"\nGitHub requests per review: {sum(github_calls.values()) / per_review:.2f} "
+          f"({', '.join(f'{k}={v / per_review:.2f}' for k, v in github_calls.items() if v)})")
+    print(f"LLM requests per review:    {(llm_after['requests'] - llm_before['requests']) / per_review:.2f} "
+          f"(max in flight {llm_after['max_in_flight']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("eager", "redis"), default="eager")
+    parser.add_argument("--deliveries", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=20.0, help="deliveries per second")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for the reviews")
+    parser.add_argument("--files-per-pr", type=int, default=20)
+    parser.add_argument("--github-latency-ms", type=float, default=30.0)
+    parser.add_argument("--github-rate-limit", type=int, default=0, help="requests per token per window (0: unlimited)")
+    parser.add_argument("--github-rate-window", type=float, default=60.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=100.0)
+    parser.add_argument("--llm-capacity", type=int, default=4, help="requests the fake LLM serves at once")
+    parser.add_argument("--io-concurrency", type=int, default=32, help="redis mode: io worker threads")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="redis mode: llm worker threads")
+    args = parser.parse_args()
+
+    gh_port, llm_port, web_port = free_port(), free_port(), free_port()
+    github, llm, web = (f"http://127.0.0.1:{p}" for p in (gh_port, llm_port, web_port))
+
+    with tempfile.TemporaryDirectory(prefix="pp-metrics-") as metrics_dir:
+        env = {
+            "GITHUB_API_URL": github,
+            "GITHUB_APP_ID": "1",
+            "GITHUB_PRIVATE_KEY_PEM": _private_key_pem(),
+            "GITHUB_WEBHOOK_SECRET": SECRET.decode(),
+            "LLM_ENDPOINTS": f'[{{"backend": "ollama", "url": "{llm}"}}]',
+            "DJANGO_SETTINGS_MODULE": "benchmarks.webhook_settings",
+            # One summary comment per review marks its end; identical stub diffs must not hit the review cache
+            "REVIEW_STREAMING": "false",
+            "REVIEW_CACHE_ENABLED": "false",
+            "PROMETHEUS_MULTIPROC_DIR": metrics_dir,
+            "BENCH_EAGER" if args.mode == "eager" else "BENCH_REDIS": "1",
+        }
+        github_args = ("--latency-ms", str(args.github_latency_ms), "--files-per-pr", str(args.files_per_pr),
+                       "--rate-limit", str(args.github_rate_limit), "--rate-window", str(args.github_rate_window))
+        llm_args = ("--latency-ms", str(args.llm_latency_ms), "--tokens-per-sec", str(args.llm_tokens_per_sec),
+                    "--capacity", str(args.llm_capacity))
+        web_args = ("benchmarks.webhook_asgi:application", "--log-level", "warning", "--no-access-log")
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(run_module("benchmarks.stubs.github", *github_args, port=gh_port))
+            stack.enter_context(run_module("benchmarks.stubs.llm", *llm_args, port=llm_port))
+            stack.enter_context(run_module("uvicorn", *web_args, port=web_port, env=env))
+            if args.mode == "redis":
+                stack.enter_context(_celery_worker("io", args.io_concurrency, env))
+                stack.enter_context(_celery_worker("llm", args.llm_concurrency, env))
+            asyncio.run(_drive(args, web, github, llm))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cost of one `/metrics/` scrape as the number of series grows: in-process registry vs. multiprocess aggregation.
+
+Every writer process records `--series` distinct endpoints in the HTTP
+request counter and latency histogram (the histogram has 17 series per label
+value). The single-process run scrapes its own registry. The multiprocess
+run has `--processes` writers fill a PROMETHEUS_MULTIPROC_DIR; the scrape then
+merges all of their files, as the web process does. Reported: time per
+scrape (ms), exposition size and samples exposed.
+
+    python -m benchmarks.metrics_scrape_bench --series 100 1000 5000 --processes 8
+"""
+import argparse, os, subprocess, sys, tempfile
+from benchmarks.common import REPO_ROOT
+
+_PROBE = """
+import multiprocessing, os, sys, time
+series, processes, scrapes = (int(a) for a in sys.argv[1:4])
+
+def record():
+    from observability.metrics import http_requests_total, request_latency_seconds
+    for i in range(series):
+        endpoint = f"/route-{i}/"
+        http_requests_total.labels("GET", endpoint).inc()
+        request_latency_seconds.labels(endpoint).observe(0.01 * (i % 50))
+
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    ctx = multiprocessing.get_context("fork")  # the probe runs from -c, which spawn cannot re-import
+    writers = [ctx.Process(target=record) for _ in range(processes)]
+    for w in writers:
+        w.start()
+    for w in writers:
+        w.join()
+else:
+    record()
+
+from prometheus_client import generate_latest
+from observability.metrics import scrape_registry
+best = float("inf")
+for _ in range(scrapes):
+    start = time.perf_counter()
+    body = generate_latest(scrape_registry())
+    best = min(best, time.perf_counter() - start)
+samples = sum(1 for line in body.splitlines() if line and not line.startswith(b"#"))
+print(best * 1000, len(body), samples)
+"""
+
+
+def _run(series: int, processes: int, scrapes: int, multiproc_dir: str = None):
+    env = {k: v for k, v in os.environ.items() if k.lower() != "prometheus_multiproc_dir"}
+    if multiproc_dir:
+        env["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE, str(series), str(processes), str(scrapes)],
+        cwd=REPO_ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    ms, size, samples = out.split()
+    return float(ms), int(size), int(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--scrapes", type=int, default=5, help="scrapes per run; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'mode':<28}{'series':>8}{'samples':>10}{'KiB':>10}{'ms/scrape':>12}")
+    for series in args.series:
+        ms, size, samples = _run(series, 1, args.scrapes)
+        print(f"{'single process':<28}{series:>8}{samples:>10}{size / 1024:>10.0f}{ms:>12.1f}")
+        with tempfile.TemporaryDirectory() as tmp:
+            ms, size, samples = _run(series, args.processes, args.scrapes, tmp)
+        mode = f"multiprocess ({args.processes} procs)"
+        print(f"{mode:<28}{series:>8}{samples:>10}{size / 1024:>10.0f}{ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
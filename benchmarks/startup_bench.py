@@ -0,0 +1,70 @@
+"""
+Startup cost of the web and worker processes: import time, peak RSS and
+whether the LLM SDKs got loaded.
+
+Each scenario runs in a fresh interpreter:
+- web: ASGI app plus URLconf/views (what the first request imports)
+- worker: Celery app plus its task modules (what `celery worker` imports)
+- worker + agent: the above, then the first ReviewAgent (LLM backend import)
+
+    python -m benchmarks.startup_bench --runs 5
+"""
+import argparse, json, os, statistics, subprocess, sys
+from benchmarks.common import REPO_ROOT
+
+_PROBE = r"""
+import json, os, resource, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "llm_sdks": sorted(m for m in ("langchain_ollama", "langchain_openai") if m in sys.modules),
+}))
+"""
+
+SCENARIOS = {
+    "web": """
+import project.asgi
+from django.urls import resolve
+resolve("/webhook/")
+""",
+    "worker": """
+from project.celery import app
+app.loader.import_default_modules()
+""",
+    "worker + agent": """
+from project.celery import app
+app.loader.import_default_modules()
+from services.review.review_agent import ReviewAgent
+ReviewAgent(backend=os.getenv("BENCH_LLM_BACKEND", "ollama"))
+""",
+}
+
+
+def _probe(code: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE % code.strip()],
+        cwd=REPO_ROOT, env=os.environ, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'process':<20}{'import_ms':>12}{'rss_mb':>10}  llm_sdks")
+    for name, code in SCENARIOS.items():
+        samples = [_probe(code) for _ in range(args.runs)]
+        ms = statistics.median(s["seconds"] for s in samples) * 1000
+        rss = statistics.median(s["rss_mb"] for s in samples)
+        sdks = ", ".join(samples[-1]["llm_sdks"]) or "-"
+        print(f"{name:<20}{ms:>12.1f}{rss:>10.1f}  {sdks}")
+
+
+if __name__ == "__main__":
+    main()
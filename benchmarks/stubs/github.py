@@ -0,0 +1,227 @@
+"""
+Local stub of the GitHub REST endpoints used by `adapters/github/`.
+
+Run standalone:
+    python -m benchmarks.stubs.github --port 9100 --latency-ms 20
+
+Point the adapters at it with GITHUB_API_URL=http://127.0.0.1:9100.
+"""
+import argparse, asyncio, itertools, logging, time
+from datetime import datetime, timedelta, timezone
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class GitHubStub:
+    """
+    In-memory fake of the GitHub API surface PatchPilot talks to.
+
+    Args:
+        latency_ms (float): Artificial server-side latency added to every response.
+        files_per_pr (int): Number of changed files reported for every PR.
+        rate_limit (int): Requests allowed per token and `rate_window` (0: unlimited).
+            Responses carry X-RateLimit-* headers; over budget, GitHub's
+            403 with `X-RateLimit-Remaining: 0` and `Retry-After` is returned.
+        rate_window (float): Length of a rate-limit window in seconds.
+        diff_max_lines (int): Diffs longer than this are refused with HTTP 406, like GitHub's
+            "diff exceeded the maximum number of lines".
+    """
+
+    def __init__(self, latency_ms: float = 0.0, files_per_pr: int = 5, rate_limit: int = 0, rate_window: float = 60.0,
+                 diff_max_lines: int = 20000):
+        self.latency = latency_ms / 1000.0
+        self.files_per_pr = files_per_pr
+        self.diff_max_lines = diff_max_lines
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self._windows = {}  # Authorization header -> (window reset, used)
+        self.calls = {"token": 0, "files": 0, "diff": 0, "comments": 0, "reviews": 0, "compare": 0, "rate_limited": 0}
+        self._comment_ids = itertools.count(1)
+        self.comments = {}
+        self.published = {}  # "owner/repo#number" -> UNIX time its first comment was posted
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._rate_limit] if self.rate_limit else [])
+        app.router.add_post("/app/installations/{installation_id}/access_tokens", self.access_token)
+        app.router.add_get("/repos/{owner}/{repo}/pulls/{number}/files", self.pr_files)
+        app.router.add_get("/repos/{owner}/{repo}/pulls/{number}", self.pull)
+        app.router.add_post("/repos/{owner}/{repo}/issues/{number}/comments", self.create_comment)
+        app.router.add_post("/repos/{owner}/{repo}/pulls/{number}/reviews", self.create_review)
+        app.router.add_patch("/repos/{owner}/{repo}/issues/comments/{comment_id}", self.update_comment)
+        app.router.add_get("/repos/{owner}/{repo}/compare/{basehead}", self.compare)
+        app.router.add_get("/_stats", self.stats)
+        app.router.add_get("/_published", self.published_at)
+        return app
+
+    @web.middleware
+    async def _rate_limit(self, request: web.Request, handler):
+        auth = request.headers.get("Authorization", "")
+        if request.path.startswith("/_") or not auth:
+            return await handler(request)
+
+        now = time.time()
+        reset, used = self._windows.get(auth, (now + self.rate_window, 0))
+        if now >= reset:
+            reset, used = now + self.rate_window, 0
+        headers = {"X-RateLimit-Limit": str(self.rate_limit), "X-RateLimit-Reset": str(int(reset))}
+
+        if used >= self.rate_limit:
+            self.calls["rate_limited"] += 1
+            headers.update({"X-RateLimit-Remaining": "0", "Retry-After": str(max(1, int(reset - now + 1)))})
+            return web.json_response({"message": "API rate limit exceeded"}, status=403, headers=headers)
+
+        self._windows[auth] = (reset, used + 1)
+        response = await handler(request)
+        response.headers.update(headers)
+        response.headers["X-RateLimit-Remaining"] = str(self.rate_limit - used - 1)
+        return response
+
+    async def _delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def access_token(self, request: web.Request) -> web.Response:
+        await self._delay()
+        self.calls["token"] += 1
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        return web.json_response(
+            {"token": f"ghs_stub_{request.match_info['installation_id']}",
+             "expires_at": expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")},
+            status=201,
+        )
+
+    async def pr_files(self, request: web.Request) -> web.Response:
+        await self._delay()
+        self.calls["files"] += 1
+        per_page = min(int(request.query.get("per_page", 30)), 100)
+        page = int(request.query.get("page", 1))
+        last = max(1, -(-self.files_per_pr // per_page))
+        start = (page - 1) * per_page
+        files = [make_file(i) for i in range(start, min(start + per_page, self.files_per_pr))]
+
+        links = []
+        if page < last:
+            links.append(f'<{request.url.with_query(per_page=per_page, page=page + 1)}>; rel="next"')
+            links.append(f'<{request.url.with_query(per_page=per_page, page=last)}>; rel="last"')
+        headers = {"Link": ", ".join(links)} if links else None
+        return web.json_response(files, headers=headers)
+
+    async def pull(self, request: web.Request) -> web.StreamResponse:
+        """The pull request; with the diff media type, its unified diff streamed file by file."""
+        await self._delay()
+        if "diff" not in request.headers.get("Accept", ""):
+            number = int(request.match_info["number"])
+            return web.json_response({"number": number, "state": "open", "changed_files": self.files_per_pr})
+
+        self.calls["diff"] += 1
+        if self.files_per_pr * DIFF_LINES_PER_FILE > self.diff_max_lines:
+            return web.json_response({
+                "message": f"Sorry, the diff exceeded the maximum number of lines ({self.diff_max_lines})",
+                "errors": [{"resource": "PullRequest", "field": "diff", "code": "too_large"}],
+            }, status=406)
+
+        response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+        await response.prepare(request)
+        batch = []
+        for i in range(self.files_per_pr):
+            batch.append(make_diff(i))
+            if len(batch) == 50:
+                await response.write("".join(batch).encode())
+                batch = []
+        await response.write("".join(batch).encode())
+        await response.write_eof()
+        return response
+
+    async def create_comment(self, request: web.Request) -> web.Response:
+        await self._delay()
+        self.calls["comments"] += 1
+        comment = {"id": next(self._comment_ids), "body": (await request.json()).get("body", "")}
+        self.comments[comment["id"]] = comment
+        pr = f"{request.match_info['owner']}/{request.match_info['repo']}#{request.match_info['number']}"
+        self.published.setdefault(pr, time.time())
+        return web.json_response(comment, status=201)
+
+    async def create_review(self, request: web.Request) -> web.Response:
+        """Reviews are rejected as a whole, like GitHub does, if a line comment is not on a changed file."""
+        await self._delay()
+        self.calls["reviews"] += 1
+        body = await request.json()
+        known = {make_file(i)["filename"] for i in range(self.files_per_pr)}
+        for c in body.get("comments", []):
+            if c.get("path") not in known or not isinstance(c.get("line"), int):
+                return web.json_response(
+                    {"message": "Unprocessable Entity", "errors": ["Line could not be resolved"]}, status=422,
+                )
+        return web.json_response({"id": next(self._comment_ids), "state": "COMMENTED"})
+
+    async def update_comment(self, request: web.Request) -> web.Response:
+        await self._delay()
+        self.calls["comments"] += 1
+        comment = self.comments.get(int(request.match_info["comment_id"]))
+        if comment is None:
+            return web.json_response({"message": "Not Found"}, status=404)
+        comment["body"] = (await request.json()).get("body", "")
+        return web.json_response(comment)
+
+    async def compare(self, request: web.Request) -> web.Response:
+        """Every comparison is a fast-forward touching the first file."""
+        await self._delay()
+        self.calls["compare"] += 1
+        return web.json_response({"status": "ahead", "total_commits": 1, "files": [make_file(0)]})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.calls)
+
+    async def published_at(self, request: web.Request) -> web.Response:
+        """When each PR got its first comment (the end of a non-streaming review), for end-to-end latency."""
+        return web.json_response(self.published)
+
+
+def make_file(i: int) -> dict:
+    """A synthetic entry shaped like GitHub's PR files API."""
+    return {
+        "filename": f"src/module_{i}.py",
+        "status": "modified",
+        "additions": 3,
+        "deletions": 1,
+        "patch": f"@@ -1,3 +1,5 @@\n import os\n-x = {i}\n+x = {i + 1}\n+y = x * 2\n+z = y - 1\n def f():\n",
+    }
+
+
+DIFF_LINES_PER_FILE = 11
+
+
+def make_diff(i: int) -> str:
+    """`make_file(i)` as it appears in the pull request's unified diff."""
+    return (
+        f"diff --git a/src/module_{i}.py b/src/module_{i}.py\n"
+        f"index 1111111..2222222 100644\n"
+        f"--- a/src/module_{i}.py\n"
+        f"+++ b/src/module_{i}.py\n"
+        f"{make_file(i)['patch']}"
+    )
+
+
+def serve(host: str = "127.0.0.1", port: int = 9100, **kwargs) -> None:
+    """Block serving the stub until interrupted."""
+    stub = GitHubStub(**kwargs)
+    web.run_app(stub.app(), host=host, port=port, access_log=None, print=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--files-per-pr", type=int, default=5)
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per token and window (0: unlimited)")
+    parser.add_argument("--rate-window", type=float, default=60.0)
+    parser.add_argument("--diff-max-lines", type=int, default=20000)
+    args = parser.parse_args()
+    serve(args.host, args.port, latency_ms=args.latency_ms, files_per_pr=args.files_per_pr,
+          rate_limit=args.rate_limit, rate_window=args.rate_window, diff_max_lines=args.diff_max_lines)
+
+
+if __name__ == "__main__":
+    main()
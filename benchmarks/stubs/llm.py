@@ -0,0 +1,205 @@
+"""
+Local fake LLM server speaking the Ollama and OpenAI-compatible chat APIs.
+
+Run standalone:
+    python -m benchmarks.stubs.llm --port 9200 --latency-ms 200 --tokens-per-sec 200
+
+Point an endpoint at it, e.g.
+    LLM_ENDPOINTS='[{"backend": "ollama", "url": "http://127.0.0.1:9200"},
+                    {"backend": "openai", "url": "http://127.0.0.1:9200/v1"}]'
+"""
+import argparse, asyncio, itertools, json, random, time
+from aiohttp import web
+
+REVIEW = (
+    "## Summary\nThe change looks reasonable overall.\n\n"
+    "## Bugs / Potential Errors\n- None found in the provided diff.\n\n"
+    "## Suggestions\n- Consider adding a test for the new branch.\n\n"
+    '```json\n[{"path": "src/module_0.py", "line": 2, "body": "`x` is reassigned; is the old value still needed?"}]\n```\n'
+)
+
+
+class LLMStub:
+    """
+    Fake inference server with tunable latency, throughput, capacity and failures.
+
+    Args:
+        latency_ms (float): Time to first token.
+        tokens_per_sec (float): Streaming speed (0: whole answer at once).
+        capacity (int): Requests served concurrently; more queue inside the server (0: unlimited).
+        fail_rate (float): Fraction of requests answered with HTTP 500.
+        response (str): Completion text returned for every prompt.
+        load_ms (float): Extra delay of the first request, reported as Ollama's `load_duration`.
+    """
+
+    def __init__(self, latency_ms: float = 200.0, tokens_per_sec: float = 0.0, capacity: int = 0,
+                 fail_rate: float = 0.0, response: str = REVIEW, load_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.load = load_ms / 1000.0
+        self._loaded = asyncio.Event()
+        self._loading = False
+        self.tokens_per_sec = tokens_per_sec
+        self.fail_rate = fail_rate
+        self.response = response
+        self._slots = asyncio.Semaphore(capacity) if capacity else None
+        self._ids = itertools.count(1)
+        self.calls = {"requests": 0, "failed": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/chat", self.ollama_chat)
+        app.router.add_get("/api/tags", self.ollama_tags)
+        app.router.add_post("/v1/chat/completions", self.openai_chat)
+        app.router.add_get("/v1/models", self.openai_models)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+    def _pieces(self):
+        """The response split into word-sized "tokens"."""
+        words = self.response.split(" ")
+        return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+    def _admit(self) -> None:
+        """Count the request; raises web.HTTPInternalServerError for injected failures (before any streaming)."""
+        self.calls["requests"] += 1
+        if random.random() < self.fail_rate:
+            self.calls["failed"] += 1
+            raise web.HTTPInternalServerError(text="injected failure")
+
+    async def _load(self) -> float:
+        """Simulate loading the model on first use; returns the seconds this request spent loading."""
+        if not self.load or self._loaded.is_set():
+            return 0.0
+        start = time.perf_counter()
+        if self._loading:
+            await self._loaded.wait()
+        else:
+            self._loading = True
+            await asyncio.sleep(self.load)
+            self._loaded.set()
+        return time.perf_counter() - start
+
+    async def _generate(self):
+        """Yield response pieces at the configured pace, queuing when the server is at capacity."""
+        if self._slots:
+            await self._slots.acquire()
+        self.calls["in_flight"] += 1
+        self.calls["max_in_flight"] = max(self.calls["max_in_flight"], self.calls["in_flight"])
+        try:
+            await asyncio.sleep(self.latency)
+            pieces = self._pieces()
+            if not self.tokens_per_sec:
+                yield "".join(pieces)
+                return
+            for piece in pieces:
+                yield piece
+                await asyncio.sleep(1 / self.tokens_per_sec)
+        finally:
+            self.calls["in_flight"] -= 1
+            if self._slots:
+                self._slots.release()
+
+    async def ollama_chat(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        model = body.get("model", "stub")
+        stream = body.get("stream", True)
+        self._admit()
+        load = await self._load()
+        start = time.perf_counter()
+        pieces = [p async for p in self._generate()] if not stream else None
+
+        if not stream:
+            return web.json_response(self._ollama_message(
+                model, "".join(pieces), done=True, load=load, eval_seconds=time.perf_counter() - start,
+            ))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        async for piece in self._generate():
+            await response.write(json.dumps(self._ollama_message(model, piece, done=False)).encode() + b"\n")
+        done = self._ollama_message(model, "", done=True, load=load, eval_seconds=time.perf_counter() - start)
+        await response.write(json.dumps(done).encode() + b"\n")
+        await response.write_eof()
+        return response
+
+    def _ollama_message(self, model: str, content: str, done: bool, load: float = 0.0, eval_seconds: float = 0.0) -> dict:
+        message = {
+            "model": model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+        if done:
+            # One "token" per generated word; generation time as measured
+            message.update(done_reason="stop", prompt_eval_count=100, eval_count=len(self._pieces()), total_duration=1,
+                           load_duration=int(load * 1e9), eval_duration=int(eval_seconds * 1e9))
+        return message
+
+    async def ollama_tags(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": "gemma3:4b", "model": "gemma3:4b"}]})
+
+    async def openai_chat(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        model = body.get("model", "stub")
+        completion_id = f"chatcmpl-{next(self._ids)}"
+        self._admit()
+        await self._load()
+
+        if not body.get("stream"):
+            text = "".join([p async for p in self._generate()])
+            return web.json_response({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def _event(delta: dict, finish=None):
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        await _event({"role": "assistant", "content": ""})
+        async for piece in self._generate():
+            await _event({"content": piece})
+        await _event({}, finish="stop")
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def openai_models(self, request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [{"id": "stub", "object": "model"}]})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.calls)
+
+
+def serve(host: str = "127.0.0.1", port: int = 9200, **kwargs) -> None:
+    """Block serving the stub until interrupted."""
+
+    async def _app():
+        return LLMStub(**kwargs).app()  # semaphores must be created on the serving loop
+
+    web.run_app(_app(), host=host, port=port, access_log=None, print=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0)
+    parser.add_argument("--capacity", type=int, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--load-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    serve(args.host, args.port, latency_ms=args.latency_ms, tokens_per_sec=args.tokens_per_sec,
+          capacity=args.capacity, fail_rate=args.fail_rate, load_ms=args.load_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+ASGI app for webhook benchmarks.
+
+Uses the in-memory Celery broker unless BENCH_REDIS is set, so publishes are
+real kombu publishes without needing a Redis server. With BENCH_EAGER set the
+review pipeline runs inline in the web process instead (Celery eager mode),
+which needs no broker or worker at all.
+"""
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.webhook_settings")
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+from project.celery import app as celery_app  # noqa: E402
+
+if not os.getenv("BENCH_REDIS"):
+    celery_app.conf.broker_url = "memory://"
+    celery_app.conf.result_backend = "cache+memory://"
+
+if os.getenv("BENCH_EAGER"):
+    celery_app.conf.task_always_eager = True
+    import services.queue.tasks  # noqa: E402,F401  (registers the stages; a worker would import them)
+
+application = get_asgi_application()
@@ -0,0 +1,67 @@
+"""
+Webhook ingest benchmark: async view vs. the previous sync view, under uvicorn.
+
+Each delivery is a signed `synchronize` event for a distinct PR head, so every
+request runs the full path (HMAC, parse, dedup, latest-head marker, publish).
+Uses an in-memory broker and cache unless BENCH_REDIS=1 (then REDIS_URL).
+
+    python -m benchmarks.webhook_bench --deliveries 2000 --concurrency 50
+"""
+import argparse, asyncio, os, time
+import httpx
+from benchmarks.common import free_port, run_module, pr_event, signed_headers, summarize, print_table
+
+SECRET = b"bench-secret"
+
+
+async def _drive(name: str, url: str, deliveries: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def one(i: int):
+            nonlocal failures
+            body = pr_event(pr_number=i % 500 + 1)
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post(url, content=body, headers=signed_headers(body, SECRET))
+                latencies.append(time.perf_counter() - t0)
+                failures += r.status_code != 202
+
+        # Warm up (imports, connection setup) before timing
+        await asyncio.gather(*(one(i) for i in range(min(concurrency, deliveries))))
+        latencies.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(deliveries)))
+        elapsed = time.perf_counter() - start
+
+    if failures:
+        print(f"[{name}] {failures} non-202 responses")
+    return summarize(name, latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deliveries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    port = free_port()
+    env = {"GITHUB_WEBHOOK_SECRET": SECRET.decode(), "REVIEW_DEBOUNCE_SECONDS": "0"}
+    os.environ.update(env)
+    with run_module(
+        "uvicorn", "benchmarks.webhook_asgi:application", "--log-level", "warning", "--no-access-log",
+        port=port, env=env,
+    ):
+        base = f"http://127.0.0.1:{port}"
+        rows = [
+            asyncio.run(_drive("sync view (legacy)", f"{base}/legacy-webhook/", args.deliveries, args.concurrency)),
+            asyncio.run(_drive("async view", f"{base}/webhook/", args.deliveries, args.concurrency)),
+        ]
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Django settings for webhook benchmarks: the project settings with a local cache and quiet logging."""
+import os
+from project.settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = "benchmarks.webhook_urls"
+DEBUG = False
+
+if not os.getenv("BENCH_REDIS"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"null": {"class": "logging.NullHandler"}},
+    "root": {"handlers": ["null"], "level": "WARNING"},
+}
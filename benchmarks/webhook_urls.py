@@ -0,0 +1,48 @@
+"""
+URLconf for webhook benchmarks: the real routes plus the pre-async sync view
+at /legacy-webhook/ as a baseline.
+"""
+import hmac, hashlib, json
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.urls import include, path
+from django.views.decorators.csrf import csrf_exempt
+
+from core.views import WEBHOOK_SECRET, _is_pr_event
+
+
+@csrf_exempt
+def legacy_webhook(request):
+    """The sync webhook as it was before the async rewrite (json, get+set dedup, blocking delay)."""
+    from services.queue.tasks import review_pull_request
+
+    if request.method != "POST":
+        return HttpResponse(status=405)
+    digest = hmac.new(WEBHOOK_SECRET, msg=request.body, digestmod=hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(f"sha256={digest}", request.headers.get("X-Hub-Signature-256", "")):
+        return HttpResponse("Invalid signature", status=401)
+    try:
+        payload = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        return HttpResponse("Invalid JSON", status=400)
+    if not _is_pr_event(payload):
+        return JsonResponse({"ignored": True}, status=202)
+
+    delivery_id = request.headers.get("X-GitHub-Delivery", "")
+    if delivery_id:
+        cache_key = f"pp:delivery:{delivery_id}"
+        if cache.get(cache_key):
+            return JsonResponse({"duplicate": True}, status=202)
+        cache.set(cache_key, True, timeout=600)
+
+    pr = payload["pull_request"]
+    review_pull_request.delay(
+        payload["repository"]["full_name"], pr["number"], pr["head"]["sha"], payload.get("installation", {}).get("id")
+    )
+    return JsonResponse({"enqueued": True}, status=202)
+
+
+urlpatterns = [
+    path("legacy-webhook/", legacy_webhook),
+    path("", include("core.urls")),
+]
@@ -0,0 +1,100 @@
+import asyncio, hashlib, hmac, time, uuid
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+from core.views import WEBHOOK_SECRET
+from services.storage.webhook_capture import read_capture
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a webhook capture (WEBHOOK_CAPTURE_PATH) against a running instance, "
+        "preserving inter-arrival times, at 1x, Nx or maximum speed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("capture", help="zstd JSON-lines capture file")
+        parser.add_argument("--url", default="http://127.0.0.1:8000/webhook/", help="webhook endpoint to replay against")
+        parser.add_argument("--speed", type=float, default=1.0,
+                            help="time compression: 1 = as recorded, 10 = ten times faster, 0 = as fast as possible")
+        parser.add_argument("--concurrency", type=int, default=64, help="deliveries in flight at once when --speed 0")
+        parser.add_argument("--limit", type=int, default=0, help="replay only the first N deliveries (0: all)")
+        parser.add_argument("--secret", default=None, help="signing secret (default: GITHUB_WEBHOOK_SECRET)")
+        parser.add_argument("--keep-delivery-ids", action="store_true",
+                            help="resend the recorded X-GitHub-Delivery IDs (the target drops them as duplicates "
+                                 "if it has seen them); by default every delivery gets a fresh ID")
+
+    def handle(self, *args, **options):
+        if options["speed"] < 0:
+            raise CommandError("--speed must be >= 0")
+        secret = options["secret"].encode() if options["secret"] is not None else WEBHOOK_SECRET
+        if not secret:
+            raise CommandError("No signing secret: set GITHUB_WEBHOOK_SECRET or pass --secret")
+
+        try:
+            deliveries = sorted(read_capture(options["capture"]), key=lambda d: d["t"])
+        except OSError as e:
+            raise CommandError(f"Cannot read capture {options['capture']}: {e}")
+        if options["limit"]:
+            deliveries = deliveries[:options["limit"]]
+        if not deliveries:
+            raise CommandError("Capture is empty")
+
+        span = deliveries[-1]["t"] - deliveries[0]["t"]
+        self.stdout.write(f"[Replay] {len(deliveries)} deliveries recorded over {span:.1f}s -> {options['url']}")
+        statuses, latencies, elapsed = asyncio.run(self._replay(deliveries, secret, options))
+
+        latencies.sort()
+        def pct(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else 0.0
+        self.stdout.write(
+            f"[Replay] Sent {len(deliveries)} in {elapsed:.1f}s ({len(deliveries) / max(elapsed, 1e-9):.1f}/s); "
+            f"ack p50 {pct(50):.1f} ms, p99 {pct(99):.1f} ms, max {pct(100):.1f} ms"
+        )
+        self.stdout.write("[Replay] Responses: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())))
+        if statuses.get("error"):
+            self.stderr.write(f"[Replay] {statuses['error']} delivery(ies) failed to send")
+
+    async def _replay(self, deliveries: List[Dict], secret: bytes, options):
+        statuses: Counter = Counter()
+        latencies: List[float] = []
+        speed = options["speed"]
+        # Open loop when timed: each delivery leaves on schedule, however slow earlier acks are
+        limit = asyncio.Semaphore(options["concurrency"] if speed == 0 else len(deliveries))
+
+        async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=None)) as client:
+            async def send(delivery: Dict) -> None:
+                async with limit:
+                    headers = _signed(delivery, secret, options["keep_delivery_ids"])
+                    start = time.perf_counter()
+                    try:
+                        r = await client.post(options["url"], content=delivery["body"], headers=headers)
+                    except httpx.HTTPError as e:
+                        statuses["error"] += 1
+                        self.stderr.write(f"[Replay] Delivery {headers.get('X-GitHub-Delivery')} failed: {e}")
+                        return
+                    latencies.append(time.perf_counter() - start)
+                    statuses[str(r.status_code)] += 1
+
+            first = deliveries[0]["t"]
+            start = time.perf_counter()
+            tasks = []
+            for delivery in deliveries:
+                if speed:
+                    await asyncio.sleep(max(0.0, start + (delivery["t"] - first) / speed - time.perf_counter()))
+                tasks.append(asyncio.create_task(send(delivery)))
+            await asyncio.gather(*tasks)
+            return statuses, latencies, time.perf_counter() - start
+
+
+def _signed(delivery: Dict, secret: bytes, keep_delivery_id: bool) -> Dict[str, str]:
+    """The recorded headers, re-signed for the local secret."""
+    headers = dict(delivery["headers"])
+    if not keep_delivery_id or "X-GitHub-Delivery" not in headers:
+        headers["X-GitHub-Delivery"] = str(uuid.uuid4())
+    digest = hmac.new(secret, msg=delivery["body"], digestmod=hashlib.sha256).hexdigest()
+    headers["X-Hub-Signature-256"] = f"sha256={digest}"
+    return headers
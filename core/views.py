@@ -1,14 +1,21 @@
-import hmac, hashlib, json, os, sys, logging
+import hmac, hashlib, os, sys, logging
 
+import orjson
+from asgiref.sync import sync_to_async
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse, HttpResponse
 from django.core.cache import cache
 
-from services.queue.tasks import review_pull_request
+from services.queue.coalesce import mark_latest_head
+from services.queue.pipeline import review_pipeline
 from observability import metrics
+from observability.tracing import new_trace
+from services.storage.webhook_capture import capture_delivery
 
 WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "").encode()
+# Delay before reviewing a push; a newer push to the same PR within the window replaces it
+REVIEW_DEBOUNCE_SECONDS = int(os.getenv("REVIEW_DEBOUNCE_SECONDS", "20"))
 logger = logging.getLogger(__name__)
 
 # Create your views here.
@@ -21,17 +28,20 @@ def healthz(request):
     return JsonResponse({"status": "ok"})
 
 def metrics_view(request):
-    """Prometheus metrics endpoint."""
-    return HttpResponse(generate_latest(metrics.registry), content_type=CONTENT_TYPE_LATEST)
+    """Prometheus metrics endpoint (aggregated across processes when PROMETHEUS_MULTIPROC_DIR is set)."""
+    return HttpResponse(generate_latest(metrics.scrape_registry()), content_type=CONTENT_TYPE_LATEST)
 
 @csrf_exempt
-def webhook(request):
+async def webhook(request):
     """
-        GitHub webhook endpoint.
+        GitHub webhook endpoint (async-native under ASGI).
         - Verifies HMAC signature.
+        - Optionally records the delivery for replay (WEBHOOK_CAPTURE_PATH).
         - Filters non-PR events.
-        - Deduplicates by delivery ID.
-        - Enqueues Celery task for review.
+        - Deduplicates by delivery ID (one atomic set-if-absent).
+        - Marks the PR's newest head SHA (older queued reviews are dropped).
+        - Enqueues the staged review pipeline, debounced for `synchronize` pushes.
+          Cache and broker I/O run in one worker-thread hop so the event loop never blocks.
     """
 
     if request.method != "POST":
@@ -40,44 +50,78 @@ def webhook(request):
     if not _verify_signature(request):
         print("[Webhook] Signature invalid", file=sys.stderr, flush=True)
         return HttpResponse("Invalid signature", status=401)
+    capture_delivery(request.headers, request.body)
 
     try:
-        payload = json.loads(request.body or "{}")
-    except json.JSONDecodeError:
+        payload = orjson.loads(request.body or b"{}")
+    except orjson.JSONDecodeError:
         logger.error("[Webhook] Failed to parse JSON body.")
         return HttpResponse("Invalid JSON", status=400)
 
-    action = payload.get("action")
+    action = payload.get("action") if isinstance(payload, dict) else None
     if not _is_pr_event(payload):
         logger.debug("[Webhook] Ignored event: %s", action)
         return JsonResponse({"ignored": True}, status=202)
 
     logger.info("[Webhook] Passed PR filter. Action=%s", action)
 
-    delivery_id = request.headers.get("X-GitHub-Delivery", "")
-    if delivery_id:
-        cache_key = f"pp:delivery:{delivery_id}"
-        if cache.get(cache_key):
-            logger.info("[Webhook] Duplicate delivery ignored: %s", delivery_id)
-            return JsonResponse({"duplicate": True}, status=202)
-        cache.set(cache_key, True, timeout=600)
     try:
-
         pr = payload["pull_request"]
         repo_full = payload["repository"]["full_name"]
         pr_number = pr["number"]
         head_sha = pr["head"]["sha"]
-        installation_id = payload.get("installation", {}).get("id")
+        installation_id = (payload.get("installation") or {}).get("id")
+        # Pushes carry the previous head; lets the task review only the new commits
+        before_sha = payload.get("before") if action == "synchronize" else None
+    except (KeyError, TypeError) as e:
+        logger.error("[Webhook] Malformed pull_request payload: %s", e)
+        return HttpResponse("Invalid payload", status=400)
+    del payload  # only the fields above are needed; drop the parsed body early
+
+    delivery_id = request.headers.get("X-GitHub-Delivery", "")
+    # Pushes are debounced: every push schedules a review after the window, and
+    # only the one for the newest head survives the dequeue-time supersede check.
+    countdown = REVIEW_DEBOUNCE_SECONDS if action == "synchronize" else 0
 
-        # Enqueue task (heavy work happens off-request)
-        logger.info("[Webhook] Enqueuing PR #%s in %s", pr_number, repo_full)
-        result = review_pull_request.delay(repo_full, pr_number, head_sha, installation_id)
-        logger.info("[Webhook] Task enqueued: %s", result.id)
-        return JsonResponse({"enqueued": True}, status=202)
+    try:
+        task_id = await _ingest(
+            delivery_id, (repo_full, pr_number, head_sha, installation_id, before_sha), countdown,
+        )
     except Exception as e:
         logger.error("[Webhook] Failed to enqueue task: %s", e, exc_info=True)
         return HttpResponse("Internal server error", status=500)
 
+    if task_id is None:
+        logger.info("[Webhook] Duplicate delivery ignored: %s", delivery_id)
+        return JsonResponse({"duplicate": True}, status=202)
+    logger.info("[Webhook] Task enqueued: %s", task_id)
+    return JsonResponse({"enqueued": True}, status=202)
+
+@sync_to_async(thread_sensitive=False)
+def _ingest(delivery_id: str, task_args: tuple, countdown: int):
+    """
+        Blocking half of the webhook: dedup, head marker and broker publish.
+
+        Runs as one hop on a worker thread. Django's async cache methods would
+        each be serialized through the single sync thread, and Celery's publish
+        is blocking socket I/O, so neither belongs on the event loop.
+
+        Returns:
+            Optional[str]: The Celery task ID, or None for a duplicate delivery.
+    """
+    if delivery_id and not cache.add(f"pp:delivery:{delivery_id}", True, timeout=600):
+        return None
+
+    repo_full, pr_number, head_sha = task_args[:3]
+    # Newest head wins: reviews queued/running for older heads drop themselves
+    mark_latest_head(repo_full, pr_number, head_sha)
+
+    # Enqueue task (heavy work happens off-request)
+    logger.info("[Webhook] Enqueuing PR #%s in %s (countdown=%ss)", pr_number, repo_full, countdown)
+    # The countdown delays the first (fetch) stage only; queue wait is measured from when it ends
+    trace = new_trace(delivery_id, delay=countdown)
+    return review_pipeline(*task_args, trace=trace).apply_async(countdown=countdown or None).id
+
 def _verify_signature(request) -> bool:
     """Verify GitHub webhook signature using X-Hub-Signature-256 header."""
     sig = request.headers.get("X-Hub-Signature-256", "")
@@ -93,7 +137,8 @@ def _is_pr_event(payload: dict) -> bool:
     """
 
     return (
-            payload.get("action") in {
+            isinstance(payload, dict)
+            and payload.get("action") in {
         "opened",
         "synchronize",
         "reopened",
@@ -1,5 +1,5 @@
-from celery.signals import task_prerun, task_postrun, task_failure
-from observability.metrics import tasks_total, task_duration_seconds
+from celery.signals import task_prerun, task_postrun, task_failure, worker_process_shutdown
+from observability.metrics import tasks_total, task_duration_seconds, mark_process_dead
 import time
 
 _task_start_time = {}
@@ -19,3 +19,8 @@ def after_task(sender=None, task_id=None, task=None, **kwargs):
 @task_failure.connect
 def on_failure(sender=None, task_id=None, exception=None, **kwargs):
     tasks_total.labels(name=sender.name, status="failed").inc()
+
+@worker_process_shutdown.connect
+def on_process_shutdown(pid=None, **kwargs):
+    # Prefork children exit without running atexit; retire their live gauges here
+    mark_process_dead(pid)
@@ -1,11 +1,45 @@
-from prometheus_client import Counter, Histogram, CollectorRegistry
+import atexit, os
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, multiprocess
 
+# Set (to an empty, writable directory) when several processes record metrics: uvicorn workers,
+# Celery worker processes. Every process then writes its values to mmap files there, and a
+# scrape of any web process aggregates all of them. Must be set before prometheus_client is imported.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir") or ""
 
 registry = CollectorRegistry()
 
+
+def scrape_registry() -> CollectorRegistry:
+    """
+        The registry `/metrics/` exposes: this process's metrics, or in
+        multiprocess mode a fresh one aggregating every process's files.
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return registry
+    aggregated = CollectorRegistry()
+    multiprocess.MultiProcessCollector(aggregated, path=PROMETHEUS_MULTIPROC_DIR)
+    return aggregated
+
+
+def mark_process_dead(pid: int = None) -> None:
+    """
+        Drop an exited process's live gauges from the aggregate (multiprocess mode).
+
+        Counters and histograms of dead processes are kept so totals never go
+        backwards; clear PROMETHEUS_MULTIPROC_DIR when the whole deployment restarts.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid(), PROMETHEUS_MULTIPROC_DIR)
+
+
+# Processes that exit normally clean up after themselves; Celery's forked children are
+# handled by the worker_process_shutdown hook (they leave through os._exit)
+atexit.register(mark_process_dead)
+
 app_startups_total = Counter(
     "patchpilot_app_startups_total", "Total app startups", registry=registry
 )
+# endpoint is the matched route template (e.g. "/webhook/"), never the raw path
 http_requests_total = Counter(
     "patchpilot_http_requests_total", "HTTP requests by method+endpoint",
     ["method", "endpoint"], registry=registry
@@ -30,4 +64,225 @@ task_duration_seconds = Histogram(
     registry=registry,
 )
 
+# --- Review coalescing metrics ---
+reviews_coalesced_total = Counter(
+    "patchpilot_reviews_coalesced_total",
+    "Queued reviews dropped at dequeue because a newer head SHA was pushed",
+    registry=registry,
+)
+
+reviews_aborted_total = Counter(
+    "patchpilot_reviews_aborted_total",
+    "Running reviews aborted at a stage boundary because a newer head SHA was pushed",
+    ["stage"],
+    registry=registry,
+)
+
+# --- Review agent metrics ---
+review_chunk_seconds = Histogram(
+    "patchpilot_review_chunk_seconds",
+    "LLM latency per map-reduce step (map = one chunk, reduce = merge)",
+    ["stage"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300),
+    registry=registry,
+)
+
+review_chunks = Histogram(
+    "patchpilot_review_chunks",
+    "Number of chunks per map-reduce review",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+    registry=registry,
+)
+
+review_time_to_first_section_seconds = Histogram(
+    "patchpilot_review_time_to_first_section_seconds",
+    "Streaming reviews: time from generation start to the first completed Markdown section",
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+    registry=registry,
+)
+
+review_llm_seconds = Histogram(
+    "patchpilot_review_llm_seconds",
+    "LLM call latency seen by the review agent (phase=cold: includes loading the model, warm: steady state)",
+    ["phase"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300),
+    registry=registry,
+)
+
+review_model_load_seconds = Histogram(
+    "patchpilot_review_model_load_seconds",
+    "Model load time: worker warm-up calls, and loads reported by Ollama during reviews",
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+    registry=registry,
+)
+
+review_inline_findings_total = Counter(
+    "patchpilot_review_inline_findings_total",
+    "Line-anchored findings produced by reviews (result=valid/invalid/capped)",
+    ["result"],
+    registry=registry,
+)
+
+# --- LLM token accounting (model: as configured, bounded by LLM_ENDPOINTS) ---
+llm_tokens_total = Counter(
+    "patchpilot_llm_tokens_total",
+    "Tokens processed by LLM calls (kind=prompt/completion), as reported by the backend or estimated",
+    ["backend", "model", "kind"],
+    registry=registry,
+)
+
+llm_usage_estimated_total = Counter(
+    "patchpilot_llm_usage_estimated_total",
+    "LLM calls whose token usage was not reported by the backend and was estimated with tiktoken",
+    ["backend", "model"],
+    registry=registry,
+)
+
+llm_tokens_per_second = Histogram(
+    "patchpilot_llm_tokens_per_second",
+    "Completion tokens per second of generation time, per LLM call",
+    ["backend", "model"],
+    buckets=(1, 2.5, 5, 10, 20, 40, 60, 80, 100, 150, 200, 300, 500),
+    registry=registry,
+)
+
+llm_cost_usd_total = Counter(
+    "patchpilot_llm_cost_usd_total",
+    "Estimated LLM spend in USD for models priced in LLM_TOKEN_PRICES",
+    ["backend", "model"],
+    registry=registry,
+)
+
+review_tokens = Histogram(
+    "patchpilot_review_tokens",
+    "Tokens per review across all of its LLM calls (kind=prompt/completion)",
+    ["kind"],
+    buckets=(500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000),
+    registry=registry,
+)
+
+# --- Diff reduction metrics ---
+review_diff_tokens_saved = Histogram(
+    "patchpilot_review_diff_tokens_saved",
+    "Estimated prompt tokens removed per review by the diff filter",
+    buckets=(0, 100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000),
+    registry=registry,
+)
+
+review_diff_files_reduced_total = Counter(
+    "patchpilot_review_diff_files_reduced_total",
+    "Files whose diff was collapsed or trimmed before prompting (by reason)",
+    ["reason"],
+    registry=registry,
+)
+
+# --- Review cache metrics ---
+review_cache_hits_total = Counter(
+    "patchpilot_review_cache_hits_total",
+    "Review cache hits (kind=pr: whole review, kind=file: per-file findings)",
+    ["kind"],
+    registry=registry,
+)
+
+review_cache_misses_total = Counter(
+    "patchpilot_review_cache_misses_total",
+    "Review cache misses (kind=pr: whole review, kind=file: per-file findings)",
+    ["kind"],
+    registry=registry,
+)
+
+# --- Blob store metrics ---
+blob_store_bytes_total = Counter(
+    "patchpilot_blob_store_bytes_total",
+    "Bytes written to the blob store (encoding=raw: before compression, zstd: stored)",
+    ["encoding"],
+    registry=registry,
+)
+
+blob_store_reads_total = Counter(
+    "patchpilot_blob_store_reads_total",
+    "Blob store reads by result (hit/miss)",
+    ["result"],
+    registry=registry,
+)
+
+review_files_expired_total = Counter(
+    "patchpilot_review_files_expired_total",
+    "Analyze stages that found their stored file list expired (outcome=refetched: pipeline re-queued, dropped: expired again)",
+    ["outcome"],
+    registry=registry,
+)
+
+# --- GitHub rate-limit governor metrics ---
+github_ratelimit_remaining = Gauge(
+    "patchpilot_github_ratelimit_remaining",
+    "Remaining GitHub API budget last reported per installation (X-RateLimit-Remaining)",
+    ["installation"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+
+github_ratelimit_wait_seconds = Histogram(
+    "patchpilot_github_ratelimit_wait_seconds",
+    "Time GitHub calls were delayed by the rate-limit governor",
+    registry=registry,
+    buckets=(0, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+github_ratelimit_hits_total = Counter(
+    "patchpilot_github_ratelimit_hits_total",
+    "GitHub responses rejected by a rate limit (kind=primary/secondary)",
+    ["kind"],
+    registry=registry,
+)
+
+# --- LLM backend pool metrics ---
+llm_endpoint_requests_total = Counter(
+    "patchpilot_llm_endpoint_requests_total",
+    "LLM requests per pool endpoint (outcome=ok/error)",
+    ["endpoint", "outcome"],
+    registry=registry,
+)
+
+llm_endpoint_latency_seconds = Histogram(
+    "patchpilot_llm_endpoint_latency_seconds",
+    "Latency of successful LLM requests per pool endpoint",
+    ["endpoint"],
+    registry=registry,
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 180),
+)
+
+llm_endpoint_outstanding = Gauge(
+    "patchpilot_llm_endpoint_outstanding",
+    "LLM requests in flight per pool endpoint",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+
+llm_endpoint_healthy = Gauge(
+    "patchpilot_llm_endpoint_healthy",
+    "1 if the pool endpoint is routable, 0 while ejected (by any process, in multiprocess mode)",
+    ["endpoint"],
+    multiprocess_mode="livemin",
+    registry=registry,
+)
+
+# --- Tracing metrics ---
+span_seconds = Histogram(
+    "patchpilot_span_seconds",
+    "Duration of traced spans: pipeline stages (review.*) and adapter calls (github.*, blob.*, llm.*)",
+    ["span"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    registry=registry,
+)
+
+review_queue_wait_seconds = Histogram(
+    "patchpilot_review_queue_wait_seconds",
+    "Time a review stage waited in the broker queue, from enqueue (after any debounce) to task start",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+    registry=registry,
+)
+
 app_startups_total.inc()
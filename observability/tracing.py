@@ -0,0 +1,203 @@
+import atexit, functools, logging, os, queue, random, threading, time, uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+import orjson
+from observability.metrics import review_queue_wait_seconds, span_seconds
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+# Append every span to this JSON-lines file (off when empty); one line per span, safe to share across processes
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+
+# (trace id, span id) of the innermost open span; span ids only exist while exporting
+_current: ContextVar[Tuple[Optional[str], Optional[str]]] = ContextVar("patchpilot_span", default=(None, None))
+
+
+class _JsonlExporter:
+    """
+        Writes finished spans to a JSON-lines file from a background thread.
+
+        `emit` only enqueues, so the instrumented code never waits on disk.
+        Each span is one `write` on an O_APPEND file, which keeps lines from
+        several worker processes intact.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[Dict]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="patchpilot-trace-export", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def emit(self, record: Dict) -> None:
+        self._queue.put(record)
+
+    def close(self, timeout: float = 2.0) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        try:
+            f = open(self.path, "ab", buffering=0)
+        except OSError as e:
+            logger.error(f"[Tracing] Cannot open trace export file {self.path}: {e}")
+            return
+        with f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                lines = [record]
+                # Drain whatever else is queued into the same write
+                while not self._queue.empty():
+                    record = self._queue.get()
+                    if record is None:
+                        self._write(f, lines)
+                        return
+                    lines.append(record)
+                self._write(f, lines)
+
+    def _write(self, f, records) -> None:
+        try:
+            f.write(b"".join(orjson.dumps(r, default=str) + b"\n" for r in records))
+        except OSError as e:
+            logger.warning(f"[Tracing] Dropped {len(records)} span(s): {e}")
+
+
+_exporter: Optional[_JsonlExporter] = _JsonlExporter(TRACE_EXPORT_PATH) if TRACING_ENABLED and TRACE_EXPORT_PATH else None
+
+
+_children: Dict[str, object] = {}
+
+
+def _histogram(name: str):
+    # Labelled children are cached: `labels()` takes a lock and builds a key on every call
+    child = _children.get(name)
+    if child is None:
+        child = _children[name] = span_seconds.labels(span=name)
+    return child
+
+
+def _span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+_NOOP = nullcontext()
+
+
+class _Span:
+    """Context manager behind `span`; a class rather than a generator to keep per-span overhead low."""
+
+    __slots__ = ("name", "attrs", "_histogram", "_start", "_reset", "_trace_id", "_span_id", "_parent_id", "_started_at")
+
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self._histogram = _histogram(name)
+        self._reset = None
+
+    def __enter__(self) -> None:
+        if _exporter is not None:
+            self._trace_id, self._parent_id = _current.get()
+            self._span_id = _span_id()
+            self._reset = _current.set((self._trace_id, self._span_id))
+            self._started_at = time.time()
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        duration = time.perf_counter() - self._start
+        self._histogram.observe(duration)
+        if self._reset is not None:
+            _current.reset(self._reset)
+            _exporter.emit({
+                "trace": self._trace_id, "span": self._span_id, "parent": self._parent_id, "name": self.name,
+                "start": self._started_at, "duration": duration,
+                "error": exc_type.__name__ if exc_type else None, "pid": os.getpid(), **self.attrs,
+            })
+
+
+def span(name: str, **attrs):
+    """
+        Time a block and record it as a span.
+
+        Every span is observed in `patchpilot_span_seconds{span=name}`, so
+        names must come from code, never from data. With TRACE_EXPORT_PATH
+        set, the span is also exported with its trace id, parent span and
+        `attrs`. Do not hold a span open across an async generator's `yield`;
+        use `record_span` there.
+    """
+    if not TRACING_ENABLED:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def record_span(name: str, duration: float, **attrs) -> None:
+    """Record an already-measured span (e.g. one spanning an async generator's lifetime)."""
+    if not TRACING_ENABLED:
+        return
+    _histogram(name).observe(duration)
+    if _exporter is not None:
+        trace_id, parent_id = _current.get()
+        _exporter.emit({
+            "trace": trace_id, "span": _span_id(), "parent": parent_id, "name": name,
+            "start": time.time() - duration, "duration": duration, "error": None, "pid": os.getpid(), **attrs,
+        })
+
+
+def traced(name: str):
+    """Decorator: run every call of an async function inside `span(name)`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def new_trace(trace_id: Optional[str] = None, delay: float = 0) -> Dict:
+    """
+        Start a trace for one review; it travels through the pipeline with the job.
+
+        Args:
+            trace_id (Optional[str]): E.g. the webhook delivery ID (random if empty).
+            delay (float): Countdown before the first stage may start; not counted as queue wait.
+
+        Returns:
+            Dict: {"id": str, "enqueued_at": float (UNIX time)}
+    """
+    return {"id": trace_id or uuid.uuid4().hex, "enqueued_at": time.time() + delay}
+
+
+def handoff(trace: Optional[Dict]) -> Optional[Dict]:
+    """The trace to pass to the next stage, stamped with the time it was queued."""
+    if trace is None:
+        return None
+    return {**trace, "enqueued_at": time.time()}
+
+
+@contextmanager
+def stage(trace: Optional[Dict], name: str, first_attempt: bool = True) -> Iterator[None]:
+    """
+        Run one pipeline stage as the root span `review.<name>` of its trace.
+
+        Queue wait (enqueue to stage start) is observed per stage on the first
+        attempt only; a retry's wait is dominated by its own countdown.
+        Enqueue times come from the wall clock of the enqueuing host, so
+        web and worker clocks must be in sync (NTP) for the wait to be exact.
+    """
+    trace = trace or {}
+    wait = None
+    if TRACING_ENABLED and first_attempt and trace.get("enqueued_at"):
+        wait = max(0.0, time.time() - trace["enqueued_at"])
+        review_queue_wait_seconds.labels(stage=name).observe(wait)
+
+    reset = _current.set((trace.get("id"), None))
+    try:
+        with span(f"review.{name}", queue_wait=wait):
+            yield
+    finally:
+        _current.reset(reset)
@@ -30,6 +30,20 @@ app.conf.update(
     task_annotations={"*": {"max_retries": 3}},
 )
 
+# Review stages (services/queue/pipeline.py): GitHub I/O on a wide pool,
+# LLM analysis on a pool sized to inference capacity.
+REVIEW_IO_QUEUE = os.getenv("REVIEW_IO_QUEUE", "io")
+REVIEW_LLM_QUEUE = os.getenv("REVIEW_LLM_QUEUE", "llm")
+app.conf.task_routes = {
+    "review_pull_request": {"queue": REVIEW_IO_QUEUE},
+    "review_analyze": {"queue": REVIEW_LLM_QUEUE},
+    "review_publish": {"queue": REVIEW_IO_QUEUE},
+}
+
+# Task modules live outside Django apps; only the worker imports them
+# (the web process enqueues by task name, see core/views.py).
+app.conf.include = ["services.queue.tasks"]
+
 # Auto-discover tasks across Django apps
 app.autodiscover_tasks()
 
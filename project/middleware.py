@@ -1,38 +1,71 @@
 import time, logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from observability.metrics import http_requests_total, request_latency_seconds
 
 logger = logging.getLogger(__name__)
 
+# Any other method string a client sends is counted as "OTHER"
+_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
 class MetricsMiddleware:
     """
     Django middleware that tracks HTTP request metrics for Prometheus.
 
     Captures:
-    - Total number of requests, labeled by method and path
-    - Latency (seconds) per path
+    - Total number of requests, labeled by method and route
+    - Latency (seconds) per route
+
+    Routes are the URL patterns Django matched ("/webhook/"), so label
+    values are bounded by urls.py however many distinct paths are requested.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        # Under ASGI keep the chain async so async views run without a thread hop
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         start = time.time()
         try:
             response = self.get_response(request)
             return response
         finally:
-            elapsed = time.time() - start
+            self._record(request, time.time() - start)
 
-            # Normalize path to avoid exploding labels (optional)
-            path = request.path or "unknown"
+    async def __acall__(self, request):
+        start = time.time()
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self._record(request, time.time() - start)
+
+    def _record(self, request, elapsed: float) -> None:
+        path = self._endpoint(request)
+
+        try:
+            method = request.method if request.method in _METHODS else "OTHER"
+            http_requests_total.labels(method, path).inc()
+            request_latency_seconds.labels(path).observe(elapsed)
+        except Exception as e:
+            # Defensive logging: metrics failures should never break requests
+            logger.warning(f"[MetricsMiddleware] Failed to record metrics for {path}: {e}")
 
-            try:
-                http_requests_total.labels(request.method, path).inc()
-                request_latency_seconds.labels(path).observe(elapsed)
-            except Exception as e:
-                # Defensive logging: metrics failures should never break requests
-                logger.warning(f"[MetricsMiddleware] Failed to record metrics for {path}: {e}")
+        logger.debug(
+            f"[MetricsMiddleware] {request.method} {request.path} took {elapsed:.4f}s"
+        )
 
-            logger.debug(
-                f"[MetricsMiddleware] {request.method} {path} took {elapsed:.4f}s"
-            )
+    @staticmethod
+    def _endpoint(request) -> str:
+        # Set by the URL resolver; None for 404s and requests that failed before routing
+        match = getattr(request, "resolver_match", None)
+        if match is None or match.route is None:
+            return "<unmatched>"
+        return "/" + match.route
@@ -1,12 +1,38 @@
+import inspect
 from langchain_core.messages import HumanMessage, SystemMessage
 
-def REVIEW_AGENT_PROMPT(head_sha, files):
+# Bump whenever a prompt below changes: cached reviews are keyed on it.
+PROMPT_VERSION = "4"
+
+
+def _compact(template: str, **fields) -> str:
+    """
+        Dedent a prompt template, then fill it in.
+
+        The templates below are indented with the code; sending that
+        indentation would spend tokens on every line of every prompt.
+        Dedenting before formatting leaves the inserted diffs untouched.
+    """
+    return inspect.cleandoc(template).format(**fields)
+
+
+# Appended to the system prompt when reviews also produce line-anchored findings
+_INLINE_FINDINGS = inspect.cleandoc("""
+    Each new-side line of the diff is prefixed with its line number in the new file.
+    After the Markdown, add a ```json block listing findings about specific changed lines:
+    [{"path": "<file path>", "line": <line number>, "body": "<concise finding>"}]
+    Only use numbered lines of the files shown. Write [] if no finding is tied to a line.
+""")
+
+def REVIEW_AGENT_PROMPT(head_sha, files, inline=False):
     """
         Build the structured prompt for PatchPilot's review agent.
 
         Args:
             head_sha (str): The commit SHA of the pull request head.
             files (str): Concatenated file diffs or file list with patches.
+            inline (bool): Also ask for line-anchored findings as JSON
+                (the diffs must carry line numbers, see findings.number_lines).
 
         Returns:
             list: A sequence of LangChain SystemMessage + HumanMessage
@@ -15,7 +41,7 @@ def REVIEW_AGENT_PROMPT(head_sha, files):
 
     # System role: lock down behavior and enforce Markdown format
     system_msg = SystemMessage(
-        content="""
+        content=_compact("""
             You are PatchPilot, an expert senior engineer performing code reviews.
 
             Your responsibilities:
@@ -47,18 +73,97 @@ def REVIEW_AGENT_PROMPT(head_sha, files):
 
             ## Suggestions
             - Actionable recommendations for the developer
-            """
+            """) + ("\n\n" + _INLINE_FINDINGS if inline else "")
     )
 
     # Human role: provide contextual input (commit + file diffs)
     human_msg = HumanMessage(
-        content=f"""
+        content=_compact("""
             Here are the changed files at commit {head_sha}:
 
             {files}
 
             Remember: Follow the structure exactly as outlined above.
-            """
+            """, head_sha=head_sha, files=files)
+    )
+
+    return [system_msg, human_msg]
+
+
+def REVIEW_CHUNK_PROMPT(head_sha, files, part, total, inline=False):
+    """
+        Build the "map" prompt for one chunk of a large pull request.
+
+        Args:
+            head_sha (str): The commit SHA of the pull request head.
+            files (str): Formatted diffs for the files/hunks in this chunk.
+            part (int): 1-based index of this chunk.
+            total (int): Total number of chunks in the review.
+            inline (bool): Also ask for line-anchored findings as JSON.
+
+        Returns:
+            list: SystemMessage + HumanMessage producing per-file findings.
+    """
+
+    system_msg = SystemMessage(
+        content=_compact("""
+            You are PatchPilot, an expert senior engineer reviewing one part of a larger pull request.
+            Other parts are reviewed separately and all findings are merged afterwards.
+
+            Your responsibilities:
+            - Review only the changes shown.
+            - Report concrete findings; do not summarize the whole pull request.
+            - Be concise, actionable, and professional.
+
+            Your output must strictly follow this Markdown structure, one section per file:
+
+            ### <file path>
+            - [Bug] ... / [Test] ... / [Style] ... / [Perf] ... / [Security] ... / [Suggestion] ...
+
+            If a file has no findings, write "- No findings." under its heading.
+            """) + ("\n\n" + _INLINE_FINDINGS if inline else "")
+    )
+
+    human_msg = HumanMessage(
+        content=_compact("""
+            Here is part {part} of {total} of the changes at commit {head_sha}:
+
+            {files}
+
+            Remember: Follow the structure exactly as outlined above.
+            """, head_sha=head_sha, files=files, part=part, total=total)
+    )
+
+    return [system_msg, human_msg]
+
+
+def REVIEW_REDUCE_PROMPT(head_sha, findings):
+    """
+        Build the "reduce" prompt that merges per-chunk findings into one review.
+
+        Args:
+            head_sha (str): The commit SHA of the pull request head.
+            findings (str): Concatenated per-file findings from every chunk.
+
+        Returns:
+            list: The REVIEW_AGENT_PROMPT system message + a HumanMessage
+                  carrying the findings, so the output keeps the same structure.
+    """
+
+    system_msg = REVIEW_AGENT_PROMPT(head_sha, "")[0]
+
+    human_msg = HumanMessage(
+        content=_compact("""
+            The pull request at commit {head_sha} was too large to review in one pass.
+            It was reviewed in parts; below are the per-file findings from every part.
+
+            {findings}
+
+            Merge these findings into a single review. Deduplicate repeated points,
+            keep file paths in each bullet, and drop "No findings." entries.
+
+            Remember: Follow the structure exactly as outlined above.
+            """, head_sha=head_sha, findings=findings)
     )
 
     return [system_msg, human_msg]
@@ -0,0 +1,65 @@
+import logging
+from django.core.cache import cache
+from observability.metrics import reviews_aborted_total, reviews_coalesced_total
+
+logger = logging.getLogger(__name__)
+
+LATEST_HEAD_TTL = 24 * 3600
+
+
+class ReviewSuperseded(Exception):
+    """Raised between review stages when a newer push arrived for the same PR."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"superseded before {stage}")
+        self.stage = stage
+
+
+def _latest_key(repo_full: str, pr_number: int) -> str:
+    return f"pp:pr:{repo_full}:{pr_number}:latest_head"
+
+
+def mark_latest_head(repo_full: str, pr_number: int, head_sha: str) -> None:
+    """
+        Record `head_sha` as the newest head for a PR (called on enqueue).
+
+        Reviews queued for older heads see the mismatch when they start and
+        drop themselves; running ones abort at the next stage boundary.
+    """
+    cache.set(_latest_key(repo_full, pr_number), head_sha, timeout=LATEST_HEAD_TTL)
+
+
+async def latest_head(repo_full: str, pr_number: int):
+    try:
+        return await cache.aget(_latest_key(repo_full, pr_number))
+    except Exception as e:
+        # Coalescing is an optimization: never block a review because the marker is unreadable
+        logger.warning(f"[Coalesce] Failed to read latest head for {repo_full}#{pr_number}: {e}")
+        return None
+
+
+async def is_superseded(repo_full: str, pr_number: int, head_sha: str) -> bool:
+    latest = await latest_head(repo_full, pr_number)
+    return latest is not None and latest != head_sha
+
+
+async def drop_if_superseded(repo_full: str, pr_number: int, head_sha: str) -> bool:
+    """Dequeue-time check: True (and counted as coalesced) if a newer head is queued."""
+    if await is_superseded(repo_full, pr_number, head_sha):
+        reviews_coalesced_total.inc()
+        logger.info(f"[Coalesce] Dropping review of {repo_full}#{pr_number} at {head_sha[:7]}: newer head queued")
+        return True
+    return False
+
+
+async def ensure_current(repo_full: str, pr_number: int, head_sha: str, stage: str) -> None:
+    """
+        Stage-boundary check for a running review.
+
+        Raises:
+            ReviewSuperseded: If a newer head was pushed since the review started.
+    """
+    if await is_superseded(repo_full, pr_number, head_sha):
+        reviews_aborted_total.labels(stage=stage).inc()
+        logger.info(f"[Coalesce] Aborting review of {repo_full}#{pr_number} at {head_sha[:7]} before {stage}: superseded")
+        raise ReviewSuperseded(stage)
@@ -0,0 +1,127 @@
+import asyncio, logging, threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (e.g. Windows); fall back to the stdlib loop
+    uvloop = None
+
+
+class WorkerLoop:
+    """
+    A long-lived event loop running on a background thread of a worker process.
+
+    Sync Celery tasks submit coroutines to it instead of calling `asyncio.run`,
+    so async resources (HTTP pools, token caches, Redis clients) survive
+    across tasks. Uses uvloop when it is installed.
+    """
+
+    def __init__(self, name: str = "patchpilot-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._shutdown_hooks: List[Callable[[], Awaitable[None]]] = []
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self) -> None:
+        """Start the loop thread (idempotent)."""
+        with self._lock:
+            if self.running:
+                return
+
+            loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=_run, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            logger.info("[WorkerLoop] Started %s event loop.", "uvloop" if uvloop else "asyncio")
+
+    def on_shutdown(self, hook: Callable[[], Awaitable[None]]) -> None:
+        """Register a coroutine function to await on the loop before it stops."""
+        self._shutdown_hooks.append(hook)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None):
+        """
+        Run a coroutine on the worker loop and block until it finishes.
+
+        Args:
+            coro (Awaitable): Coroutine to execute.
+            timeout (Optional[float]): Seconds to wait before cancelling it.
+
+        Returns:
+            Any: The coroutine's result; its exceptions propagate unchanged.
+        """
+        if not self.running:
+            self.start()
+
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise asyncio.TimeoutError(f"Coroutine did not finish within {timeout}s")
+        except BaseException:
+            # e.g. Celery's SoftTimeLimitExceeded raised in the calling thread
+            future.cancel()
+            raise
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Schedule a coroutine on the worker loop without waiting for it (e.g. background warm-up)."""
+        if not self.running:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def stop(self, drain_timeout: float = 30.0) -> None:
+        """Run shutdown hooks, wait for in-flight coroutines, then stop the loop."""
+        with self._lock:
+            if not self.running:
+                return
+            loop = self._loop
+
+            async def _drain():
+                for hook in self._shutdown_hooks:
+                    try:
+                        await hook()
+                    except Exception as e:
+                        logger.warning("[WorkerLoop] Shutdown hook %r failed: %s", hook, e)
+
+                pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+                if pending:
+                    logger.info("[WorkerLoop] Draining %d pending task(s).", len(pending))
+                    _, still_pending = await asyncio.wait(pending, timeout=drain_timeout)
+                    for t in still_pending:
+                        t.cancel()
+                await loop.shutdown_asyncgens()
+
+            try:
+                asyncio.run_coroutine_threadsafe(_drain(), loop).result(drain_timeout + 5)
+            except Exception as e:
+                logger.warning("[WorkerLoop] Drain did not complete cleanly: %s", e)
+            finally:
+                loop.call_soon_threadsafe(loop.stop)
+                self._thread.join(timeout=5)
+                loop.close()
+                self._loop, self._thread = None, None
+                logger.info("[WorkerLoop] Event loop stopped.")
+
+
+worker_loop = WorkerLoop()
+
+
+def run_coroutine(coro: Awaitable, timeout: Optional[float] = None):
+    """Run `coro` on this process's shared worker loop (started on first use)."""
+    return worker_loop.run(coro, timeout)
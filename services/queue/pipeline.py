@@ -0,0 +1,29 @@
+from celery import chain
+from project.celery import app
+
+# Stage task names (queue routing lives in project/celery.py)
+FETCH_TASK = "review_pull_request"
+ANALYZE_TASK = "review_analyze"
+PUBLISH_TASK = "review_publish"
+
+
+def review_pipeline(repo_full: str, pr_number: int, head_sha: str, installation_id: int, before_sha: str = None,
+                    trace: dict = None, refetch: bool = False) -> chain:
+    """
+        Build the staged review chain: fetch (io) → analyze (llm) → publish (io).
+
+        Stages are referenced by task name only, so enqueuing never imports the
+        task module (and the review/LLM stack behind it). Each stage retries on
+        its own; a stage that ends the review early returns a result without a
+        "job", which later stages pass through unchanged. `trace`
+        (`observability.tracing.new_trace`) travels with the job so every
+        stage's spans and queue wait are attributed to the same review.
+        `refetch` makes the fetch stage ignore a file list stored by an
+        earlier run (used when that list expired before analysis).
+    """
+    return chain(
+        app.signature(FETCH_TASK, args=(repo_full, pr_number, head_sha, installation_id, before_sha),
+                      kwargs={"trace": trace, "refetch": refetch}),
+        app.signature(ANALYZE_TASK),
+        app.signature(PUBLISH_TASK),
+    )
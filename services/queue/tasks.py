@@ -1,16 +1,110 @@
-import asyncio, logging, httpx
+import asyncio, logging, httpx, math, os
+from typing import Dict, Optional
 from contextlib import asynccontextmanager
-from celery import shared_task
-from celery.signals import worker_shutdown
+from celery import current_app, shared_task
+from django.core.cache import cache
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.signals import worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
 from adapters.github.auth import get_installation_token
-from adapters.github.client import list_pr_files
-from adapters.github.comments import post_pr_comment
-from services.review.review_agent import ReviewAgent
+from adapters.github.client import iter_pr_files, compare_commits, close_github_client
+from adapters.github.comments import post_pr_comment, post_pr_review, update_pr_comment
+from adapters.github.ratelimit import RateLimited
+from observability import tracing
+from observability.metrics import review_files_expired_total
+from services.queue.coalesce import ReviewSuperseded, drop_if_superseded, ensure_current
+from services.queue.loop import worker_loop, run_coroutine
+from services.queue.pipeline import FETCH_TASK, ANALYZE_TASK, PUBLISH_TASK, review_pipeline
+from project.celery import REVIEW_LLM_QUEUE
+from services.review.progress import REVIEW_STREAMING, ProgressiveComment
+from services.review.backends import close_backend_pools
+from services.review.review_agent import get_review_agent
+from services.storage.blob_store import BLOB_STORE_TTL, BlobNotFound, blob_store
+from services.review.state import (
+    get_last_review,
+    previous_history,
+    record_review,
+    remember_comment,
+    render_incremental_body,
+    review_history,
+)
 
 logger = logging.getLogger(__name__)
 
+# Guard for each IO stage, and the analyze-stage budget (map-reduce reviews of large PRs need more than one call)
+REVIEW_TASK_TIMEOUT = int(os.getenv("REVIEW_TASK_TIMEOUT", "300"))
+REVIEW_LLM_TIMEOUT = int(os.getenv("REVIEW_LLM_TIMEOUT", "180"))
+# Send a tiny prompt when an llm worker process starts, so the backend loads the model before the first review
+REVIEW_WARMUP = os.getenv("REVIEW_WARMUP", "false").lower() == "true"
+
+COMPARE_FILES_LIMIT = 300  # GitHub's compare API lists at most 300 files
+
+worker_loop.on_shutdown(close_github_client)
+worker_loop.on_shutdown(close_backend_pools)
+
+
+class RetryLater(Exception):
+    """
+        Raised inside a review coroutine to request a Celery retry.
+
+        Celery's task request context is thread-local, so `self.retry` must be
+        called from the task thread rather than from the worker loop.
+    """
+
+    def __init__(self, countdown: int, exc: Exception = None):
+        super().__init__(f"retry in {countdown}s")
+        self.countdown = countdown
+        self.exc = exc
+
+
+def _consumes_llm_queue() -> bool:
+    # Queues selected with -Q (all declared queues without it); io-only workers never load the LLM stack
+    return REVIEW_LLM_QUEUE in current_app.amqp.queues.consume_from
+
+
+async def _prepare_agent() -> None:
+    # The agent (and the LLM SDK import behind it) is built off the task thread: Celery
+    # kills child processes whose init handler runs longer than a few seconds
+    try:
+        agent = await asyncio.to_thread(get_review_agent)
+    except Exception as e:
+        logger.error("[PatchPilot] Failed to create the review agent at worker start: %s", e, exc_info=True)
+        return
+    if REVIEW_WARMUP:
+        await agent.warm_up()
+
+
+_prepared_pid: Optional[int] = None
+
+
+def _prepare_process() -> None:
+    """Start the worker loop and, on llm workers, build the agent; once per process."""
+    global _prepared_pid
+    if _prepared_pid == os.getpid():
+        return
+    _prepared_pid = os.getpid()
+    worker_loop.start()
+    if _consumes_llm_queue():
+        worker_loop.submit(_prepare_agent())
+
+
+@worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    _prepare_process()
+
+@worker_ready.connect
+def on_worker_ready(sender=None, **kwargs):
+    # Thread/solo pools run tasks in this process, where worker_process_init never fires.
+    # Under prefork this is the parent, which must not start threads before forking.
+    if not isinstance(getattr(sender, "pool", None), PreforkPool):
+        _prepare_process()
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(**kwargs):
+    worker_loop.stop()
+
 @worker_shutdown.connect
-def on_worker_shutdown(sig, how, exitcode, **kwargs):
+def on_worker_shutdown(**kwargs):
+    worker_loop.stop()
     logger.info("[PatchPilot] Worker shutting down gracefully. Active tasks drained.")
 
 @asynccontextmanager
@@ -22,91 +116,401 @@ async def timeout_guard(seconds: int, context: str):
         logger.error("[PatchPilot] Timeout after %ds for %s", seconds, context)
         raise
 
-@shared_task(
+async def _incremental_files(token: str, repo_full: str, base_sha: str, head_sha: str, before_sha: str, context: str):
+    """
+        Files changed since the last reviewed head, or None when a full review is needed.
+
+        Falls back to a full review after force-pushes/rebases (base no longer
+        an ancestor of head) or when the comparison is too large to be complete.
+    """
+    if before_sha != base_sha:
+        logger.info(
+            "[PatchPilot] Push base %s differs from last reviewed head %s for %s; comparing from last review",
+            before_sha[:7], base_sha[:7], context,
+        )
+
+    try:
+        comparison = await compare_commits(token, repo_full, base_sha, head_sha)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            logger.info("[PatchPilot] Last reviewed head %s no longer exists for %s; full review", base_sha[:7], context)
+            return None
+        raise
+
+    if comparison.get("status") != "ahead":
+        logger.info("[PatchPilot] History rewritten for %s (status=%s); full review", context, comparison.get("status"))
+        return None
+
+    files = comparison.get("files") or []
+    if len(files) >= COMPARE_FILES_LIMIT:
+        logger.info("[PatchPilot] Delta for %s exceeds the compare file limit; full review", context)
+        return None
+    return files
+
+
+def _files_key(repo_full: str, pr_number: int, head_sha: str, base_sha: Optional[str]) -> str:
+    return f"pp:pr:{repo_full}:{pr_number}:files:{head_sha}:{base_sha or 'full'}"
+
+
+async def _stored_files(repo_full: str, pr_number: int, head_sha: str, base_sha: Optional[str]) -> Optional[Dict]:
+    """
+        A file list already fetched for this head (e.g. by an earlier attempt).
+
+        Keyed by the base the fetch started from (None: full review); the value
+        records the base actually used, since a delta may fall back to full.
+
+        Returns:
+            Optional[Dict]: {"files_ref": str, "base_sha": Optional[str], "file_count": int}
+    """
+    try:
+        return await cache.aget(_files_key(repo_full, pr_number, head_sha, base_sha))
+    except Exception as e:
+        logger.warning("[PatchPilot] Failed to read stored file list for %s#%s: %s", repo_full, pr_number, e)
+        return None
+
+
+async def _store_files(repo_full: str, pr_number: int, head_sha: str, base_sha: Optional[str], stored: Dict) -> None:
+    try:
+        await cache.aset(_files_key(repo_full, pr_number, head_sha, base_sha), stored, timeout=BLOB_STORE_TTL)
+    except Exception as e:
+        logger.warning("[PatchPilot] Failed to record stored file list for %s#%s: %s", repo_full, pr_number, e)
+
+
+async def _publish_comment(token: str, repo_full: str, pr_number: int, body: str, comment_id: int = None) -> dict:
+    """Update the PR's existing review comment in place, or post a new one."""
+    if comment_id:
+        try:
+            return await update_pr_comment(token, repo_full, comment_id, body)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                raise
+            logger.warning("[PatchPilot] Previous review comment %s was deleted; posting a new one", comment_id)
+    return await post_pr_comment(token, repo_full, pr_number, body)
+
+
+_TASK_OPTIONS = dict(
     bind=True,
-    name="review_pull_request",
     autoretry_for=(httpx.RequestError, httpx.HTTPStatusError, Exception),
     retry_backoff=True,
     retry_jitter=True,
     max_retries=5,
-    default_retry_delay=30
+    default_retry_delay=30,
 )
-def review_pull_request(self, repo_full: str, pr_number: int, head_sha: str, installation_id: int):
+
+
+def _run_stage(task, stage: str, context: str, timeout: int, coro_fn, trace: dict = None):
+    """
+        Run one pipeline stage on the worker loop with the shared guards.
+
+        Superseded reviews end the pipeline (result without a "job"); timeouts
+        and unexpected errors retry only this stage. The stage is the root
+        span of its part of `trace`, which is re-stamped for the next stage.
     """
-        Celery task: run an AI-powered review on a GitHub Pull Request.
+    # Read on the task thread: Celery's request stack is thread-local and empty on the loop
+    first_attempt = not task.request.retries
+
+    async def _guarded():
+        try:
+            # Opened on the loop: span context lives in the coroutine, not the task thread
+            with tracing.stage(trace, stage, first_attempt=first_attempt):
+                async with timeout_guard(timeout, f"{stage} of {context}"):
+                    return await coro_fn()
+        except RetryLater:
+            raise
+        except ReviewSuperseded as superseded:
+            return {"superseded": True, "stage": superseded.stage}
+        except RateLimited as limited:
+            # Retry exactly when the budget is back instead of backing off blindly
+            logger.warning("[PatchPilot] %s of %s deferred by GitHub rate limit: %s", stage, context, limited)
+            raise RetryLater(math.ceil(limited.retry_after), limited)
+        except asyncio.TimeoutError as timeout_err:
+            logger.error("[PatchPilot] Timeout after %ds in %s of %s: %s", timeout, stage, context, timeout_err, exc_info=True)
+            raise RetryLater(60)
+        except Exception as e:
+            logger.error("[PatchPilot] Review %s failed for %s: %s", stage, context, e, exc_info=True)
+            raise RetryLater(30, e)
+        finally:
+            logger.info("[PatchPilot] Finished %s stage for %s", stage, context)
+
+    try:
+        result = run_coroutine(_guarded())
+    except RetryLater as r:
+        raise task.retry(countdown=r.countdown, exc=r.exc)
+    if "job" in result:
+        result["job"]["trace"] = tracing.handoff(trace)
+    return result
+
+
+async def _publish_inline(token: str, job: dict, context: str) -> int:
+    """
+        Submit the review's line comments as one pull request review.
+
+        Best effort: the summary comment is already published and recorded,
+        so a rejected review is logged instead of retrying the stage (which
+        would publish everything twice).
+
+        Returns:
+            int: Number of inline comments posted.
+    """
+    comments = job.get("comments") or []
+    if not comments:
+        return 0
+    body = f"PatchPilot left {len(comments)} inline comment(s) on `{job['head_sha'][:7]}`; see the review summary comment."
+    try:
+        await post_pr_review(token, job["repo_full"], job["pr_number"], job["head_sha"], body, comments)
+    except Exception as e:
+        logger.warning("[PatchPilot] Inline comments not posted for %s: %s", context, e)
+        return 0
+    logger.info("[PatchPilot] Posted %d inline comment(s) to %s", len(comments), context)
+    return len(comments)
+
+
+def _context(job: dict) -> str:
+    return f"PR #{job['pr_number']} in {job['repo_full']}"
+
+
+def _render(job: dict, text: str) -> str:
+    """Comment body for `text`: incremental reviews keep the earlier ones below."""
+    if not job.get("base_sha"):
+        return text
+    return render_incremental_body(text, job["base_sha"], job["head_sha"], job["file_count"], job.get("previous"))
+
+
+async def _token(installation_id: int) -> str:
+    # Tokens never travel through the broker; each stage reads the (cached) token itself
+    with tracing.span("github.token"):
+        token = await get_installation_token(installation_id)
+    if not token:
+        raise RuntimeError("Failed to obtain installation token")
+    return token
+
+
+@shared_task(name=FETCH_TASK, **_TASK_OPTIONS)
+def review_pull_request(self, repo_full: str, pr_number: int, head_sha: str, installation_id: int, before_sha: str = None,
+                        trace: dict = None, refetch: bool = False):
+    """
+        Celery task, stage 1 of the review pipeline (fetch, `io` queue).
 
         Steps:
+          0. Drop the task if a newer head was pushed for this PR meanwhile
+             (re-checked before analysis and before publishing).
           1. Authenticate as installation (App token).
-          2. Fetch changed PR files.
-          3. Run ReviewAgent for analysis.
-          4. Post review as a GitHub PR comment.
+          2. Select files: on `synchronize` (`before_sha` given) with a prior
+             review, only the delta since the last reviewed head; otherwise
+             all changed PR files.
+          3. Store the file list in the blob store and pass its reference on.
+             Retries and redeliveries for the same head reuse it and skip 1-2,
+             unless `refetch` is set because the stored list expired.
+
+        `trace` (from the webhook) times each step and the queue wait of every stage.
+
+        Returns:
+            dict: {"job": {...}} for `review_analyze`, or a final status
+            ({"superseded"/"skipped": True}) that ends the pipeline.
 
         Retries:
-          - Will retry up to 3 times with exponential backoff
-            if GitHub/LLM/network errors occur.
+          - Will retry with exponential backoff if GitHub/network errors occur.
     """
+    context = f"PR #{pr_number} in {repo_full}"
 
-    async def _run():
-        context = f"PR #{pr_number} in {repo_full}"
-        try:
-            async with timeout_guard(90, context):
-                logger.info("[PatchPilot] Starting review for %s", context)
-
-                # 1. Auth
-                token = await get_installation_token(installation_id)
-                if not token:
-                    raise RuntimeError("Failed to obtain installation token")
-                logger.info("[PatchPilot] Installation token acquired for %s", context)
-
-                # 2. Get files
-                files = await list_pr_files(token, repo_full, pr_number)
-                if not isinstance(files, list) or not all(isinstance(f, dict) for f in files):
-                    raise ValueError(f"Unexpected response for PR files: {files}")
-                logger.info("[PatchPilot] Retrieved %d file(s) for %s", len(files), context)
-
-                if not files:
-                    logger.warning("[PatchPilot] No files changed in %s, skipping review", context)
+    async def _fetch():
+        logger.info("[PatchPilot] Starting review for %s", context)
+
+        if await drop_if_superseded(repo_full, pr_number, head_sha):
+            return {"superseded": True}
+
+        last = await get_last_review(repo_full, pr_number)
+        if last and last.get("head_sha") == head_sha:
+            logger.info("[PatchPilot] %s already reviewed at %s, skipping", context, head_sha[:7])
+            return {"skipped": True}
+
+        # Delta reviews start from the last reviewed head
+        candidate_base = None
+        if before_sha and last and last.get("head_sha") and last.get("comment_id"):
+            candidate_base = last["head_sha"]
+
+        # A retry (or redelivery) for this head reuses the stored file list
+        stored = None if refetch else await _stored_files(repo_full, pr_number, head_sha, candidate_base)
+        if stored:
+            logger.info("[PatchPilot] Reusing stored file list for %s (%d file(s))", context, stored["file_count"])
+        else:
+            # 1. Auth
+            token = await _token(installation_id)
+            logger.info("[PatchPilot] Installation token acquired for %s", context)
+
+            # 2. Select files
+            delta = None
+            if candidate_base:
+                delta = await _incremental_files(token, repo_full, candidate_base, head_sha, before_sha, context)
+                if delta is not None and not delta:
+                    logger.info("[PatchPilot] No file changes since last review of %s", context)
+                    await record_review(repo_full, pr_number, head_sha, last["comment_id"], previous_history(last) or "")
                     return {"skipped": True}
 
-                # 3. Run agent
-                try:
-                    async with asyncio.timeout(180):
-                        agent = ReviewAgent()
-                        review = agent.review(files, head_sha)
-                    logger.info("[PatchPilot] Review successfully generated for %s", context)
-                except asyncio.TimeoutError as llm_err:
-                    logger.error("[PatchPilot] LLM review failed for %s: %s", context, llm_err, exc_info=True)
-                    raise self.retry(countdown=30)
-
-                # 4. Post comment
-                try:
-                    await post_pr_comment(token, repo_full, pr_number, review["summary"])
-                    logger.info("[PatchPilot] Posted comment to %s", context)
-                except httpx.HTTPStatusError as gh_err:
-                    status = gh_err.response.status_code
-
-                    if status in {403, 404, 429, 500, 502, 503, 504}:
-                        logger.warning(
-                            "[PatchPilot] Transient GitHub failure for %s (HTTP %s). Retrying later.",
-                            context, status,
-                        )
-                        raise self.retry(exc=gh_err)
-
-                    logger.error(
-                        "[PatchPilot] Non-retryable GitHub error for %s: HTTP %s %s",
-                        context, status, gh_err.response.text,
-                    )
-                    return {"failed_comment": True}
-
-                return {"ok": True}
-        except asyncio.TimeoutError as timeout_err:
-            logger.error("[PatchPilot] Timeout after 90s for %s: %s", context, timeout_err, exc_info=True)
-            raise self.retry(countdown=60)
-        except Exception as e:
-            logger.error("[PatchPilot] Review task failed for %s: %s", context, e, exc_info=True)
-            raise self.retry(countdown=30, exc=e)
+            if delta is not None:
+                files = delta
+            else:
+                with tracing.span("github.files"):
+                    files = [f async for f in iter_pr_files(token, repo_full, pr_number)]
+            logger.info(
+                "[PatchPilot] Retrieved %d file(s) for %s (%s)",
+                len(files), context, "incremental" if delta is not None else "full",
+            )
+            if not files:
+                logger.warning("[PatchPilot] No files changed in %s, skipping review", context)
+                return {"skipped": True}
 
-        finally:
-            logger.info("[PatchPilot] Finished review task for %s", context)
+            # Later stages get a reference; the (possibly multi-MB) list never goes through the broker
+            stored = {
+                "files_ref": await blob_store.put_json(files),
+                "base_sha": candidate_base if delta is not None else None,
+                "file_count": len(files),
+            }
+            await _store_files(repo_full, pr_number, head_sha, candidate_base, stored)
+
+        return {"job": {
+            "repo_full": repo_full,
+            "pr_number": pr_number,
+            "head_sha": head_sha,
+            "installation_id": installation_id,
+            # The webhook's own push base, kept so a re-fetch selects files exactly as this run did
+            "before_sha": before_sha,
+            **stored,
+            # Incremental reviews: every earlier review of the PR is kept below the new one
+            "previous": previous_history(last) if stored["base_sha"] else None,
+            "comment_id": (last or {}).get("comment_id"),
+            "refetched": refetch,
+        }}
+
+    return _run_stage(self, "fetch", context, REVIEW_TASK_TIMEOUT, _fetch, trace)
+
+
+def _requeue(job: dict) -> None:
+    """Start the review over from the fetch stage, ignoring the stored (expired) file list."""
+    review_pipeline(
+        job["repo_full"], job["pr_number"], job["head_sha"], job["installation_id"],
+        before_sha=job.get("before_sha"), trace=tracing.handoff(job.get("trace")), refetch=True,
+    ).apply_async()
+
+
+@shared_task(name=ANALYZE_TASK, **_TASK_OPTIONS)
+def review_analyze(self, result: dict):
+    """
+        Celery task, stage 2 of the review pipeline (analyze, `llm` queue).
+
+        Runs ReviewAgent over the fetched files. With REVIEW_STREAMING, a
+        placeholder comment is posted first and edited as sections complete.
+        If the stored file list has expired, the review is re-queued from
+        the fetch stage (once) and this pipeline ends.
+
+        Returns:
+            dict: {"job": {...}} with the review summary and its token usage
+            for `review_publish`, or the incoming final status unchanged.
+    """
+    if "job" not in result:
+        return result
+    job = result["job"]
+    context = _context(job)
+
+    async def _analyze():
+        await ensure_current(job["repo_full"], job["pr_number"], job["head_sha"], "analyze")
+
+        try:
+            files = await blob_store.get_json(job["files_ref"])
+        except BlobNotFound:
+            # Expired, or written to another host's local disk: fetch the files again
+            if job.get("refetched"):
+                logger.error("[PatchPilot] Stored file list for %s expired again after re-fetching; dropping review", context)
+                review_files_expired_total.labels(outcome="dropped").inc()
+                return {"expired": True}
+            logger.warning("[PatchPilot] Stored file list for %s expired before analysis; re-queuing the review", context)
+            review_files_expired_total.labels(outcome="refetched").inc()
+            await asyncio.to_thread(_requeue, job)
+            return {"expired": True, "requeued": True}
+
+        # A placeholder posted by an earlier attempt is only in the review state, not in the task args
+        last = await get_last_review(job["repo_full"], job["pr_number"])
+        comment_id = (last or {}).get("comment_id") or job["comment_id"]
+
+        progress = None
+        if REVIEW_STREAMING:
+            try:
+                progress = ProgressiveComment(
+                    await _token(job["installation_id"]), job["repo_full"], job["pr_number"], comment_id,
+                    render=lambda text: _render(job, text),
+                )
+                await remember_comment(job["repo_full"], job["pr_number"], await progress.start())
+            except Exception as e:
+                logger.warning("[PatchPilot] Placeholder comment failed for %s, not streaming: %s", context, e)
+                progress = None
+
+        # 3. Run agent (one per worker process, created and optionally warmed up at process start)
+        agent = get_review_agent()
+        review = await agent.areview(files, job["head_sha"], on_progress=progress.update if progress else None)
+        usage = review["usage"]
+        logger.info(
+            "[PatchPilot] Review successfully generated for %s (%d LLM call(s), %d prompt + %d completion tokens)",
+            context, usage["calls"], usage["prompt_tokens"], usage["completion_tokens"],
+        )
+
+        analyzed = {**job, "summary": review["summary"], "comments": review["comments"], "usage": usage,
+                    "comment_id": comment_id}
+        if progress and progress.comment_id:
+            analyzed["comment_id"] = progress.comment_id
+        return {"job": analyzed}
+
+    return _run_stage(self, "analyze", context, REVIEW_LLM_TIMEOUT, _analyze, job.get("trace"))
+
+
+@shared_task(name=PUBLISH_TASK, **_TASK_OPTIONS)
+def review_publish(self, result: dict):
+    """
+        Celery task, stage 3 of the review pipeline (publish, `io` queue).
+
+        Updates the PR's previous review comment in place, or posts a new one,
+        and records the reviewed head SHA. Line-anchored findings are then
+        submitted as one pull request review. Retries never re-run inference.
+
+        Returns:
+            dict: {"ok": True, "incremental": bool, "inline_comments": int, "usage": dict}
+            (the review's LLM token record), or a final status.
+    """
+    if "job" not in result:
+        return result
+    job = result["job"]
+    context = _context(job)
+
+    async def _publish():
+        await ensure_current(job["repo_full"], job["pr_number"], job["head_sha"], "publish")
+
+        # 4. Publish comment
+        token = await _token(job["installation_id"])
+        try:
+            comment = await _publish_comment(
+                token, job["repo_full"], job["pr_number"], _render(job, job["summary"]), job["comment_id"]
+            )
+            logger.info("[PatchPilot] Published review comment to %s", context)
+        except httpx.HTTPStatusError as gh_err:
+            status = gh_err.response.status_code
+
+            if status in {403, 404, 429, 500, 502, 503, 504}:
+                logger.warning(
+                    "[PatchPilot] Transient GitHub failure for %s (HTTP %s). Retrying later.",
+                    context, status,
+                )
+                raise RetryLater(30, gh_err)
+
+            logger.error(
+                "[PatchPilot] Non-retryable GitHub error for %s: HTTP %s %s",
+                context, status, gh_err.response.text,
+            )
+            return {"failed_comment": True}
+
+        history = review_history(job["summary"], job["head_sha"], job.get("base_sha"), job.get("previous"))
+        await record_review(job["repo_full"], job["pr_number"], job["head_sha"], comment.get("id"), history)
+
+        # 5. Line comments, all in one review request
+        inline = await _publish_inline(token, job, context)
+        return {"ok": True, "incremental": bool(job.get("base_sha")), "inline_comments": inline, "usage": job.get("usage")}
 
-    return asyncio.run(_run())
+    return _run_stage(self, "publish", context, REVIEW_TASK_TIMEOUT, _publish, job.get("trace"))
@@ -0,0 +1,405 @@
+import asyncio, contextlib, json, logging, os, threading, time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+from observability.metrics import (
+    llm_endpoint_healthy,
+    llm_endpoint_latency_seconds,
+    llm_endpoint_outstanding,
+    llm_endpoint_requests_total,
+)
+from services.review.usage import SERVED_BY
+
+logger = logging.getLogger(__name__)
+
+# JSON list of endpoints, e.g.
+#   [{"backend": "ollama", "url": "http://gpu1:11434", "max_concurrency": 4},
+#    {"backend": "openai", "url": "http://vllm:8000/v1", "model": "gemma-3-4b-it"}]
+# Empty: ReviewAgent talks to its single default backend.
+LLM_ENDPOINTS = os.getenv("LLM_ENDPOINTS", "")
+LLM_ROUTING = os.getenv("LLM_ROUTING", "least_outstanding")  # or "ewma"
+LLM_ENDPOINT_MAX_CONCURRENCY = int(os.getenv("LLM_ENDPOINT_MAX_CONCURRENCY", "4"))
+LLM_EJECT_AFTER_FAILURES = int(os.getenv("LLM_EJECT_AFTER_FAILURES", "3"))
+LLM_EJECT_SECONDS = float(os.getenv("LLM_EJECT_SECONDS", "30"))
+LLM_HEALTH_INTERVAL = float(os.getenv("LLM_HEALTH_INTERVAL", "10"))
+# How long Ollama keeps the model loaded after a request ("30m", "-1" = forever); unset: server default
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE") or None
+EWMA_DECAY = 0.3  # weight of the newest latency sample
+
+
+class NoHealthyEndpoint(RuntimeError):
+    """Raised when every endpoint of a pool is ejected or failed for a request."""
+
+
+class Endpoint:
+    """
+        One inference server in a BackendPool, with its routing state.
+
+        Args:
+            backend (str): "ollama" or "openai" (any OpenAI-compatible server).
+            url (str): Base URL, e.g. "http://gpu1:11434" or "http://vllm:8000/v1".
+            model (str): Model name served by this endpoint.
+            temperature (float): Sampling temperature.
+            max_concurrency (int): Requests in flight before the endpoint counts as full.
+    """
+
+    def __init__(self, backend: str, url: str, model: str, temperature: float = 0.2,
+                 max_concurrency: int = LLM_ENDPOINT_MAX_CONCURRENCY):
+        if backend not in {"ollama", "openai"}:
+            raise ValueError(f"Unsupported backend: {backend}")
+        self.backend = backend
+        self.url = url.rstrip("/")
+        self.model = model
+        self.temperature = temperature
+        self.max_concurrency = max(1, max_concurrency)
+        self.name = f"{backend}@{self.url}"
+
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self._llm = None
+
+    @property
+    def llm(self):
+        """The LangChain chat model for this endpoint (SDK imported on first use)."""
+        if self._llm is None:
+            if self.backend == "ollama":
+                from langchain_ollama import ChatOllama
+                self._llm = ChatOllama(
+                    model=self.model, temperature=self.temperature, base_url=self.url, keep_alive=ollama_keep_alive(),
+                )
+            else:
+                from langchain_openai import ChatOpenAI
+                self._llm = ChatOpenAI(
+                    model=self.model, temperature=self.temperature, base_url=self.url,
+                    api_key=os.getenv("OPENAI_API_KEY", "unused"),
+                )
+        return self._llm
+
+    @property
+    def health_url(self) -> str:
+        return f"{self.url}/api/tags" if self.backend == "ollama" else f"{self.url}/models"
+
+
+def _served_by(message: Any, endpoint: Endpoint) -> Any:
+    """Tag a response (or stream chunk) with the endpoint that produced it, for per-backend token accounting."""
+    metadata = getattr(message, "response_metadata", None)
+    if isinstance(metadata, dict):
+        metadata[SERVED_BY] = {"backend": endpoint.backend, "model": endpoint.model}
+    return message
+
+
+class BackendPool:
+    """
+        Routes LLM calls across several inference endpoints.
+
+        Exposes the subset of the LangChain chat-model interface ReviewAgent
+        uses (`invoke`, `ainvoke`, `astream`), so it can stand in for `llm`.
+
+        Routing picks, among endpoints that are not ejected and below their
+        concurrency cap, the one with the fewest requests in flight
+        ("least_outstanding") or the lowest EWMA latency weighted by its load
+        ("ewma"). When every endpoint is full, callers queue until one frees up.
+
+        An endpoint is ejected for `eject_seconds` after `eject_after`
+        consecutive failures; the failed call is retried on another endpoint
+        (streams only if nothing was yielded yet). A background health check
+        probes ejected endpoints and returns them early once they answer.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        routing: str = LLM_ROUTING,
+        eject_after: int = LLM_EJECT_AFTER_FAILURES,
+        eject_seconds: float = LLM_EJECT_SECONDS,
+        health_interval: float = LLM_HEALTH_INTERVAL,
+    ):
+        if not endpoints:
+            raise ValueError("BackendPool needs at least one endpoint")
+        if routing not in {"least_outstanding", "ewma"}:
+            raise ValueError(f"Unsupported routing strategy: {routing}")
+        self.endpoints = endpoints
+        self.routing = routing
+        self.eject_after = max(1, eject_after)
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.model_id = ",".join(sorted({f"{e.backend}:{e.model}" for e in endpoints}))
+        self._waiters: deque = deque()
+        self._health_task: Optional[asyncio.Task] = None
+        for e in endpoints:
+            llm_endpoint_healthy.labels(endpoint=e.name).set(1)
+
+    @classmethod
+    def from_config(cls, config: str, model: str, temperature: float = 0.2, **kwargs) -> "BackendPool":
+        """
+            Build a pool from LLM_ENDPOINTS-style JSON.
+
+            Entries need "url"; "backend" defaults to "ollama", "model" to
+            `model` and "max_concurrency" to LLM_ENDPOINT_MAX_CONCURRENCY.
+
+            Raises:
+                ValueError: If the JSON is malformed or an entry is invalid.
+        """
+        try:
+            entries = json.loads(config)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"LLM_ENDPOINTS is not valid JSON: {e}") from e
+
+        endpoints = [
+            Endpoint(
+                backend=entry.get("backend", "ollama"),
+                url=entry["url"],
+                model=entry.get("model", model),
+                temperature=temperature,
+                max_concurrency=int(entry.get("max_concurrency", LLM_ENDPOINT_MAX_CONCURRENCY)),
+            )
+            for entry in entries
+        ]
+        return cls(endpoints, **kwargs)
+
+    # --- LangChain-compatible surface ---
+
+    async def ainvoke(self, prompt) -> Any:
+        """
+            Raises:
+                NoHealthyEndpoint: If every usable endpoint failed this request.
+        """
+        tried, last_error = set(), None
+        while True:
+            endpoint = await self._acquire(tried, last_error)
+            tried.add(endpoint)
+            start = time.perf_counter()
+            try:
+                result = await endpoint.llm.ainvoke(prompt)
+            except asyncio.CancelledError:
+                self._release(endpoint, start, ok=None)
+                raise
+            except Exception as e:
+                self._release(endpoint, start, ok=False, error=e)
+                last_error = e
+                continue
+            self._release(endpoint, start, ok=True)
+            return _served_by(result, endpoint)
+
+    async def astream(self, prompt) -> AsyncIterator[Any]:
+        """
+            Raises:
+                NoHealthyEndpoint: If every usable endpoint failed before streaming.
+        """
+        tried, last_error = set(), None
+        while True:
+            endpoint = await self._acquire(tried, last_error)
+            tried.add(endpoint)
+            start, yielded = time.perf_counter(), False
+            try:
+                async for chunk in endpoint.llm.astream(prompt):
+                    yielded = True
+                    yield _served_by(chunk, endpoint)
+            except (asyncio.CancelledError, GeneratorExit):
+                self._release(endpoint, start, ok=None)
+                raise
+            except Exception as e:
+                self._release(endpoint, start, ok=False, error=e)
+                if yielded:
+                    raise  # the caller already consumed part of this answer
+                last_error = e
+                continue
+            self._release(endpoint, start, ok=True)
+            return
+
+    def invoke(self, prompt) -> Any:
+        """Blocking call for the sync `ReviewAgent.review` path (no queuing, same routing/ejection)."""
+        tried, errors = set(), []
+        while True:
+            endpoint = self._pick(time.time(), exclude=tried, ignore_caps=True)
+            if endpoint is None:
+                raise NoHealthyEndpoint(f"All LLM endpoints failed for this request: {errors}")
+            tried.add(endpoint)
+            self._claim(endpoint)
+            start = time.perf_counter()
+            try:
+                result = endpoint.llm.invoke(prompt)
+            except Exception as e:
+                errors.append(e)
+                self._release(endpoint, start, ok=False, error=e)
+                continue
+            self._release(endpoint, start, ok=True)
+            return _served_by(result, endpoint)
+
+    async def warm_up(self, prompt) -> None:
+        """Send `prompt` to every endpoint at once so each loads its model; failures are logged, not raised."""
+
+        async def _warm(endpoint: Endpoint):
+            start = time.perf_counter()
+            try:
+                await endpoint.llm.ainvoke(prompt)
+            except Exception as e:
+                logger.warning(f"[BackendPool] Warm-up of {endpoint.name} failed: {e}")
+                return
+            logger.info(f"[BackendPool] Warmed up {endpoint.name} in {time.perf_counter() - start:.1f}s")
+
+        await asyncio.gather(*(_warm(e) for e in self.endpoints))
+
+    async def aclose(self) -> None:
+        """Stop the background health check."""
+        if self._health_task is not None and not self._health_task.done():
+            self._health_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._health_task
+
+    # --- Routing ---
+
+    def _pick(self, now: float, exclude=(), ignore_caps: bool = False) -> Optional[Endpoint]:
+        candidates = [
+            e for e in self.endpoints
+            if e not in exclude and now >= e.ejected_until and (ignore_caps or e.outstanding < e.max_concurrency)
+        ]
+        if not candidates:
+            return None
+        if self.routing == "ewma":
+            # Unmeasured endpoints go first so every endpoint gets a latency sample
+            return min(candidates, key=lambda e: (e.ewma_latency is not None, (e.ewma_latency or 0) * (e.outstanding + 1)))
+        return min(candidates, key=lambda e: (e.outstanding / e.max_concurrency, e.ewma_latency or 0))
+
+    async def _acquire(self, tried: set, last_error: Optional[Exception]) -> Endpoint:
+        """Reserve a slot on the best endpoint not yet tried, queuing while all are at their cap."""
+        self._ensure_health_checks()
+        requeue = False
+        while True:
+            now = time.time()
+            endpoint = self._pick(now, exclude=tried)
+            # Newcomers queue behind callers already waiting, so a freed slot goes to the longest waiter
+            if endpoint is not None and (requeue or not self._has_waiters()):
+                self._claim(endpoint)
+                return endpoint
+
+            if not any(e not in tried and now >= e.ejected_until for e in self.endpoints):
+                raise NoHealthyEndpoint(f"No healthy LLM endpoint left for this request (last error: {last_error})")
+
+            waiter = asyncio.get_running_loop().create_future()
+            # A woken caller that lost the slot to a newcomer keeps its place at the front
+            (self._waiters.appendleft if requeue else self._waiters.append)(waiter)
+            requeue = True
+            try:
+                # Re-check periodically as well: ejections expire without a release
+                await asyncio.wait_for(waiter, timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim(self, endpoint: Endpoint) -> None:
+        """Take a slot on the endpoint and publish its new in-flight count."""
+        endpoint.outstanding += 1
+        llm_endpoint_outstanding.labels(endpoint=endpoint.name).set(endpoint.outstanding)
+
+    def _release(self, endpoint: Endpoint, start: float, ok: Optional[bool], error: Exception = None) -> None:
+        """Free the endpoint slot and record the outcome (ok=None: abandoned by the caller, not counted)."""
+        elapsed = time.perf_counter() - start
+        endpoint.outstanding -= 1
+        llm_endpoint_outstanding.labels(endpoint=endpoint.name).set(endpoint.outstanding)
+        if ok is None:
+            self._wake()
+            return
+        llm_endpoint_requests_total.labels(endpoint=endpoint.name, outcome="ok" if ok else "error").inc()
+
+        if ok:
+            llm_endpoint_latency_seconds.labels(endpoint=endpoint.name).observe(elapsed)
+            endpoint.ewma_latency = elapsed if endpoint.ewma_latency is None else (
+                EWMA_DECAY * elapsed + (1 - EWMA_DECAY) * endpoint.ewma_latency
+            )
+            endpoint.consecutive_failures = 0
+        else:
+            endpoint.consecutive_failures += 1
+            logger.warning(f"[BackendPool] {endpoint.name} failed ({endpoint.consecutive_failures} in a row): {error}")
+            if endpoint.consecutive_failures >= self.eject_after and endpoint.ejected_until <= time.time():
+                self._eject(endpoint)
+        self._wake()
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        endpoint.ejected_until = time.time() + self.eject_seconds
+        llm_endpoint_healthy.labels(endpoint=endpoint.name).set(0)
+        logger.error(f"[BackendPool] Ejected {endpoint.name} for {self.eject_seconds:.0f}s")
+
+    def _restore(self, endpoint: Endpoint) -> None:
+        endpoint.ejected_until = 0.0
+        endpoint.consecutive_failures = 0
+        llm_endpoint_healthy.labels(endpoint=endpoint.name).set(1)
+        logger.info(f"[BackendPool] {endpoint.name} is healthy again")
+        self._wake()
+
+    def _has_waiters(self) -> bool:
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()
+        return bool(self._waiters)
+
+    def _wake(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+                return
+
+    # --- Health checks ---
+
+    def _ensure_health_checks(self) -> None:
+        if self.health_interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if self._health_task is None or self._health_task.done() or self._health_task.get_loop() is not loop:
+            self._health_task = loop.create_task(self._health_loop())
+
+    async def _health_loop(self) -> None:
+        async with httpx.AsyncClient(timeout=5) as client:
+            while True:
+                await asyncio.sleep(self.health_interval)
+                now = time.time()
+                for endpoint in [e for e in self.endpoints if e.ejected_until > now]:
+                    try:
+                        (await client.get(endpoint.health_url)).raise_for_status()
+                    except Exception as e:
+                        logger.debug(f"[BackendPool] Health check of {endpoint.name} failed: {e}")
+                        continue
+                    self._restore(endpoint)
+
+
+def ollama_keep_alive():
+    """LLM_KEEP_ALIVE as Ollama expects it: seconds as an int, otherwise a duration string."""
+    if LLM_KEEP_ALIVE is None:
+        return None
+    try:
+        return int(LLM_KEEP_ALIVE)
+    except ValueError:
+        return LLM_KEEP_ALIVE
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_pools: Dict[tuple, BackendPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_backend_pool(model: str, temperature: float = 0.2) -> Optional[BackendPool]:
+    """
+        The process-wide pool for LLM_ENDPOINTS, or None when it is not configured.
+
+        Shared by every ReviewAgent in the process, so in-flight counts and
+        latency estimates cover all concurrent reviews.
+    """
+    if not LLM_ENDPOINTS.strip():
+        return None
+    key = (model, temperature)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = BackendPool.from_config(LLM_ENDPOINTS, model, temperature)
+            logger.info(f"[BackendPool] Routing {model} across {len(_pools[key].endpoints)} endpoint(s) ({LLM_ROUTING})")
+        return _pools[key]
+
+
+async def close_backend_pools() -> None:
+    """Stop the pools' background health checks (worker loop shutdown hook)."""
+    for pool in list(_pools.values()):
+        await pool.aclose()
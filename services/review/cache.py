@@ -0,0 +1,126 @@
+import hashlib, json, logging, os, threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from django.core.cache import cache
+from observability.metrics import review_cache_hits_total, review_cache_misses_total
+
+logger = logging.getLogger(__name__)
+
+REVIEW_CACHE_ENABLED = os.getenv("REVIEW_CACHE_ENABLED", "true").lower() == "true"
+REVIEW_CACHE_TTL = int(os.getenv("REVIEW_CACHE_TTL", str(7 * 24 * 3600)))
+REVIEW_CACHE_LOCAL_SIZE = int(os.getenv("REVIEW_CACHE_LOCAL_SIZE", "1024"))
+
+
+def review_key(kind: str, model: str, prompt_version: str, content) -> str:
+    """
+        Content address for a cached review artifact.
+
+        Args:
+            kind (str): "pr" for a whole review, "file" for per-file findings.
+            model (str): Backend/model identifier; different models never share entries.
+            prompt_version (str): Bumped whenever prompts change.
+            content: JSON-serializable patch content the result was derived from.
+
+        Returns:
+            str: Cache key, e.g. "pp:review:file:<sha256>".
+    """
+    blob = json.dumps([model, prompt_version, content], sort_keys=True, separators=(",", ":"))
+    return f"pp:review:{kind}:{hashlib.sha256(blob.encode()).hexdigest()}"
+
+
+class ReviewCache:
+    """
+        Two-level cache for review results keyed by patch content hash.
+
+        An in-process LRU sits in front of the shared Django cache (Redis),
+        where entries expire after `ttl` seconds; Redis' own maxmemory policy
+        handles LRU eviction under memory pressure. Cache failures are logged
+        and treated as misses so reviews never fail because of the cache.
+    """
+
+    def __init__(self, ttl: int = REVIEW_CACHE_TTL, local_size: int = REVIEW_CACHE_LOCAL_SIZE):
+        self.ttl = ttl
+        self.local_size = local_size
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get_many(self, kind: str, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(keys)
+        found: Dict[str, str] = {}
+        with self._lock:
+            for k in keys:
+                if k in self._local:
+                    self._local.move_to_end(k)
+                    found[k] = self._local[k]
+
+        remote = [k for k in keys if k not in found]
+        if remote:
+            try:
+                shared = await cache.aget_many(remote)
+            except Exception as e:
+                logger.warning(f"[ReviewCache] Shared cache read failed: {e}")
+                shared = {}
+            for k, v in shared.items():
+                self._remember(k, v)
+            found.update(shared)
+
+        hits = len(found)
+        if hits:
+            review_cache_hits_total.labels(kind=kind).inc(hits)
+        if len(keys) - hits:
+            review_cache_misses_total.labels(kind=kind).inc(len(keys) - hits)
+        return found
+
+    async def get(self, kind: str, key: str) -> Optional[str]:
+        return (await self.get_many(kind, [key])).get(key)
+
+    async def set_many(self, entries: Dict[str, str]) -> None:
+        if not entries:
+            return
+        for k, v in entries.items():
+            self._remember(k, v)
+        try:
+            await cache.aset_many(entries, timeout=self.ttl)
+        except Exception as e:
+            logger.warning(f"[ReviewCache] Shared cache write failed: {e}")
+
+    async def set(self, key: str, value: str) -> None:
+        await self.set_many({key: value})
+
+    def _remember(self, key: str, value: str) -> None:
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+
+def split_file_sections(text: str, filenames: Iterable[str]) -> Dict[str, List[str]]:
+    """
+        Split a chunk review (REVIEW_CHUNK_PROMPT output) into per-file sections.
+
+        Headings are matched against the chunk's filenames after stripping
+        backticks and any "(part i/n)" suffix; unmatched sections are ignored.
+
+        Returns:
+            Dict[str, List[str]]: filename -> list of "### path" sections.
+    """
+    wanted = set(filenames)
+    sections: Dict[str, List[str]] = {}
+    current_name, current_lines = None, []
+
+    def _flush():
+        if current_name in wanted and current_lines:
+            sections.setdefault(current_name, []).append("\n".join(current_lines).strip())
+
+    for line in text.splitlines():
+        if line.startswith("### "):
+            _flush()
+            heading = line[4:].strip().strip("`").strip()
+            if " (part " in heading:
+                heading = heading.split(" (part ", 1)[0].strip().strip("`")
+            current_name, current_lines = heading, [f"### {heading}"]
+        elif current_name is not None:
+            current_lines.append(line)
+    _flush()
+    return sections
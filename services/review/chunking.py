@@ -0,0 +1,122 @@
+import logging
+from functools import lru_cache
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """Load the tiktoken encoding once; None if it is unavailable (e.g. offline, no cached BPE)."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning(f"[Chunking] tiktoken unavailable ({e}); estimating tokens as chars/4.")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+        Count tokens in `text` with tiktoken, falling back to a chars/4 estimate.
+
+        The count is a budget heuristic: local models use other tokenizers,
+        so chunk budgets should leave headroom below the real context size.
+    """
+    enc = _encoding()
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def split_hunks(patch: str) -> List[str]:
+    """Split a unified-diff patch into hunks at `@@` headers."""
+    hunks: List[str] = []
+    current: List[str] = []
+    for line in patch.splitlines(keepends=True):
+        if line.startswith("@@") and current:
+            hunks.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        hunks.append("".join(current))
+    return hunks
+
+
+def _split_oversized(hunk: str, max_tokens: int) -> List[str]:
+    """Last resort for a single hunk over budget: cut it at line boundaries."""
+    pieces: List[str] = []
+    current: List[str] = []
+    used = 0
+    for line in hunk.splitlines(keepends=True):
+        cost = count_tokens(line)
+        if current and used + cost > max_tokens:
+            pieces.append("".join(current))
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def chunk_files(files: List[Dict], max_tokens: int) -> List[List[Dict]]:
+    """
+        Pack PR files into token-budgeted chunks for map-reduce review.
+
+        Files are kept whole when they fit; larger files are split at hunk
+        boundaries (and, for a single giant hunk, at line boundaries). Each
+        chunk is a list of file dicts with `filename` and `patch`, plus
+        `part`/`parts` when a file was split.
+
+        Args:
+            files (List[Dict]): GitHub file objects.
+            max_tokens (int): Approximate token budget per chunk (patch text only).
+
+        Returns:
+            List[List[Dict]]: Chunks in original file order.
+    """
+    chunks: List[List[Dict]] = []
+    current: List[Dict] = []
+    used = 0
+
+    def _emit(piece: Dict, cost: int):
+        nonlocal current, used
+        if current and used + cost > max_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(piece)
+        used += cost
+
+    for f in files:
+        patch = f.get("patch") or ""
+        cost = count_tokens(patch)
+        if cost <= max_tokens:
+            _emit(f, cost)
+            continue
+
+        segments: List[str] = []
+        for hunk in split_hunks(patch):
+            segments.extend(_split_oversized(hunk, max_tokens) if count_tokens(hunk) > max_tokens else [hunk])
+
+        # Re-pack adjacent hunks of this file so a split file uses as few parts as possible
+        parts: List[str] = []
+        buf, buf_cost = "", 0
+        for seg in segments:
+            seg_cost = count_tokens(seg)
+            if buf and buf_cost + seg_cost > max_tokens:
+                parts.append(buf)
+                buf, buf_cost = "", 0
+            buf += seg
+            buf_cost += seg_cost
+        if buf:
+            parts.append(buf)
+
+        for i, part in enumerate(parts, start=1):
+            _emit({**f, "patch": part, "part": i, "parts": len(parts)}, count_tokens(part))
+
+    if current:
+        chunks.append(current)
+    return chunks
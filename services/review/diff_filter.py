@@ -0,0 +1,152 @@
+import fnmatch, logging, os, re
+from typing import Dict, Iterable, List, Optional, Tuple
+from services.review.chunking import count_tokens, split_hunks
+from observability.metrics import review_diff_files_reduced_total
+
+logger = logging.getLogger(__name__)
+
+REVIEW_DIFF_FILTER = os.getenv("REVIEW_DIFF_FILTER", "true").lower() == "true"
+
+# Files whose diffs are summarized instead of reviewed (fnmatch patterns; "*" also matches "/")
+DEFAULT_EXCLUDE_GLOBS = (
+    # Lockfiles
+    "*.lock", "package-lock.json", "*/package-lock.json", "npm-shrinkwrap.json", "*/npm-shrinkwrap.json",
+    "pnpm-lock.yaml", "*/pnpm-lock.yaml", "go.sum", "*/go.sum",
+    # Vendored and build output
+    "vendor/*", "*/vendor/*", "node_modules/*", "*/node_modules/*", "third_party/*", "*/third_party/*",
+    "dist/*", "*/dist/*",
+    # Minified assets, source maps, snapshots and generated code
+    "*.min.js", "*.min.css", "*.map", "*.snap", "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.generated.*",
+)
+# Comma-separated globs added to the defaults / exempt from every name-based rule
+REVIEW_DIFF_EXCLUDE = [g.strip() for g in os.getenv("REVIEW_DIFF_EXCLUDE", "").split(",") if g.strip()]
+REVIEW_DIFF_INCLUDE = [g.strip() for g in os.getenv("REVIEW_DIFF_INCLUDE", "").split(",") if g.strip()]
+
+# Header lines tools put at the top of files they generate
+_GENERATED_MARKER = re.compile(
+    r"@generated\b"  # Meta tooling, protoc plugins, many JS/Rust generators
+    r"|^\W*Code generated .* DO NOT EDIT\.?\s*$"  # Go convention (go generate)
+    r"|<auto-generated"  # .NET
+    r"|(?i:\b(?:auto-?generated|automatically generated) (?:by|from|with|file)\b)",
+    re.MULTILINE,
+)
+_GENERATED_SCAN_LINES = 10
+_HUNK_NEW_START = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+MINIFIED_LINE_CHARS = 1000  # a changed line this long is minified/bundled output, not code anyone reviews
+
+# Indentation is syntax here, so only trailing whitespace and blank lines count as noise
+_INDENT_SENSITIVE = (".py", ".pyi", ".yaml", ".yml", ".haml", ".pug", ".coffee", ".sass", "Makefile")
+
+
+def _changed_lines(patch: str, prefix: str) -> List[str]:
+    return [line[1:] for line in patch.splitlines() if line.startswith(prefix) and not line.startswith(prefix * 3)]
+
+
+def _has_generated_header(patch: str) -> bool:
+    """True if the patch shows the top of the file and its first lines carry a generator marker."""
+    lines = patch.splitlines()
+    start = _HUNK_NEW_START.match(lines[0]) if lines else None
+    if start is None or int(start.group(1)) > 1:
+        return False  # the hunk starts mid-file; a marker there is ordinary text
+    header = [line[1:] for line in lines[1:] if not line.startswith("-")][:_GENERATED_SCAN_LINES]
+    return bool(_GENERATED_MARKER.search("\n".join(header)))
+
+
+def _line_counts(f: Dict) -> Tuple[int, int]:
+    patch = f.get("patch") or ""
+    additions = f.get("additions")
+    deletions = f.get("deletions")
+    if additions is None:
+        additions = len(_changed_lines(patch, "+"))
+    if deletions is None:
+        deletions = len(_changed_lines(patch, "-"))
+    return additions, deletions
+
+
+def _normalize(lines: List[str], indent_sensitive: bool):
+    # Blank lines never count; otherwise only whitespace between existing tokens may change,
+    # never whether two tokens are separated at all ("a b" vs "ab", "- -b" vs "--b")
+    if indent_sensitive:
+        return [line.rstrip() for line in lines if line.strip()]
+    return [line.split() for line in lines if line.strip()]
+
+
+def _is_whitespace_only(hunk: str, indent_sensitive: bool) -> bool:
+    removed, added = _changed_lines(hunk, "-"), _changed_lines(hunk, "+")
+    if not removed and not added:
+        return False
+    return _normalize(removed, indent_sensitive) == _normalize(added, indent_sensitive)
+
+
+def classify(f: Dict, exclude: Iterable[str] = (), include: Iterable[str] = ()) -> Optional[str]:
+    """
+        Why a file's diff is not worth reviewing verbatim, or None if it is.
+
+        Args:
+            f (Dict): GitHub file object.
+            exclude (Iterable[str]): Extra globs treated like the built-in exclusions.
+            include (Iterable[str]): Globs exempt from the name and content rules.
+
+        Returns:
+            Optional[str]: "removed", "renamed", "excluded", "generated" or "minified".
+    """
+    name = f.get("filename") or ""
+    patch = f.get("patch") or ""
+    status = f.get("status")
+
+    if status == "removed":
+        return "removed"
+    if status == "renamed" and not patch:
+        return "renamed"
+    if any(fnmatch.fnmatch(name, g) for g in include):
+        return None
+    if any(fnmatch.fnmatch(name, g) for g in (*DEFAULT_EXCLUDE_GLOBS, *exclude)):
+        return "excluded"
+    if _has_generated_header(patch):
+        return "generated"
+    if any(len(line) > MINIFIED_LINE_CHARS for line in patch.splitlines()):
+        return "minified"
+    return None
+
+
+def _collapsed(f: Dict, reason: str) -> str:
+    additions, deletions = _line_counts(f)
+    if reason == "removed":
+        return f"(file removed, {deletions} line(s) deleted; not shown)"
+    if reason == "renamed":
+        return f"(renamed from {f.get('previous_filename', 'unknown')} without content changes)"
+    kind = {"excluded": "lockfile, vendored or build output", "generated": "generated file", "minified": "minified file"}[reason]
+    return f"({kind}, +{additions} -{deletions} line(s); diff not shown)"
+
+
+def reduce_file(f: Dict, exclude: Iterable[str] = REVIEW_DIFF_EXCLUDE,
+                include: Iterable[str] = REVIEW_DIFF_INCLUDE) -> Tuple[Dict, int]:
+    """
+        Strip low-signal content from one file's diff before it is prompted.
+
+        Removed files, content-free renames, lockfiles, vendored/generated
+        code and minified assets keep a one-line placeholder so the review
+        still knows they changed. Other files lose their whitespace-only
+        hunks. Hunks that remain are unchanged, so their `@@` positions stay valid.
+
+        Returns:
+            Tuple[Dict, int]: The (possibly new) file dict and the estimated tokens saved.
+    """
+    patch = f.get("patch") or ""
+    reason = classify(f, exclude, include)
+    if reason is not None:
+        reduced = _collapsed(f, reason)
+    else:
+        name = f.get("filename") or ""
+        indent_sensitive = name.endswith(_INDENT_SENSITIVE)
+        hunks = split_hunks(patch)
+        kept = [h for h in hunks if not _is_whitespace_only(h, indent_sensitive)]
+        if len(kept) == len(hunks):
+            return f, 0
+        reason = "whitespace"
+        reduced = "".join(kept) if kept else "(whitespace-only changes; diff not shown)"
+
+    review_diff_files_reduced_total.labels(reason=reason).inc()
+    saved = max(0, count_tokens(patch) - count_tokens(reduced))
+    logger.debug(f"[DiffFilter] {f.get('filename')}: {reason}, ~{saved} token(s) saved")
+    return {**f, "patch": reduced}, saved
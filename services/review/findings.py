@@ -0,0 +1,105 @@
+import json, logging, os, re
+from typing import Dict, List, Tuple
+from adapters.github.diff import HUNK_HEADER, line_positions
+from observability.metrics import review_inline_findings_total
+
+logger = logging.getLogger(__name__)
+
+REVIEW_INLINE_COMMENTS = os.getenv("REVIEW_INLINE_COMMENTS", "true").lower() == "true"
+REVIEW_MAX_INLINE_COMMENTS = int(os.getenv("REVIEW_MAX_INLINE_COMMENTS", "30"))
+
+_JSON_BLOCK = re.compile(r"```json\s*(.*?)```", re.DOTALL)
+
+
+def number_lines(patch: str) -> str:
+    """
+        Prefix every new-side line of a patch with its line number in the new file.
+
+        The model copies these numbers into its findings instead of counting
+        lines itself. Lines before the first `@@` header (a hunk split
+        mid-way for chunking) stay unnumbered.
+    """
+    out: List[str] = []
+    new_line = None
+    for line in patch.rstrip("\n").split("\n"):
+        m = HUNK_HEADER.match(line)
+        if m:
+            new_line = int(m.group(3))
+            out.append(line)
+        elif new_line is not None and (line[:1] in ("+", " ") or line == ""):
+            out.append(f"{new_line:>5} {line}")
+            new_line += 1
+        else:
+            out.append(f"      {line}")
+    return "\n".join(out)
+
+
+def split_findings(text: str) -> Tuple[str, List[Dict]]:
+    """
+        Separate the ```json findings block from a generated review.
+
+        Returns:
+            Tuple[str, List[Dict]]: The Markdown review without the block, and the
+            raw findings (unvalidated; empty if the block is missing or malformed).
+    """
+    blocks = list(_JSON_BLOCK.finditer(text))
+    if not blocks:
+        return text.strip(), []
+    block = blocks[-1]
+    markdown = (text[:block.start()] + text[block.end():]).strip()
+    try:
+        data = json.loads(block.group(1))
+    except ValueError as e:
+        logger.warning(f"[Findings] Ignoring malformed findings block: {e}")
+        return markdown, []
+    if isinstance(data, dict):
+        data = data.get("comments") or data.get("findings") or []
+    if not isinstance(data, list):
+        return markdown, []
+    return markdown, [d for d in data if isinstance(d, dict)]
+
+
+def with_findings(markdown: str, findings: List[Dict]) -> str:
+    """The inverse of `split_findings` (for caching a review together with its findings)."""
+    if not findings:
+        return markdown
+    return f"{markdown}\n\n```json\n{json.dumps(findings)}\n```"
+
+
+def validate_findings(findings: List[Dict], files: List[Dict], limit: int = REVIEW_MAX_INLINE_COMMENTS) -> List[Dict]:
+    """
+        Keep the findings GitHub can anchor: a changed file and a line on the new side of one of its hunks.
+
+        GitHub rejects a whole review if any comment does not resolve to a
+        diff line, so everything else is dropped here. Duplicate (path, line)
+        pairs are merged into one comment.
+
+        Returns:
+            List[Dict]: At most `limit` comments as {"path", "line", "side", "body"}.
+    """
+    positions = {f.get("filename"): line_positions(f["patch"]) for f in files if f.get("patch")}
+    by_anchor: Dict[Tuple[str, int], Dict] = {}
+    invalid = 0
+    for finding in findings:
+        path = finding.get("path") or finding.get("file")
+        body = str(finding.get("body") or finding.get("comment") or "").strip()
+        try:
+            line = int(finding.get("line"))
+        except (TypeError, ValueError):
+            line = None
+        if not body or line not in positions.get(path, {}):
+            invalid += 1
+            continue
+        if (path, line) in by_anchor:
+            by_anchor[(path, line)]["body"] += f"\n\n{body}"
+        else:
+            by_anchor[(path, line)] = {"path": path, "line": line, "side": "RIGHT", "body": body}
+
+    comments = list(by_anchor.values())
+    review_inline_findings_total.labels(result="valid").inc(min(len(comments), limit))
+    review_inline_findings_total.labels(result="invalid").inc(invalid)
+    review_inline_findings_total.labels(result="capped").inc(max(0, len(comments) - limit))
+    comments = comments[:limit]
+    if invalid:
+        logger.info(f"[Findings] Dropped {invalid} finding(s) not anchored to a changed line.")
+    return comments
@@ -0,0 +1,69 @@
+import logging, os, time
+from typing import Callable, Optional
+from adapters.github.comments import post_pr_comment, update_pr_comment
+
+logger = logging.getLogger(__name__)
+
+REVIEW_STREAMING = os.getenv("REVIEW_STREAMING", "false").lower() == "true"
+REVIEW_STREAM_INTERVAL = float(os.getenv("REVIEW_STREAM_INTERVAL", "3"))
+
+PLACEHOLDER = "⏳ _PatchPilot is reviewing this pull request…_"
+IN_PROGRESS_FOOTER = "\n\n---\n⏳ _Review in progress…_"
+
+
+class ProgressiveComment:
+    """
+        A PR comment that is posted early and edited as a streamed review grows.
+
+        Partial updates are throttled to one PATCH per `interval` seconds and
+        are best-effort: a failed edit is logged and the next one retried.
+        The caller publishes the final body itself (e.g. via `update_pr_comment`).
+    """
+
+    def __init__(
+        self,
+        token: str,
+        repo_full: str,
+        pr_number: int,
+        comment_id: Optional[int] = None,
+        render: Callable[[str], str] = lambda text: text,
+        interval: float = REVIEW_STREAM_INTERVAL,
+    ):
+        self.token = token
+        self.repo_full = repo_full
+        self.pr_number = pr_number
+        self.comment_id = comment_id
+        self.render = render
+        self.interval = interval
+        self._last_update = 0.0
+
+    async def start(self) -> int:
+        """
+            Show the placeholder: edit the existing comment or post a new one.
+
+            Returns:
+                int: The comment ID partial and final reviews should be written to.
+        """
+        body = self.render(PLACEHOLDER)
+        if self.comment_id:
+            try:
+                await update_pr_comment(self.token, self.repo_full, self.comment_id, body)
+                self._last_update = time.monotonic()
+                return self.comment_id
+            except Exception as e:
+                logger.warning(f"[Progress] Could not reuse comment {self.comment_id}, posting a new one: {e}")
+
+        data = await post_pr_comment(self.token, self.repo_full, self.pr_number, body)
+        self.comment_id = data.get("id")
+        self._last_update = time.monotonic()
+        return self.comment_id
+
+    async def update(self, partial: str) -> None:
+        """Progress callback for `ReviewAgent.areview`; throttled and non-fatal."""
+        if not self.comment_id or time.monotonic() - self._last_update < self.interval:
+            return
+        self._last_update = time.monotonic()
+        try:
+            await update_pr_comment(self.token, self.repo_full, self.comment_id, self.render(partial + IN_PROGRESS_FOOTER))
+        except Exception as e:
+            logger.warning(f"[Progress] Partial update of comment {self.comment_id} failed: {e}")
@@ -1,11 +1,36 @@
-import logging
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
-from services.prompts import REVIEW_AGENT_PROMPT
-from typing import List, Dict
+import asyncio, logging, os, threading, time
+from services.prompts import PROMPT_VERSION, REVIEW_AGENT_PROMPT, REVIEW_CHUNK_PROMPT, REVIEW_REDUCE_PROMPT
+from services.review.cache import REVIEW_CACHE_ENABLED, ReviewCache, review_key, split_file_sections
+from services.review.backends import get_backend_pool, ollama_keep_alive
+from services.review.chunking import chunk_files, count_tokens
+from services.review.diff_filter import REVIEW_DIFF_FILTER, reduce_file
+from services.review.findings import REVIEW_INLINE_COMMENTS, number_lines, split_findings, validate_findings, with_findings
+from services.review.usage import ReviewUsage, add_usage
+from observability.metrics import (
+    review_chunk_seconds,
+    review_chunks,
+    review_diff_tokens_saved,
+    review_llm_seconds,
+    review_model_load_seconds,
+    review_time_to_first_section_seconds,
+)
+from observability.tracing import span
+from typing import AsyncIterable, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Receives the review text up to the last completed "## " section while streaming
+ProgressCallback = Callable[[str], Awaitable[None]]
+
+REVIEW_MODE = os.getenv("REVIEW_MODE", "auto")  # "single", "map_reduce" or "auto"
+REVIEW_CHUNK_TOKENS = int(os.getenv("REVIEW_CHUNK_TOKENS", "6000"))
+REVIEW_MAX_CONCURRENCY = int(os.getenv("REVIEW_MAX_CONCURRENCY", "4"))
+REVIEW_WARMUP_PROMPT = "Reply with OK."
+COLD_LOAD_SECONDS = 1.0  # an Ollama load_duration above this means the call had to load the model
+
+# Shared by every agent in the process so the in-process LRU outlives a single review
+_shared_cache = ReviewCache() if REVIEW_CACHE_ENABLED else None
+
 class ReviewAgent:
     """
         PatchPilot's AI review agent.
@@ -13,23 +38,67 @@ class ReviewAgent:
         to generate actionable PR review feedback.
     """
 
-    def __init__(self, backend: str = "ollama", model: str = "gemma3:4b", temperature: float = 0.2):
+    def __init__(
+        self,
+        backend: str = "ollama",
+        model: str = "gemma3:4b",
+        temperature: float = 0.2,
+        mode: str = REVIEW_MODE,
+        chunk_tokens: int = REVIEW_CHUNK_TOKENS,
+        max_concurrency: int = REVIEW_MAX_CONCURRENCY,
+        cache: Optional[ReviewCache] = None,
+        diff_filter: bool = REVIEW_DIFF_FILTER,
+        inline_comments: bool = REVIEW_INLINE_COMMENTS,
+    ):
         """
             Initialize the review agent with the chosen backend.
 
             Args:
-                backend (str): "ollama" (local) or "openai".
+                backend (str): "ollama" (local) or "openai"; ignored when
+                    LLM_ENDPOINTS configures a backend pool.
                 model (str): Model name to use for LLM.
                 temperature (float): Sampling temperature for generation.
+                mode (str): "single" (one prompt), "map_reduce" (always chunk) or
+                    "auto" (chunk only when the diff exceeds `chunk_tokens`).
+                chunk_tokens (int): Token budget of patch text per chunk.
+                max_concurrency (int): Maximum chunk reviews in flight.
+                cache (Optional[ReviewCache]): Review result cache; defaults to the
+                    process-wide cache unless REVIEW_CACHE_ENABLED is false.
+                diff_filter (bool): Collapse lockfiles, generated code and other
+                    low-signal diffs before prompting (see diff_filter.reduce_file).
+                inline_comments (bool): Ask for line-anchored findings and return
+                    the valid ones as "comments".
 
             Raises:
-                ValueError: If unsupported backend is specified.
+                ValueError: If unsupported backend or mode is specified.
         """
 
-        logger.debug(f"[ReviewAgent] Initializing with backend={backend}, model={model}, temp={temperature}")
+        logger.debug(f"[ReviewAgent] Initializing with backend={backend}, model={model}, temp={temperature}, mode={mode}")
+        if mode not in {"single", "map_reduce", "auto"}:
+            raise ValueError(f"Unsupported review mode: {mode}")
+        self.mode = mode
+        self.chunk_tokens = chunk_tokens
+        self.max_concurrency = max(1, max_concurrency)
+        self.model_id = f"{backend}:{model}"
+        self.backend, self.model = backend, model  # token accounting labels (pool calls carry their endpoint's)
+        self.cache = cache if cache is not None else _shared_cache
+        self.diff_filter = diff_filter
+        self.inline_comments = inline_comments
+        self._warm = False  # set after the first successful call (or warm-up)
+
+        # With LLM_ENDPOINTS set, calls are routed across the process-wide endpoint pool
+        pool = get_backend_pool(model, temperature)
+        if pool is not None:
+            self.llm = pool
+            self.model_id = pool.model_id
+            return
+
+        # Backend SDKs are imported on first use: each one costs seconds of import time and a lot of RSS
         if backend == "ollama":
-            self.llm = ChatOllama(model=model, temperature=temperature)
+            from langchain_ollama import ChatOllama
+            self.llm = ChatOllama(model=model, temperature=temperature, keep_alive=ollama_keep_alive())
         elif backend == "openai":
+            from langchain_openai import ChatOpenAI
             self.llm = ChatOpenAI(model=model, temperature=temperature)
         else:
             raise ValueError(f"Unsupported backend: {backend}")
@@ -43,7 +112,9 @@ class ReviewAgent:
                 head_sha (str): Commit SHA of the PR head.
 
             Returns:
-                dict: {"summary": str, "comments": list}
+                dict: {"summary": str, "comments": list, "usage": dict}, where
+                comments are line-anchored findings {"path", "line", "side", "body"}
+                and usage is the review's token record (see ReviewUsage.finish).
 
             Raises:
                 ValueError: If input `files` is not in the expected format.
@@ -55,36 +126,360 @@ class ReviewAgent:
 
         if not files:
             logger.warning("[ReviewAgent] Called with empty file list.")
-            return {"summary": "No files to review.", "comments": []}
+            return {"summary": "No files to review.", "comments": [], "usage": self._usage().finish()}
 
         # Format diffs into a single review prompt
         try:
-            file_diffs = "\n\n".join(
-                f"File: {f.get('filename', '(unknown)')}\nPatch:\n{f.get('patch', '(no diff provided)')}"
-                for f in files
-            )
+            files = self._reduce_all(files)
+            file_diffs = "\n\n".join(self._format_file(f) for f in files)
         except Exception as e:
             logger.error(f"[ReviewAgent] Failed to format file diffs: {e}", exc_info=True)
             raise
 
-        prompt = REVIEW_AGENT_PROMPT(head_sha, file_diffs)
+        prompt = REVIEW_AGENT_PROMPT(head_sha, file_diffs, inline=self.inline_comments)
         logger.debug(f"[ReviewAgent] Generated review prompt for commit {head_sha[:7]} with {len(files)} files.")
 
         # Run inference
+        start = time.perf_counter()
+        try:
+            with span("llm.invoke"):
+                res = self.llm.invoke(prompt)
+        except Exception as e:
+            logger.error(f"[ReviewAgent] LLM invocation failed: {e}", exc_info=True)
+            raise RuntimeError("ReviewAgent failed to invoke LLM.") from e
+        elapsed = time.perf_counter() - start
+        self._observe_call(elapsed, getattr(res, "response_metadata", None))
+        usage = self._usage()
+        usage.record(prompt, self._content(res), elapsed,
+                     getattr(res, "response_metadata", None), getattr(res, "usage_metadata", None))
+
+        return {**self._to_result(res, head_sha, files), "usage": usage.finish()}
+
+    async def areview(
+        self,
+        files: Union[List[Dict], AsyncIterable[Dict]],
+        head_sha: str,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> dict:
+        """
+            Async variant of `review` that also accepts a stream of files.
+
+            Streamed files (e.g. from `iter_pr_files`) are validated and
+            token-counted as they arrive. Large diffs are reviewed map-reduce style: chunks are
+            reviewed concurrently via `ainvoke` and a final reduce call
+            merges them into the REVIEW_AGENT_PROMPT structure. Diffs with
+            files whose findings are cached take the same path at any size,
+            so only the other files are prompted (except in "single" mode).
+
+            When `on_progress` is given, the final generation (single prompt
+            or reduce step) is streamed via `astream` and the callback is
+            awaited each time a Markdown section of the review completes.
+
+            Args:
+                files (Union[List[Dict], AsyncIterable[Dict]]): GitHub file objects.
+                head_sha (str): Commit SHA of the PR head.
+                on_progress (Optional[ProgressCallback]): Partial-review callback.
+
+            Returns:
+                dict: {"summary": str, "comments": list, "usage": dict}
+
+            Raises:
+                ValueError: If input `files` is not in the expected format.
+                RuntimeError: If LLM invocation fails.
+        """
+
+        if isinstance(files, str):
+            raise ValueError(f"Expected list of dicts, got string: {files}")
+        usage = self._usage()
+
+        # Validate and size files as they arrive so this work overlaps the fetch
+        collected: List[Dict] = []
+        patch_tokens = tokens_saved = 0
+
+        def _accept(f):
+            nonlocal patch_tokens, tokens_saved
+            if not isinstance(f, dict):
+                raise ValueError(f"Expected file dict, got {type(f)}: {f}")
+            if self.diff_filter:
+                f, saved = reduce_file(f)
+                tokens_saved += saved
+            if self.mode == "auto":
+                patch_tokens += count_tokens(f.get("patch") or "")
+            collected.append(f)
+
+        if hasattr(files, "__aiter__"):
+            async for f in files:
+                _accept(f)
+        else:
+            for f in files:
+                _accept(f)
+        files = collected
+        self._observe_reduction(len(files), tokens_saved)
+
+        if not files:
+            logger.warning("[ReviewAgent] Called with empty file list.")
+            return {"summary": "No files to review.", "comments": [], "usage": usage.finish()}
+
+        pr_key = review_key("pr", self.model_id, PROMPT_VERSION, [[f.get("filename"), f.get("patch")] for f in files])
+        if self.cache:
+            cached = await self.cache.get("pr", pr_key)
+            if cached is not None:
+                logger.info(f"[ReviewAgent] Identical diff already reviewed; reusing cached review for commit {head_sha[:7]}.")
+                summary, findings = split_findings(cached)
+                return {"summary": summary, "comments": self._comments(findings, files), "usage": usage.finish()}
+
+        # Per-file findings are looked up before picking a path: small (e.g. incremental) diffs
+        # with reviewed files go map-reduce too, so only their new files are prompted
+        file_keys = [review_key("file", self.model_id, PROMPT_VERSION, [f.get("filename"), f.get("patch")]) for f in files]
+        cached = await self.cache.get_many("file", file_keys) if self.cache and self.mode != "single" else {}
+
+        if cached or self._should_chunk(patch_tokens):
+            summary, findings = await self._map_reduce(files, head_sha, usage, file_keys, cached, on_progress)
+            logger.info(f"[ReviewAgent] Successfully generated map-reduce review for commit {head_sha[:7]}.")
+        else:
+            prompt = REVIEW_AGENT_PROMPT(head_sha, "\n\n".join(self._format_file(f) for f in files), inline=self.inline_comments)
+            logger.debug(f"[ReviewAgent] Generated review prompt for commit {head_sha[:7]} with {len(files)} files.")
+            summary, findings = split_findings(await self._generate(prompt, usage, on_progress))
+            logger.info(f"[ReviewAgent] Successfully generated review summary for commit {head_sha[:7]}.")
+
+        if self.cache:
+            await self.cache.set(pr_key, with_findings(summary, findings))
+        return {"summary": summary, "comments": self._comments(findings, files), "usage": usage.finish()}
+
+    def _reduce_all(self, files: List[Dict]) -> List[Dict]:
+        if not self.diff_filter:
+            return files
+        reduced, tokens_saved = [], 0
+        for f in files:
+            if not isinstance(f, dict):
+                raise ValueError(f"Expected file dict, got {type(f)}: {f}")
+            f, saved = reduce_file(f)
+            reduced.append(f)
+            tokens_saved += saved
+        self._observe_reduction(len(reduced), tokens_saved)
+        return reduced
+
+    def _observe_reduction(self, file_count: int, tokens_saved: int) -> None:
+        if not self.diff_filter or not file_count:
+            return
+        review_diff_tokens_saved.observe(tokens_saved)
+        if tokens_saved:
+            logger.info(f"[ReviewAgent] Diff filter removed ~{tokens_saved} token(s) of low-signal changes.")
+
+    def _should_chunk(self, patch_tokens: int) -> bool:
+        if self.mode == "single":
+            return False
+        if self.mode == "map_reduce":
+            return True
+        return patch_tokens > self.chunk_tokens
+
+    async def _map_reduce(
+        self, files: List[Dict], head_sha: str, usage: ReviewUsage, file_keys: List[str], cached: Dict[str, str],
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Tuple[str, List[Dict]]:
+        """
+            Review token-budgeted chunks concurrently, then merge the findings.
+
+            Files whose exact patch was reviewed before (same model and prompt
+            version) reuse their cached per-file findings and skip the map step.
+            Line-anchored findings come from the chunk reviews (cached files
+            contribute none); the merge step only sees the Markdown.
+
+            Args:
+                file_keys (List[str]): Per-file cache key of each file in `files`.
+                cached (Dict[str, str]): Cached findings by key (see ReviewCache.get_many).
+
+            Returns:
+                Tuple[str, List[Dict]]: Markdown review following the
+                REVIEW_AGENT_PROMPT structure, and the raw line findings.
+        """
+        pending = [f for f, k in zip(files, file_keys) if k not in cached]
+        if cached:
+            logger.info(f"[ReviewAgent] Reusing cached findings for {len(cached)} unchanged file(s).")
+
+        chunks = chunk_files(pending, self.chunk_tokens) if pending else []
+        review_chunks.observe(len(chunks))
+        logger.info(f"[ReviewAgent] Map-reduce review of {len(pending)} file(s) in {len(chunks)} chunk(s), concurrency={self.max_concurrency}.")
+
+        sem = asyncio.Semaphore(self.max_concurrency)
+
+        async def _map(idx: int, chunk: List[Dict]) -> Tuple[str, List[Dict]]:
+            diffs = "\n\n".join(self._format_file(f) for f in chunk)
+            prompt = REVIEW_CHUNK_PROMPT(head_sha, diffs, idx, len(chunks), inline=self.inline_comments)
+            async with sem:
+                start = time.perf_counter()
+                res = await self._ainvoke(prompt, usage)
+                review_chunk_seconds.labels(stage="map").observe(time.perf_counter() - start)
+            return split_findings(self._content(res))
+
+        results = await asyncio.gather(*(_map(i, c) for i, c in enumerate(chunks, start=1)))
+        outputs = [markdown for markdown, _ in results]
+        line_findings = [finding for _, found in results for finding in found]
+
+        if self.cache:
+            await self.cache.set_many(self._file_findings(chunks, outputs, dict(zip((f.get("filename") for f in files), file_keys))))
+
+        findings = [cached[k] for k in file_keys if k in cached] + list(outputs)
+        start = time.perf_counter()
+        summary = await self._generate(REVIEW_REDUCE_PROMPT(head_sha, "\n\n".join(findings)), usage, on_progress)
+        review_chunk_seconds.labels(stage="reduce").observe(time.perf_counter() - start)
+        return summary, line_findings
+
+    @staticmethod
+    def _file_findings(chunks: List[List[Dict]], outputs: List[str], keys: Dict[str, str]) -> Dict[str, str]:
+        """
+            Extract cacheable per-file findings from chunk reviews.
+
+            A split file is only cached when every part produced a section,
+            so a partially parsed review is never reused as complete.
+        """
+        sections: Dict[str, List[str]] = {}
+        expected: Dict[str, int] = {}
+        for chunk, text in zip(chunks, outputs):
+            names = {f.get("filename") for f in chunk}
+            for f in chunk:
+                expected[f.get("filename")] = f.get("parts", 1)
+            for name, found in split_file_sections(text, names).items():
+                sections.setdefault(name, []).extend(found)
+
+        return {
+            keys[name]: "\n\n".join(found)
+            for name, found in sections.items()
+            if name in keys and len(found) >= expected.get(name, 1)
+        }
+
+    async def _generate(self, prompt, usage: ReviewUsage, on_progress: Optional[ProgressCallback] = None) -> str:
+        """
+            Produce the final review text, streaming it when a callback is given.
+
+            A section counts as complete once the next "## " heading starts;
+            the delay until the first one is recorded as time-to-first-section.
+        """
+        if on_progress is None:
+            return self._content(await self._ainvoke(prompt, usage))
+
+        text, emitted, metadata, token_usage = "", 0, None, None
+        start = time.perf_counter()
+        try:
+            with span("llm.stream"):
+                async for chunk in self.llm.astream(prompt):
+                    metadata = getattr(chunk, "response_metadata", None) or metadata
+                    token_usage = add_usage(token_usage, getattr(chunk, "usage_metadata", None))
+                    piece = chunk.content if isinstance(chunk.content, str) else ""
+                    text += piece
+                    cut = text.rfind("\n## ")
+                    if cut > emitted:
+                        if not emitted:
+                            review_time_to_first_section_seconds.observe(time.perf_counter() - start)
+                        emitted = cut
+                        await on_progress(text[:cut].strip())
+        except Exception as e:
+            logger.error(f"[ReviewAgent] LLM streaming failed: {e}", exc_info=True)
+            raise RuntimeError("ReviewAgent failed to stream from LLM.") from e
+
+        elapsed = time.perf_counter() - start
+        self._observe_call(elapsed, metadata)
+        usage.record(prompt, text, elapsed, metadata, token_usage)
+        return text.strip()
+
+    async def _ainvoke(self, prompt, usage: ReviewUsage):
+        start = time.perf_counter()
         try:
-            res = self.llm.invoke(prompt)
+            with span("llm.invoke"):
+                res = await self.llm.ainvoke(prompt)
         except Exception as e:
             logger.error(f"[ReviewAgent] LLM invocation failed: {e}", exc_info=True)
             raise RuntimeError("ReviewAgent failed to invoke LLM.") from e
+        elapsed = time.perf_counter() - start
+        self._observe_call(elapsed, getattr(res, "response_metadata", None))
+        usage.record(prompt, self._content(res), elapsed,
+                     getattr(res, "response_metadata", None), getattr(res, "usage_metadata", None))
+        return res
+
+    async def warm_up(self) -> None:
+        """
+            Make the backend load the model before the first review arrives.
+
+            Sends a tiny prompt (to every endpoint when a backend pool is
+            configured). Failures are logged, not raised: the first review then
+            simply pays the load itself.
+        """
+        start = time.perf_counter()
+        try:
+            if hasattr(self.llm, "warm_up"):
+                await self.llm.warm_up(REVIEW_WARMUP_PROMPT)
+            else:
+                await self.llm.ainvoke(REVIEW_WARMUP_PROMPT)
+        except Exception as e:
+            logger.warning(f"[ReviewAgent] Warm-up of {self.model_id} failed: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        review_model_load_seconds.observe(elapsed)
+        self._warm = True
+        logger.info(f"[ReviewAgent] Warmed up {self.model_id} in {elapsed:.1f}s")
+
+    def _observe_call(self, elapsed: float, metadata: Optional[Dict]) -> None:
+        """
+            Record a successful LLM call as cold or warm.
 
+            Ollama reports how long it spent loading the model
+            (`load_duration`, ns); without it, the agent's first call counts as cold.
+        """
+        load_ns = (metadata or {}).get("load_duration")
+        if load_ns is not None:
+            cold = load_ns / 1e9 >= COLD_LOAD_SECONDS
+            if cold:
+                review_model_load_seconds.observe(load_ns / 1e9)
+        else:
+            cold = not self._warm
+        self._warm = True
+        review_llm_seconds.labels(phase="cold" if cold else "warm").observe(elapsed)
+
+    def _format_file(self, f: Dict) -> str:
+        if not isinstance(f, dict):
+            raise ValueError(f"Expected file dict, got {type(f)}: {f}")
+        part = f" (part {f['part']}/{f['parts']})" if f.get("parts") else ""
+        patch = f.get("patch", "(no diff provided)")
+        if self.inline_comments and f.get("patch"):
+            patch = number_lines(patch)
+        return f"File: {f.get('filename', '(unknown)')}{part}\nPatch:\n{patch}"
+
+    def _usage(self) -> ReviewUsage:
+        return ReviewUsage(self.backend, self.model)
+
+    def _comments(self, findings: List[Dict], files: List[Dict]) -> List[Dict]:
+        return validate_findings(findings, files) if self.inline_comments else []
+
+    @staticmethod
+    def _content(res) -> str:
         if not hasattr(res, "content"):
             logger.error(f"[ReviewAgent] Unexpected LLM response format: {res}")
             raise RuntimeError("Invalid response from LLM (missing .content).")
+        return res.content.strip()
 
-        summary = res.content.strip()
+    def _to_result(self, res, head_sha: str, files: List[Dict]) -> dict:
+        summary, findings = split_findings(self._content(res))
         logger.info(f"[ReviewAgent] Successfully generated review summary for commit {head_sha[:7]}.")
 
         return {
             "summary": summary,
-            "comments": []  # Placeholder: can extend later with inline comments
-        }
\ No newline at end of file
+            "comments": self._comments(findings, files),
+        }
+
+
+_agent: Optional[ReviewAgent] = None
+_agent_lock = threading.Lock()
+
+
+def get_review_agent() -> ReviewAgent:
+    """
+        The worker process's ReviewAgent, created on first use.
+
+        Agents hold no per-review state, so one instance (and its LLM client
+        connections) serves every review the process runs.
+    """
+    global _agent
+    with _agent_lock:
+        if _agent is None:
+            _agent = ReviewAgent()
+        return _agent
@@ -0,0 +1,106 @@
+import logging, os
+from typing import Dict, Optional
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+REVIEW_STATE_TTL = int(os.getenv("REVIEW_STATE_TTL", str(30 * 24 * 3600)))
+GITHUB_COMMENT_LIMIT = 65536  # GitHub rejects comment bodies longer than this
+
+
+def _state_key(repo_full: str, pr_number: int) -> str:
+    return f"pp:pr:{repo_full}:{pr_number}:last_review"
+
+
+async def get_last_review(repo_full: str, pr_number: int) -> Optional[Dict]:
+    """
+        Return the last successfully published review of a PR, if known.
+
+        Returns:
+            Optional[Dict]: {"head_sha": str, "comment_id": int, "history": str}
+            (entries written before the history was kept carry "summary" instead)
+    """
+    try:
+        return await cache.aget(_state_key(repo_full, pr_number))
+    except Exception as e:
+        logger.warning(f"[ReviewState] Failed to read review state for {repo_full}#{pr_number}: {e}")
+        return None
+
+
+async def record_review(repo_full: str, pr_number: int, head_sha: str, comment_id: int, history: str) -> None:
+    """Remember the head SHA and comment that the latest published review covers, and the review history."""
+    try:
+        await cache.aset(
+            _state_key(repo_full, pr_number),
+            {"head_sha": head_sha, "comment_id": comment_id, "history": history},
+            timeout=REVIEW_STATE_TTL,
+        )
+    except Exception as e:
+        logger.warning(f"[ReviewState] Failed to record review state for {repo_full}#{pr_number}: {e}")
+
+
+def previous_history(last: Optional[Dict]) -> Optional[str]:
+    """The review history stored with `last` (or the lone summary of an older state entry)."""
+    if not last:
+        return None
+    return last.get("history") or last.get("summary") or None
+
+
+def review_history(summary: str, head_sha: str, base_sha: Optional[str] = None, previous: Optional[str] = None) -> str:
+    """
+        The PR's review history once this review is published.
+
+        Every review is one "####" section, newest first: this review, then
+        `previous` (the history it was rendered with). Bounded by GitHub's
+        comment limit; the oldest reviews are cut first.
+    """
+    if base_sha:
+        title = f"Incremental review of `{base_sha[:7]}...{head_sha[:7]}`"
+    else:
+        title = f"Review of `{head_sha[:7]}`"
+    history = f"#### {title}\n\n{summary}"
+    if previous:
+        history += "\n\n" + previous
+    if len(history) > GITHUB_COMMENT_LIMIT:
+        history = history[:GITHUB_COMMENT_LIMIT - 64] + "\n\n_(older reviews truncated)_"
+    return history
+
+
+def render_incremental_body(summary: str, base_sha: str, head_sha: str, file_count: int, previous: Optional[str]) -> str:
+    """
+        Build the comment body for an incremental review.
+
+        The new review of `base...head` comes first; every earlier review of
+        the PR (`previous`, see review_history) is kept below in a collapsed
+        block, truncated to GitHub's size limit.
+    """
+    body = (
+        f"{summary}\n\n---\n"
+        f"_Incremental review of `{base_sha[:7]}...{head_sha[:7]}` ({file_count} file(s) changed)._"
+    )
+    if not previous:
+        return body
+
+    wrapper = f"\n\n<details><summary>Earlier reviews (up to `{base_sha[:7]}`)</summary>\n\n{{}}\n\n</details>"
+    room = GITHUB_COMMENT_LIMIT - len(body) - len(wrapper) - 64
+    if room <= 0:
+        return body
+    if len(previous) > room:
+        previous = previous[:room] + "\n\n_(truncated)_"
+    return body + wrapper.format(previous)
+
+
+async def remember_comment(repo_full: str, pr_number: int, comment_id: int) -> None:
+    """
+        Attach a freshly posted (placeholder) comment to the PR's review state.
+
+        The reviewed head is left unchanged, so a retried or superseding task
+        edits this comment instead of posting another one.
+    """
+    last = await get_last_review(repo_full, pr_number) or {"head_sha": None, "history": ""}
+    if last.get("comment_id") == comment_id:
+        return
+    try:
+        await cache.aset(_state_key(repo_full, pr_number), {**last, "comment_id": comment_id}, timeout=REVIEW_STATE_TTL)
+    except Exception as e:
+        logger.warning(f"[ReviewState] Failed to record comment for {repo_full}#{pr_number}: {e}")
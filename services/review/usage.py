@@ -0,0 +1,151 @@
+import json, logging, os
+from typing import Any, Dict, Optional
+from services.review.chunking import count_tokens
+from observability.metrics import (
+    llm_cost_usd_total,
+    llm_tokens_per_second,
+    llm_tokens_total,
+    llm_usage_estimated_total,
+    review_tokens,
+)
+
+logger = logging.getLogger(__name__)
+
+# Optional prices for cost accounting, USD per million tokens by model name, e.g.
+#   {"gpt-4o-mini": {"prompt": 0.15, "completion": 0.6}}
+# Unlisted models (e.g. self-hosted ones) are not costed.
+LLM_TOKEN_PRICES = os.getenv("LLM_TOKEN_PRICES", "")
+
+# Set on responses by BackendPool: which endpoint's backend and model served the call
+SERVED_BY = "patchpilot_served_by"
+
+
+def _load_prices(config: str) -> Dict[str, Dict[str, float]]:
+    if not config:
+        return {}
+    try:
+        return {model: {k: float(v) for k, v in price.items()} for model, price in json.loads(config).items()}
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.error(f"[Usage] Ignoring invalid LLM_TOKEN_PRICES: {e}")
+        return {}
+
+
+_prices = _load_prices(LLM_TOKEN_PRICES)
+
+
+def add_usage(total: Optional[Dict], usage: Optional[Dict]) -> Optional[Dict]:
+    """Sum LangChain `usage_metadata` across streamed chunks (most backends only report it on the last one)."""
+    if not usage:
+        return total
+    if not total:
+        return dict(usage)
+    return {k: total.get(k, 0) + usage.get(k, 0) for k in ("input_tokens", "output_tokens", "total_tokens")}
+
+
+def _reported(metadata: Dict, usage: Optional[Dict]):
+    """(prompt, completion) tokens as reported by the backend; None where it reported nothing."""
+    if usage and usage.get("input_tokens") is not None:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    # Raw fields, for LangChain versions that do not normalize them into usage_metadata
+    token_usage = metadata.get("token_usage") or {}
+    return (
+        token_usage.get("prompt_tokens", metadata.get("prompt_eval_count")),
+        token_usage.get("completion_tokens", metadata.get("eval_count")),
+    )
+
+
+def _prompt_text(prompt: Any) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    return "\n".join(str(getattr(m, "content", m)) for m in prompt)
+
+
+class ReviewUsage:
+    """
+        Token usage of one review, summed over its LLM calls.
+
+        Args:
+            backend (str): Backend label for calls whose response does not say who served it.
+            model (str): Model label for the same.
+    """
+
+    def __init__(self, backend: str, model: str):
+        self.backend = backend
+        self.model = model
+        self.calls = 0
+        self.estimated_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_seconds = 0.0
+        self.cost_usd: Optional[float] = None
+        self.models = set()
+
+    def record(self, prompt: Any, completion: str, elapsed: float,
+               metadata: Optional[Dict] = None, usage: Optional[Dict] = None) -> None:
+        """
+            Account one successful LLM call.
+
+            Uses the token counts the backend reported (`usage_metadata`, or
+            Ollama/OpenAI fields in `response_metadata`), estimating the
+            missing side with tiktoken. Throughput is completion tokens over
+            generation time: Ollama's `eval_duration` when reported (excludes
+            model load and prompt processing), else the call's wall time.
+        """
+        metadata = metadata or {}
+        served_by = metadata.get(SERVED_BY) or {}
+        backend = served_by.get("backend", self.backend)
+        model = served_by.get("model", self.model)
+
+        prompt_tokens, completion_tokens = _reported(metadata, usage)
+        estimated = prompt_tokens is None or completion_tokens is None
+        if prompt_tokens is None:
+            prompt_tokens = count_tokens(_prompt_text(prompt))
+        if completion_tokens is None:
+            completion_tokens = count_tokens(completion)
+
+        llm_tokens_total.labels(backend=backend, model=model, kind="prompt").inc(prompt_tokens)
+        llm_tokens_total.labels(backend=backend, model=model, kind="completion").inc(completion_tokens)
+        if estimated:
+            llm_usage_estimated_total.labels(backend=backend, model=model).inc()
+
+        eval_ns = metadata.get("eval_duration")
+        generation_seconds = eval_ns / 1e9 if eval_ns else elapsed
+        if completion_tokens and generation_seconds > 0:
+            llm_tokens_per_second.labels(backend=backend, model=model).observe(completion_tokens / generation_seconds)
+
+        price = _prices.get(model)
+        if price is not None:
+            cost = (prompt_tokens * price.get("prompt", 0) + completion_tokens * price.get("completion", 0)) / 1e6
+            llm_cost_usd_total.labels(backend=backend, model=model).inc(cost)
+            self.cost_usd = (self.cost_usd or 0.0) + cost
+
+        self.calls += 1
+        self.estimated_calls += estimated
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.llm_seconds += elapsed
+        self.models.add(f"{backend}:{model}")
+
+    def finish(self) -> Dict:
+        """
+            Observe the review's totals and return its usage record.
+
+            Returns:
+                Dict: {"calls", "estimated_calls", "prompt_tokens", "completion_tokens",
+                "total_tokens", "llm_seconds", "tokens_per_second", "cost_usd", "models"}
+        """
+        if self.calls:
+            review_tokens.labels(kind="prompt").observe(self.prompt_tokens)
+            review_tokens.labels(kind="completion").observe(self.completion_tokens)
+        return {
+            "calls": self.calls,
+            "estimated_calls": self.estimated_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "llm_seconds": round(self.llm_seconds, 3),
+            # Over summed call time (load, queueing and prompt processing included; concurrent calls do not inflate it)
+            "tokens_per_second": round(self.completion_tokens / self.llm_seconds, 1) if self.llm_seconds else None,
+            "cost_usd": round(self.cost_usd, 6) if self.cost_usd is not None else None,
+            "models": sorted(self.models),
+        }
@@ -0,0 +1,156 @@
+import asyncio, hashlib, logging, os, tempfile, time
+from typing import Any, Optional
+import orjson
+import zstandard
+from django.core.cache import cache
+from observability.metrics import blob_store_bytes_total, blob_store_reads_total
+from observability.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "cache")  # "cache" (Django cache / Redis) or "disk"
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(tempfile.gettempdir(), "patchpilot-blobs"))
+BLOB_STORE_TTL = int(os.getenv("BLOB_STORE_TTL", str(24 * 3600)))
+BLOB_STORE_ZSTD_LEVEL = int(os.getenv("BLOB_STORE_ZSTD_LEVEL", "3"))
+BLOB_STORE_SWEEP_INTERVAL = 600  # seconds between expired-file sweeps of the disk backend
+
+
+class BlobNotFound(KeyError):
+    """Raised when a blob reference is unknown or its blob has expired."""
+
+
+class _CacheBackend:
+    """Blobs in the shared Django cache (Redis in production); Redis enforces the TTL."""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    async def read(self, digest: str) -> Optional[bytes]:
+        return await cache.aget(f"pp:blob:{digest}")
+
+    async def write(self, digest: str, data: bytes) -> None:
+        await cache.aset(f"pp:blob:{digest}", data, timeout=self.ttl)
+
+
+class _DiskBackend:
+    """
+        Blobs as `<sha256>.zst` files under `root`.
+
+        Expiry is by modification time: stale files read as misses and are
+        removed by a periodic sweep on write. Writes go through a temp file
+        and an atomic rename, so readers never see partial blobs.
+    """
+
+    def __init__(self, root: str, ttl: int):
+        self.root = root
+        self.ttl = ttl
+        self._last_sweep = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, f"{digest}.zst")
+
+    async def read(self, digest: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, self._path(digest))
+
+    async def write(self, digest: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, self._path(digest), data)
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "rb") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: str, data: bytes) -> None:
+        if os.path.exists(path):
+            os.utime(path)  # same content already stored: just extend its lifetime
+        else:
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+
+        if time.monotonic() - self._last_sweep > BLOB_STORE_SWEEP_INTERVAL:
+            self._last_sweep = time.monotonic()
+            self._sweep()
+
+    def _sweep(self) -> None:
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.root):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class BlobStore:
+    """
+        Content-addressed, zstd-compressed blob store.
+
+        Blobs are keyed by the SHA-256 of their uncompressed bytes, so storing
+        the same content twice is a no-op and references are safe to pass
+        between tasks (and through the broker) instead of the payload itself.
+        Blobs expire after `ttl` seconds.
+    """
+
+    def __init__(self, backend: str = BLOB_STORE_BACKEND, ttl: int = BLOB_STORE_TTL, root: str = BLOB_STORE_DIR,
+                 level: int = BLOB_STORE_ZSTD_LEVEL):
+        if backend == "cache":
+            self._backend = _CacheBackend(ttl)
+        elif backend == "disk":
+            self._backend = _DiskBackend(root, ttl)
+        else:
+            raise ValueError(f"Unsupported blob store backend: {backend}")
+        self.level = level
+
+    @traced("blob.put")
+    async def put(self, data: bytes) -> str:
+        """
+            Store `data` and return its reference.
+
+            Returns:
+                str: The SHA-256 hex digest of `data`.
+        """
+        digest, compressed = await asyncio.to_thread(self._compress, data)
+        try:
+            await self._backend.write(digest, compressed)
+        except Exception as e:
+            logger.error(f"[BlobStore] Failed to store blob {digest[:12]}: {e}", exc_info=True)
+            raise
+        blob_store_bytes_total.labels(encoding="raw").inc(len(data))
+        blob_store_bytes_total.labels(encoding="zstd").inc(len(compressed))
+        return digest
+
+    @traced("blob.get")
+    async def get(self, ref: str) -> bytes:
+        """
+            Load the blob stored under `ref`.
+
+            Raises:
+                BlobNotFound: If the blob is unknown or expired.
+        """
+        compressed = await self._backend.read(ref)
+        if compressed is None:
+            blob_store_reads_total.labels(result="miss").inc()
+            raise BlobNotFound(ref)
+        blob_store_reads_total.labels(result="hit").inc()
+        return await asyncio.to_thread(zstandard.ZstdDecompressor().decompress, compressed)
+
+    async def put_json(self, obj: Any) -> str:
+        return await self.put(orjson.dumps(obj))
+
+    async def get_json(self, ref: str) -> Any:
+        return orjson.loads(await self.get(ref))
+
+    def _compress(self, data: bytes):
+        # Compressor objects are not thread-safe; they are cheap to create per call
+        return hashlib.sha256(data).hexdigest(), zstandard.ZstdCompressor(level=self.level).compress(data)
+
+
+blob_store = BlobStore()
@@ -0,0 +1,110 @@
+import atexit, io, logging, os, queue, threading, time
+from typing import Dict, Iterator, Optional
+import orjson
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+# Append every verified webhook delivery to this zstd-compressed JSON-lines file (off when empty)
+WEBHOOK_CAPTURE_PATH = os.getenv("WEBHOOK_CAPTURE_PATH", "")
+WEBHOOK_CAPTURE_ZSTD_LEVEL = int(os.getenv("WEBHOOK_CAPTURE_ZSTD_LEVEL", "3"))
+
+# Only these headers are captured: signatures, auth and cookies added by proxies never reach disk
+CAPTURED_HEADERS = (
+    "Content-Type",
+    "User-Agent",
+    "X-GitHub-Event",
+    "X-GitHub-Delivery",
+    "X-GitHub-Hook-ID",
+    "X-GitHub-Hook-Installation-Target-ID",
+    "X-GitHub-Hook-Installation-Target-Type",
+)
+
+
+class _CaptureWriter:
+    """
+        Appends deliveries to a capture file from a background thread.
+
+        `record` only enqueues, so the webhook never waits on compression or
+        disk. Whatever is queued is compressed as one zstd frame and written
+        with one `write` on an O_APPEND file; concatenated frames form a valid
+        zstd stream, so several web processes can share the file.
+    """
+
+    def __init__(self, path: str, level: int):
+        self.path = path
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._queue: "queue.SimpleQueue[Optional[Dict]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="patchpilot-webhook-capture", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, headers, body: bytes) -> None:
+        self._queue.put({
+            "t": time.time(),
+            "headers": {name: headers[name] for name in CAPTURED_HEADERS if name in headers},
+            "body": body.decode("utf-8", "replace"),
+        })
+
+    def close(self, timeout: float = 2.0) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        try:
+            f = open(self.path, "ab", buffering=0)
+        except OSError as e:
+            logger.error(f"[Capture] Cannot open webhook capture file {self.path}: {e}")
+            return
+        with f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                records = [record]
+                # Drain whatever else is queued into the same frame
+                while not self._queue.empty():
+                    record = self._queue.get()
+                    if record is None:
+                        self._write(f, records)
+                        return
+                    records.append(record)
+                self._write(f, records)
+
+    def _write(self, f, records) -> None:
+        try:
+            f.write(self._compressor.compress(b"".join(orjson.dumps(r) + b"\n" for r in records)))
+        except OSError as e:
+            logger.warning(f"[Capture] Dropped {len(records)} delivery(ies): {e}")
+
+
+_writer: Optional[_CaptureWriter] = (
+    _CaptureWriter(WEBHOOK_CAPTURE_PATH, WEBHOOK_CAPTURE_ZSTD_LEVEL) if WEBHOOK_CAPTURE_PATH else None
+)
+
+
+def capture_delivery(headers, body: bytes) -> None:
+    """Queue one verified delivery for the capture file; a no-op unless WEBHOOK_CAPTURE_PATH is set."""
+    if _writer is not None:
+        _writer.record(headers, body)
+
+
+def read_capture(path: str) -> Iterator[Dict]:
+    """
+        Iterate over the deliveries in a capture file, in file order.
+
+        Batches from different web processes can interleave slightly out of
+        time order; sort by "t" when timing matters.
+
+        Yields:
+            Dict: {"t": float (UNIX time received), "headers": Dict[str, str], "body": bytes}
+    """
+    with open(path, "rb") as f:
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        for line in io.BufferedReader(reader):
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            record["body"] = record["body"].encode()
+            yield record